@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import statistics
+import time
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Optional, Tuple
+from fastapi import HTTPException
+from core.metrics import HEDGED_REQUESTS, SECTION_RESULTS
+
+class LatencyTracker:
+    """Recent successful call latencies per target, used to decide when to hedge."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self._samples: dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
+        self._min_samples = min_samples
+
+    def observe(self, target: str, seconds: float) -> None:
+        self._samples[target].append(seconds)
+
+    def percentile(self, target: str, q: int) -> Optional[float]:
+        """The q-th percentile latency, or None until enough calls have been seen."""
+        samples = self._samples[target]
+        if len(samples) < self._min_samples:
+            return None
+        return statistics.quantiles(samples, n=100)[q - 1]
+
+async def hedged(call: Callable[[], Awaitable], hedge_after: Optional[float], on_hedge: Callable[[], None] = None):
+    """Awaits call(), starting a second attempt if the first is still running after hedge_after.
+
+    The first attempt to succeed wins and the other is cancelled; if both fail,
+    the last error is raised.
+    """
+    attempts = {asyncio.ensure_future(call())}
+    try:
+        if hedge_after is not None:
+            done, _ = await asyncio.wait(attempts, timeout=hedge_after)
+            if not done:
+                if on_hedge:
+                    on_hedge()
+                attempts.add(asyncio.ensure_future(call()))
+        error = None
+        while attempts:
+            done, attempts = await asyncio.wait(attempts, return_when=asyncio.FIRST_COMPLETED)
+            for attempt in done:
+                if attempt.exception() is None:
+                    return attempt.result()
+                error = attempt.exception()
+        raise error
+    finally:
+        for attempt in attempts:
+            attempt.cancel()
+
+def describe_error(error: BaseException, budget: float) -> str:
+    if isinstance(error, asyncio.TimeoutError):
+        return f"timed out after {budget:.2f}s"
+    if isinstance(error, HTTPException):
+        return str(error.detail)
+    return repr(error)
+
+async def fetch_section(
+    name: str,
+    primary: Callable[[], Awaitable],
+    fallback: Callable[[], Awaitable],
+    budget: float,
+    fallback_budget: float,
+    tracker: LatencyTracker,
+    hedge_percentile: int = 95,
+) -> Tuple[Any, dict]:
+    """Fetches one section of a fan-out within its budget, falling back if it fails.
+
+    Returns the data (None if both paths failed) and the section's status:
+    "ok", "fallback" or "unavailable", with the primary path's error if any.
+    """
+    started = time.monotonic()
+
+    async def attempt():
+        attempt_started = time.monotonic()
+        result = await primary()
+        tracker.observe(name, time.monotonic() - attempt_started)
+        return result
+
+    hedge_after = tracker.percentile(name, hedge_percentile)
+    try:
+        data = await asyncio.wait_for(
+            hedged(attempt, hedge_after, on_hedge=HEDGED_REQUESTS.labels(name).inc), budget,
+        )
+        status = {"status": "ok"}
+    except Exception as e:
+        status = {"status": "fallback", "error": describe_error(e, budget)}
+        logging.warning(f"{name}: {status['error']}; serving the fallback")
+        try:
+            data = await asyncio.wait_for(fallback(), fallback_budget)
+        except Exception as fallback_error:
+            data = None
+            status["status"] = "unavailable"
+            logging.error(f"{name}: fallback failed too: {describe_error(fallback_error, fallback_budget)}")
+    status["elapsedMs"] = round((time.monotonic() - started) * 1000)
+    SECTION_RESULTS.labels(name, status["status"]).inc()
+    return data, status
@@ -0,0 +1,163 @@
+"""Gateway API keys and their per-key rate limits.
+
+Keys live in the Redis hash KEYS_KEY, stored by SHA-256 digest so the hash
+never holds a usable key. Every gateway keeps an in-memory copy refreshed
+every API_KEYS_REFRESH_SECONDS, so validating a key costs no round trip;
+settings.API_KEY is always accepted as the key named "default".
+
+Each key name gets a token bucket (perMinute tokens a minute, up to burst
+at once) kept in Redis and taken from with one atomic script call, so every
+gateway replica shares the same budget:
+
+    python -m api_gateway.keys add dashboard --per-minute 600 --burst 60
+    python -m api_gateway.keys revoke dashboard
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import secrets
+import sys
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from redis.exceptions import RedisError
+from core.config import settings
+from core.database import redis_cache
+from core.metrics import RATE_LIMITED, REDIS_LATENCY
+
+KEYS_KEY = "api_keys"
+BUCKET_PREFIX = "ratelimit:"
+
+# Refills by the time since the last take, using the Redis clock so replicas agree.
+# Returns {allowed, milliseconds until a token is available}.
+_TAKE_TOKEN = """
+local per_ms = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = clock[1] * 1000 + math.floor(clock[2] / 1000)
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'at')
+local tokens = tonumber(bucket[1]) or burst
+local at = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - at) * per_ms)
+local allowed, wait = 0, 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = math.ceil((1 - tokens) / per_ms)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'at', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / per_ms))
+return {allowed, wait}
+"""
+_take_token = redis_cache.register_script(_TAKE_TOKEN)
+
+def digest(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+@dataclass(frozen=True)
+class ApiKey:
+    name: str
+    per_minute: int
+    burst: int
+
+    def to_json(self) -> str:
+        return json.dumps({"name": self.name, "perMinute": self.per_minute, "burst": self.burst})
+
+    @classmethod
+    def from_json(cls, data: str) -> "ApiKey":
+        record = json.loads(data)
+        return cls(record["name"], record["perMinute"], record["burst"])
+
+def default_key() -> ApiKey:
+    return ApiKey("default", settings.RATE_LIMIT_PER_MINUTE, settings.RATE_LIMIT_BURST)
+
+class ApiKeys:
+    """Answers key lookups from memory; refresh() and watch() keep the copy current."""
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._keys: dict[str, ApiKey] = {}
+
+    def lookup(self, api_key: str) -> Optional[ApiKey]:
+        if secrets.compare_digest(api_key.encode(), settings.API_KEY.encode()):
+            return default_key()
+        return self._keys.get(digest(api_key))
+
+    async def refresh(self) -> None:
+        stored = await redis_cache.hgetall(KEYS_KEY)
+        self._keys = {key_digest: ApiKey.from_json(record) for key_digest, record in stored.items()}
+
+    async def watch(self) -> None:
+        """Refreshes the keys every refresh_seconds until cancelled; errors keep the last copy."""
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logging.error(f"Could not refresh API keys: {e!r}")
+            await asyncio.sleep(self.refresh_seconds)
+
+api_keys = ApiKeys(settings.API_KEYS_REFRESH_SECONDS)
+
+async def take_token(key: ApiKey) -> Tuple[bool, float]:
+    """Takes one request from the key's bucket; returns (allowed, seconds until the next token).
+
+    Fails open: if Redis cannot be reached the request is let through.
+    """
+    try:
+        with REDIS_LATENCY.labels("rate_limit").time():
+            allowed, wait_ms = await _take_token(
+                keys=[BUCKET_PREFIX + key.name], args=[key.per_minute / 60000, key.burst],
+            )
+    except RedisError as e:
+        logging.warning(f"Rate limit check for {key.name} failed, allowing the request: {e!r}")
+        return True, 0.0
+    if not allowed:
+        RATE_LIMITED.labels(key.name).inc()
+    return bool(allowed), wait_ms / 1000
+
+def retry_after(wait_seconds: float) -> str:
+    """A Retry-After header value: whole seconds, rounded up."""
+    return str(max(1, math.ceil(wait_seconds)))
+
+async def add_key(name: str, per_minute: int, burst: int) -> str:
+    """Creates a key named `name` (replacing any key by that name) and returns it; only its digest is stored.
+
+    per_minute and burst must be positive: the bucket script divides by the refill rate.
+    """
+    if per_minute <= 0 or burst <= 0:
+        raise ValueError(f"per_minute and burst must be positive, got {per_minute} and {burst}")
+    await revoke_key(name)
+    api_key = secrets.token_urlsafe(32)
+    await redis_cache.hset(KEYS_KEY, digest(api_key), ApiKey(name, per_minute, burst).to_json())
+    return api_key
+
+async def revoke_key(name: str) -> int:
+    stored = await redis_cache.hgetall(KEYS_KEY)
+    revoked = [key_digest for key_digest, record in stored.items() if ApiKey.from_json(record).name == name]
+    if revoked:
+        await redis_cache.hdel(KEYS_KEY, *revoked)
+    return len(revoked)
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be positive, got {number}")
+    return number
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="Create a key and print it")
+    add.add_argument("name")
+    add.add_argument("--per-minute", type=positive_int, default=settings.RATE_LIMIT_PER_MINUTE)
+    add.add_argument("--burst", type=positive_int, default=settings.RATE_LIMIT_BURST)
+    revoke = commands.add_parser("revoke", help="Remove a key by name")
+    revoke.add_argument("name")
+    args = parser.parse_args()
+    if args.command == "add":
+        print(asyncio.run(add_key(args.name, args.per_minute, args.burst)))
+    elif not asyncio.run(revoke_key(args.name)):
+        sys.exit(f"No key named {args.name}")
@@ -1,22 +1,86 @@
 import asyncio
+import functools
+import logging
+import time
 import httpx
-from fastapi import FastAPI, Depends, HTTPException, Security
-from fastapi.security.api_key import APIKeyHeader
+import orjson
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import Literal, Optional
+from fastapi import Body, FastAPI, Depends, HTTPException, Request, Response, Security
+from fastapi.responses import StreamingResponse
+from fastapi.security.api_key import APIKeyHeader, APIKeyQuery
 from fastapi.middleware.cors import CORSMiddleware
+from core.alerts import Rule, delete_rule, list_rules, rule_index, save_rule
+from core.codec import SHAPES, OrjsonResponse
 from core.config import settings
+from core.database import close_connections
+from core.feature_flags import feature_flags
+from core.history import query_history, series_name
+from core.http import SERVICE_URL_SETTINGS, SERVICES, get_client, open_clients, close_clients
+from core.metrics import FORWARD_LATENCY, metrics_response
+from core.regime import read_regime
+from core.registry import SERVICES as SERVICE_REGISTRY, get_indicator
+from core.service import (
+    check_ready, create_service_app, read_indicators, read_sections, required_settings, service_endpoints, upstreams_for,
+)
+from api_gateway.fanout import LatencyTracker, describe_error, fetch_section
+from api_gateway.keys import api_keys, retry_after, take_token
+from api_gateway.snapshot import SnapshotCache, etag_matches, listen_for_updates
+from api_gateway.stream import Broadcaster, event_stream
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings.require("The gateway", "API_KEY", *(["DATABASE_URL"] if settings.HISTORY_ENABLED else []))
+    if settings.RUN_MODE == "monolith":
+        for name in SERVICE_REGISTRY:
+            settings.require(f"The {name} service", *required_settings(name))
+    else:
+        settings.require("The gateway", *SERVICE_URL_SETTINGS.values())
+    open_clients(SERVICES)
+    if settings.RUN_MODE == "monolith":
+        open_clients(*set().union(*(upstreams_for(name) for name in SERVICE_REGISTRY)))
+    # Invalidate before broadcasting so resyncing clients get the new snapshot.
+    listener = asyncio.create_task(listen_for_updates(invalidate_snapshots, broadcaster.publish))
+    flag_watcher = asyncio.create_task(feature_flags.watch())
+    key_watcher = asyncio.create_task(api_keys.watch())
+    # In monolith mode this process also ingests, so it checks alert rules too.
+    rule_watcher = asyncio.create_task(rule_index.watch()) if settings.RUN_MODE == "monolith" else None
+    yield
+    if rule_watcher:
+        rule_watcher.cancel()
+    key_watcher.cancel()
+    flag_watcher.cancel()
+    listener.cancel()
+    await close_clients()
+    await close_connections()
 
-app = FastAPI(title="Market Dashboard API Gateway")
+app = FastAPI(title="Market Dashboard API Gateway", lifespan=lifespan)
+app.add_api_route("/ready", check_ready, methods=["GET"], include_in_schema=False)
 
 # --- Security Setup ---
 API_KEY_NAME = "X-API-KEY"
-api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=True)
+api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
 
 async def get_api_key(api_key: str = Security(api_key_header)):
-    """Validates the API key provided in the request header."""
-    if api_key == settings.API_KEY:
-        return api_key
-    else:
+    """Validates the API key provided in the request header and takes a request from its rate limit."""
+    if not api_key:
+        raise HTTPException(status_code=403, detail="Not authenticated")
+    key = api_keys.lookup(api_key)
+    if key is None:
         raise HTTPException(status_code=403, detail="Could not validate credentials")
+    if settings.RATE_LIMIT_ENABLED:
+        allowed, wait_seconds = await take_token(key)
+        if not allowed:
+            raise HTTPException(status_code=429, detail="Rate limit exceeded", headers={"Retry-After": retry_after(wait_seconds)})
+    return api_key
+
+# EventSource cannot send custom headers, so the stream also accepts ?api_key=
+api_key_query = APIKeyQuery(name="api_key", auto_error=False)
+
+async def get_stream_api_key(header_key: str = Security(api_key_header), query_key: str = Security(api_key_query)):
+    """Validates the API key from the request header or query string."""
+    return await get_api_key(header_key or query_key)
 
 # --- CORS Middleware ---
 app.add_middleware(
@@ -27,34 +91,222 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- Monolith Mode ---
+# The scheduler reaches the in-process services at <gateway>/services/<name>.
+# They share the public port, so they take an API key and its rate limit too.
+if settings.RUN_MODE == "monolith":
+    for name in SERVICE_REGISTRY:
+        app.mount(f"/services/{name}", create_service_app(name, dependencies=[Depends(get_api_key)]))
+
 # --- Service Routing ---
-async def forward_request(service: str, endpoint: str):
+async def forward_request(service: str, endpoint: str, params: Optional[dict] = None):
     """Generic function to forward requests to a microservice."""
-    service_urls = {
-        "economic": settings.ECONOMIC_SERVICE_URL,
-        "sentiment": settings.SENTIMENT_SERVICE_URL,
-        "technicals": settings.TECHNICALS_SERVICE_URL,
-        "cross_asset": settings.CROSS_ASSET_SERVICE_URL,
-    }
-    service_url = service_urls.get(service)
+    with FORWARD_LATENCY.labels(service, endpoint).time():
+        return await _forward_request(service, endpoint, params)
+
+async def _forward_request(service: str, endpoint: str, params: Optional[dict]):
+    if settings.RUN_MODE == "monolith":
+        return await service_endpoints(service)[endpoint](**(params or {}))
+
+    service_url = getattr(settings, SERVICE_URL_SETTINGS[service])
     
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        try:
-            url = f"{service_url}/{endpoint}"
-            response = await client.get(url)
-            response.raise_for_status()
-            return response.json()
-        except httpx.RequestError as exc:
-            raise HTTPException(status_code=503, detail=f"Error communicating with {service} service: {exc}")
+    client = get_client(SERVICES)
+    try:
+        url = f"{service_url}/{endpoint}"
+        response = await client.get(url, params=params)
+        response.raise_for_status()
+        return orjson.loads(response.content)
+    except httpx.RequestError as exc:
+        raise HTTPException(status_code=503, detail=f"Error communicating with {service} service: {exc}")
+
+latencies = LatencyTracker()
+
+def service_budget(service: str) -> float:
+    budgets = settings.GATEWAY_SERVICE_BUDGETS_SECONDS
+    budget = budgets.get(service, budgets.get("default", settings.GATEWAY_DEADLINE_SECONDS))
+    return min(budget, settings.GATEWAY_DEADLINE_SECONDS - settings.GATEWAY_FALLBACK_SECONDS)
+
+async def fetch_service_section(service: str, endpoint: str, params: Optional[dict], fallback):
+    return await fetch_section(
+        service,
+        primary=lambda: forward_request(service, endpoint, params),
+        fallback=fallback,
+        budget=service_budget(service),
+        fallback_budget=settings.GATEWAY_FALLBACK_SECONDS,
+        tracker=latencies,
+        hedge_percentile=settings.GATEWAY_HEDGE_PERCENTILE,
+    )
+
+async def read_all_sections(shape: str) -> tuple:
+    """Reads every service's indicators straight from the cache in one round trip, within the deadline."""
+    started = time.monotonic()
+    try:
+        data = await asyncio.wait_for(read_sections(shape, revalidate=False), settings.GATEWAY_DEADLINE_SECONDS)
+        status = {"status": "ok"}
+    except Exception as e:
+        logging.error(f"Reading the indicator cache failed: {e!r}")
+        data = {name: None for name in SERVICE_REGISTRY}
+        status = {"status": "unavailable", "error": describe_error(e, settings.GATEWAY_DEADLINE_SECONDS)}
+    status["elapsedMs"] = round((time.monotonic() - started) * 1000)
+    return [(data[name], dict(status)) for name in SERVICE_REGISTRY]
+
+async def fan_out_sections(shape: str) -> list:
+    """Asks every service for its indicators, falling back to the cache for any that fail."""
+    params = None if shape == "rows" else {"shape": shape}
+    return await asyncio.gather(*(
+        fetch_service_section(name, "indicators", params, fallback=functools.partial(read_indicators, name, shape, revalidate=False))
+        for name in SERVICE_REGISTRY
+    ))
+
+async def fetch_all_data(shape: str = "rows"):
+    """Collects every service's cached indicators, by default in one Redis read.
+
+    With GATEWAY_READ_PATH="services" it fans out to the services instead,
+    within the gateway deadline; a service that fails or overruns its budget
+    is served straight from the cache. "sections" reports each service's
+    status and whether any of its indicators is stale; "partial" is set if
+    any section is not "ok".
+    """
+    if settings.GATEWAY_READ_PATH == "services":
+        results = await fan_out_sections(shape)
+    else:
+        results = await read_all_sections(shape)
+    data = {}
+    sections = {}
+    for name, (section, status) in zip(SERVICE_REGISTRY, results):
+        data[name] = section or {}
+        status["stale"] = section is None or any(i.get("stale") for i in section.values() if isinstance(i, dict))
+        sections[name] = status
+    data["sections"] = sections
+    data["partial"] = any(s["status"] != "ok" for s in sections.values())
+    return data
+
+def earliest_expiry(data: dict) -> Optional[float]:
+    """When the first indicator not yet stale in a snapshot falls due, so it is then rebuilt flagging it stale."""
+    return min((
+        indicator["expiresAt"] for name in SERVICE_REGISTRY for indicator in data.get(name, {}).values()
+        if isinstance(indicator, dict) and not indicator.get("stale") and indicator.get("expiresAt")
+    ), default=None)
+
+# One pre-encoded snapshot per history shape; the stream always uses rows.
+snapshots = {
+    shape: SnapshotCache(
+        functools.partial(fetch_all_data, shape),
+        max_age_seconds=settings.SNAPSHOT_MAX_AGE_SECONDS,
+        partial_max_age_seconds=settings.SNAPSHOT_PARTIAL_MAX_AGE_SECONDS,
+        expires_at=earliest_expiry,
+    )
+    for shape in SHAPES
+}
+snapshot = snapshots["rows"]
+
+def invalidate_snapshots(_message: Optional[str] = None) -> None:
+    for cache in snapshots.values():
+        cache.invalidate()
+
+# A flag switching an indicator off must drop it from /api/all straight away.
+feature_flags.on_change(invalidate_snapshots)
+
+broadcaster = Broadcaster(queue_size=settings.STREAM_QUEUE_SIZE)
+
+app.add_api_route("/metrics", metrics_response, methods=["GET"], include_in_schema=False)
 
 @app.get("/api/all", dependencies=[Depends(get_api_key)])
-async def get_all_data():
-    """Convenience endpoint to fetch all data from cache."""
-    tasks = {
-        "economic": forward_request("economic", "indicators"),
-        "sentiment": forward_request("sentiment", "indicators"),
-        "technicals": forward_request("technicals", "indicators"),
-        "cross_asset": forward_request("cross_asset", "indicators"),
-    }
-    results = await asyncio.gather(*tasks.values())
-    return dict(zip(tasks.keys(), results))
+async def get_all_data(request: Request, shape: Literal["rows", "columnar"] = "rows"):
+    """Convenience endpoint to fetch all data from the pre-encoded snapshot.
+
+    ?shape=columnar returns each history as one array per field instead of a list of points.
+    """
+    body, etag = await snapshots[shape].get()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/api/technicals", dependencies=[Depends(get_api_key)])
+async def get_universe_technicals():
+    """Technical indicators for every symbol in the configured universe."""
+    data, status = await fetch_service_section(
+        "technicals", "universe", None, fallback=SERVICE_REGISTRY["technicals"].endpoints["universe"],
+    )
+    if data is None:
+        raise HTTPException(status_code=503, detail=f"Technicals unavailable: {status.get('error')}")
+    return OrjsonResponse(data)
+
+@app.get("/api/regime", dependencies=[Depends(get_api_key)])
+async def get_regime():
+    """The composite market regime score, its components, rolling correlations and score history."""
+    data = await read_regime()
+    if data is None:
+        raise HTTPException(status_code=503, detail="The regime score has not been computed yet")
+    return OrjsonResponse(data)
+
+@app.get("/api/stream", dependencies=[Depends(get_stream_api_key)])
+async def stream_updates():
+    """Server-Sent Events: a full snapshot on connect, then each indicator as it is written."""
+    return StreamingResponse(
+        event_stream(broadcaster, snapshot, settings.STREAM_KEEPALIVE_SECONDS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+Resample = Literal["day", "week", "month", "quarter", "year"]
+
+async def history_response(series: str, start: Optional[date], end: Optional[date], resample: str, **fields) -> OrjsonResponse:
+    if not settings.HISTORY_ENABLED:
+        raise HTTPException(status_code=503, detail="History is not enabled")
+    points = await query_history(series, start, end, resample)
+    return OrjsonResponse({
+        **fields, "resample": resample,
+        "history": [{"name": day.isoformat()[:10], "value": value} for day, value in points],
+    })
+
+@app.get("/api/history/symbols/{symbol}", dependencies=[Depends(get_api_key)])
+async def get_symbol_history(symbol: str, start: Optional[date] = None, end: Optional[date] = None, resample: Resample = "day"):
+    """Stored daily closes of one universe symbol (written by scheduler.backfill), downsampled in Postgres."""
+    if symbol not in settings.TECHNICALS_UNIVERSE:
+        raise HTTPException(status_code=404, detail=f"Unknown symbol {symbol}")
+    return await history_response(series_name(symbol, "close"), start, end, resample, symbol=symbol)
+
+@app.get("/api/history/{indicator}", dependencies=[Depends(get_api_key)])
+async def get_indicator_history(
+    indicator: str,
+    field: str = "value",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    resample: Resample = "day",
+):
+    """Stored history of one indicator, by registry key, downsampled in Postgres.
+
+    ?field= picks another line of the indicator's points, e.g. movingAverages?field=50D.
+    """
+    spec = get_indicator(indicator)
+    if spec is None:
+        raise HTTPException(status_code=404, detail=f"Unknown indicator {indicator}")
+    return await history_response(series_name(spec.name, field), start, end, resample, indicator=indicator, field=field)
+
+@app.get("/api/alerts/rules", dependencies=[Depends(get_api_key)])
+async def get_alert_rules():
+    """Every registered alert rule."""
+    return await list_rules()
+
+@app.post("/api/alerts/rules", dependencies=[Depends(get_api_key)], status_code=201)
+async def create_alert_rule(rule: dict = Body(...)):
+    """Registers an alert rule, e.g. {"indicator": "vix", "kind": "above", "threshold": 35}.
+
+    Kinds are "above" and "below" (crossings), "move" (percent change; negative
+    for falls) and "status" (e.g. {"kind": "status", "status": "bearish"}). Every
+    service picks a new rule up within ALERTS_REFRESH_SECONDS.
+    """
+    try:
+        parsed = Rule.from_dict({**rule, "id": None})
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    await save_rule(parsed)
+    return parsed.to_dict()
+
+@app.delete("/api/alerts/rules/{rule_id}", dependencies=[Depends(get_api_key)])
+async def delete_alert_rule(rule_id: str):
+    if not await delete_rule(rule_id):
+        raise HTTPException(status_code=404, detail=f"Unknown alert rule {rule_id}")
+    return {"deleted": rule_id}
@@ -0,0 +1,95 @@
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Awaitable, Callable, Optional, Tuple
+from core.cache import UPDATES_CHANNEL
+from core.codec import dumps
+from core.database import redis_cache
+
+class SnapshotCache:
+    """Holds a pre-encoded response body and its ETag until an indicator changes.
+
+    A body built from partial data (build returned "partial": true) is only
+    kept for partial_max_age_seconds. expires_at, given the built data,
+    returns the wall-clock time it goes out of date even without a write
+    (e.g. an indicator falling stale), or None.
+    """
+
+    def __init__(self, build: Callable[[], Awaitable[dict]], max_age_seconds: float, partial_max_age_seconds: float = None,
+                 expires_at: Optional[Callable[[dict], Optional[float]]] = None):
+        self._build = build
+        self._expiry = expires_at
+        self._expires_at: Optional[float] = None
+        self._full_max_age = max_age_seconds
+        self._partial_max_age = max_age_seconds if partial_max_age_seconds is None else partial_max_age_seconds
+        self._max_age = max_age_seconds
+        self._lock = asyncio.Lock()
+        self._generation = 0
+        self._built_generation = -1
+        self._built_at = 0.0
+        self._body: Optional[bytes] = None
+        self._etag: Optional[str] = None
+
+    def invalidate(self) -> None:
+        """Marks the snapshot stale; the next reader rebuilds it."""
+        self._generation += 1
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._body is not None
+            and self._built_generation == self._generation
+            and time.monotonic() - self._built_at < self._max_age
+            and (self._expires_at is None or time.time() < self._expires_at)
+        )
+
+    async def get(self) -> Tuple[bytes, str]:
+        """Returns the cached body and ETag, rebuilding once if they are stale."""
+        if not self._is_fresh():
+            async with self._lock:
+                if not self._is_fresh():
+                    generation = self._generation
+                    data = await self._build()
+                    body = dumps(data)
+                    self._etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+                    self._body = body
+                    self._built_generation = generation
+                    self._built_at = time.monotonic()
+                    self._max_age = self._partial_max_age if data.get("partial") else self._full_max_age
+                    self._expires_at = self._expiry(data) if self._expiry else None
+        return self._body, self._etag
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Checks an If-None-Match header against an ETag using weak comparison."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+async def listen_for_updates(*handlers: Callable[[Optional[str]], None], retry_seconds: float = 5.0):
+    """Passes every published indicator write to the handlers over one subscription.
+
+    Handlers receive the raw message, or None when updates may have been missed.
+    """
+    def dispatch(data: Optional[str]) -> None:
+        for handler in handlers:
+            handler(data)
+
+    while True:
+        try:
+            async with redis_cache.pubsub() as pubsub:
+                await pubsub.subscribe(UPDATES_CHANNEL)
+                # Writes may have been missed while we were not subscribed.
+                dispatch(None)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        dispatch(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.warning(f"Indicator update subscription lost, retrying: {e}")
+            dispatch(None)
+            await asyncio.sleep(retry_seconds)
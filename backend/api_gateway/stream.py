@@ -0,0 +1,76 @@
+import asyncio
+from typing import AsyncIterator, Optional
+from api_gateway.snapshot import SnapshotCache
+
+# Queued in place of an update when a client may have missed some; the
+# client is then sent a fresh full snapshot.
+RESYNC = object()
+
+def sse_event(event: str, data: bytes) -> bytes:
+    """Encodes one Server-Sent Event; data must be a single line (compact JSON)."""
+    return b"event: " + event.encode() + b"\ndata: " + data + b"\n\n"
+
+class Broadcaster:
+    """Fans indicator updates from one Redis subscription out to every stream client.
+
+    Each event is encoded once and the same bytes object is queued for every
+    client, so an idle connection costs one small queue and a suspended generator.
+    """
+
+    def __init__(self, queue_size: int):
+        self._queue_size = queue_size
+        self._queues: set[asyncio.Queue] = set()
+
+    @property
+    def client_count(self) -> int:
+        return len(self._queues)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self._queue_size)
+        self._queues.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._queues.discard(queue)
+
+    def publish(self, message: Optional[str]) -> None:
+        """Queues an update message for every client, or a resync if message is None."""
+        event = RESYNC if message is None else sse_event("indicator", message.encode())
+        for queue in self._queues:
+            if event is not RESYNC and not queue.full():
+                queue.put_nowait(event)
+                continue
+            # A client that cannot keep up drops its backlog and resyncs instead.
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(RESYNC)
+
+async def event_stream(broadcaster: Broadcaster, snapshot: SnapshotCache, keepalive_seconds: float) -> AsyncIterator[bytes]:
+    """Yields a full snapshot, then each indicator update as it is published.
+
+    An "indicator" event is {"key", "service", "data"}, data being the entry
+    to put at snapshot[service][key].
+    """
+    queue = broadcaster.subscribe()
+    try:
+        yield await snapshot_event(snapshot)
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=keepalive_seconds)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            yield await snapshot_event(snapshot) if event is RESYNC else event
+    finally:
+        broadcaster.unsubscribe(queue)
+
+_snapshot_events: dict[str, bytes] = {}
+
+async def snapshot_event(snapshot: SnapshotCache) -> bytes:
+    """Returns the snapshot encoded as an SSE event, shared by every client until it changes."""
+    body, etag = await snapshot.get()
+    event = _snapshot_events.get(etag)
+    if event is None:
+        _snapshot_events.clear()
+        event = _snapshot_events[etag] = sse_event("snapshot", body)
+    return event
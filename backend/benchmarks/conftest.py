@@ -0,0 +1,35 @@
+import asyncio
+import httpx
+import pytest
+import redis
+
+from core import http
+from core.config import settings
+from emulator.main import create_emulator_app
+
+@pytest.fixture(scope="session")
+def run():
+    """Runs a coroutine to completion on one loop shared by every benchmark.
+
+    The Redis and HTTP clients are module-level and bind to the loop they first
+    run on, so benchmarks must not each get a fresh loop.
+    """
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.run_until_complete(http.close_clients())
+    loop.close()
+
+@pytest.fixture(scope="session")
+def emulated_upstreams():
+    """Routes every upstream client through the in-process emulator (no network, no latency)."""
+    http.mount_transport(
+        httpx.ASGITransport(app=create_emulator_app()), http.FRED, http.ALPHA_VANTAGE, http.FEAR_GREED,
+    )
+
+@pytest.fixture(scope="session")
+def local_redis():
+    """Benchmarks that read or write the cache need the Redis at REDIS_URL."""
+    try:
+        redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=0.5).ping()
+    except redis.exceptions.ConnectionError:
+        pytest.skip(f"No Redis at {settings.REDIS_URL}")
@@ -0,0 +1,30 @@
+"""Realistic indicator payloads built from the emulator's fixtures."""
+from core.rolling import MovingAverageState
+from emulator import fixtures
+
+def spy_bars() -> list:
+    series = fixtures.daily_bars("SPY")["Time Series (Daily)"]
+    return sorted((day, float(bar["4. close"])) for day, bar in series.items())
+
+def seeded_state(indicator) -> MovingAverageState:
+    state = MovingAverageState(indicator.params["windows"], indicator.params["history_length"])
+    state.update(spy_bars()[-state.seed_length:])
+    return state
+
+def raw_payload(indicator):
+    """What the indicator's fetcher hands its transform, built from the emulator's fixtures."""
+    if indicator.source == "fred":
+        observations = [o for o in fixtures.fred_observations(indicator.series) if o["value"] != "."]
+        return [{"date": o["date"], "value": float(o["value"])} for o in observations[::-1][:indicator.params["limit"]]]
+    if indicator.source == "alpha_vantage":
+        return fixtures.alpha_vantage_data(indicator.series)
+    if indicator.source == "fear_greed":
+        return {"data": fixtures.fear_greed()[:indicator.params["limit"]]}
+    return seeded_state(indicator)
+
+def processed(indicator) -> dict:
+    history = indicator.transform(raw_payload(indicator))
+    return {
+        "name": indicator.name, "value": indicator.display(history), "status": indicator.status(history),
+        "description": indicator.description, "history": history,
+    }
@@ -0,0 +1,40 @@
+"""Benchmarks of the cache read paths, against the Redis at REDIS_URL (skipped without one)."""
+import httpx
+import pytest
+
+from benchmarks.payloads import processed
+from core.cache import write_indicator
+from core.config import settings
+from core.fred import FredClient
+from core.registry import INDICATORS
+from core.service import create_service_app, read_indicators
+
+@pytest.fixture(scope="module")
+def cached_indicators(local_redis, run, emulated_upstreams):
+    """Writes every indicator, at emulator size, to the cache once."""
+    history_enabled, settings.HISTORY_ENABLED = settings.HISTORY_ENABLED, False
+    try:
+        for indicator in INDICATORS:
+            run(write_indicator(indicator, processed(indicator)))
+    finally:
+        settings.HISTORY_ENABLED = history_enabled
+
+@pytest.mark.parametrize("shape", ["rows", "columnar"])
+def test_read_all_indicators(benchmark, run, cached_indicators, shape):
+    """One pipelined read of every indicator plus decoding, as the gateway's snapshot build does."""
+    data = benchmark(lambda: run(read_indicators(shape=shape)))
+    assert len(data) == len(INDICATORS)
+
+@pytest.mark.parametrize("service", ["economic", "technicals"])
+def test_indicators_endpoint(benchmark, run, cached_indicators, service):
+    """A full GET /indicators through a generated service app, minus the socket."""
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=create_service_app(service)), base_url="http://service")
+    response = benchmark(lambda: run(client.get("/indicators")))
+    assert response.status_code == 200
+
+def test_fred_observations_cache_hit(benchmark, run, local_redis, emulated_upstreams):
+    """A FRED series read that the Redis-cached observations satisfy without an upstream call."""
+    client = FredClient(rate_per_minute=10 ** 9, max_concurrency=8, cache_ttl_seconds=3600)
+    run(client.get_observations("T10Y2Y", 12))
+    observations = benchmark(lambda: run(client.get_observations("T10Y2Y", 12)))
+    assert len(observations) == 12
@@ -0,0 +1,80 @@
+"""CPU benchmarks of the in-process work, on emulator-sized payloads. Needs no Redis."""
+import numpy as np
+import pytest
+
+from benchmarks.payloads import processed, raw_payload, spy_bars
+from core.alpha_vantage import AlphaVantageClient
+from core.alerts import IndicatorRules, Rule
+from core.codec import decode_indicator, dumps, encode_indicator
+from core.compute import ComputeExecutor
+from core.registry import INDICATORS
+from core.rolling import MovingAverageState
+from core.technicals import compute_indicators
+
+@pytest.mark.parametrize("indicator", INDICATORS, ids=lambda i: i.key)
+def test_transform(benchmark, indicator):
+    raw = raw_payload(indicator)
+
+    def transform():
+        history = indicator.transform(raw)
+        return indicator.display(history), indicator.status(history)
+
+    benchmark(transform)
+
+def test_moving_average_seed_from_full_history(benchmark):
+    bars = spy_bars()
+    benchmark(lambda: MovingAverageState((50, 200), 60).update(bars[-260:]))
+
+def test_moving_average_incremental_day(benchmark):
+    """One new bar per scheduler run: what a warm update_moving_averages computes."""
+    bars = spy_bars()
+    state = MovingAverageState((50, 200), 60)
+    state.update(bars[:260])
+    new_days = iter(bars[260:])
+    # Each round must see a day the state has not applied yet.
+    benchmark.pedantic(lambda: state.update([next(new_days)]), rounds=min(2000, len(bars) - 260), iterations=1)
+
+def test_universe_indicators(benchmark):
+    """The technicals service's one vectorized pass over the whole universe."""
+    closes = np.array([close for _, close in spy_bars()])
+    # 15 symbols, 260 days each: offset windows of the same history.
+    closes = np.vstack([closes[len(closes) - 260 - i:len(closes) - i] for i in range(15)])
+    benchmark(compute_indicators, closes)
+
+@pytest.mark.parametrize("kind", ["inline", "thread", "process"])
+def test_universe_indicators_executor(benchmark, run, kind):
+    """The same pass through the compute executor: what moving it off the event loop costs per refresh."""
+    closes = np.array([close for _, close in spy_bars()])
+    closes = np.vstack([closes[len(closes) - 260 - i:len(closes) - i] for i in range(15)])
+    executor = ComputeExecutor(kind, workers=1)
+    run(executor.run("technicals:universe", closes))  # start the pool outside the timing
+    try:
+        benchmark(lambda: run(executor.run("technicals:universe", closes)))
+    finally:
+        executor.shutdown()
+
+def test_alert_rules_match(benchmark):
+    """Checking one indicator update against 50,000 rules on it: bisects, not a scan."""
+    rng = np.random.default_rng(3)
+    rules = [
+        Rule.from_dict({"indicator": "vix", "kind": kind, "threshold": float(threshold)})
+        for kind in ("above", "below") for threshold in rng.uniform(10, 80, 20000)
+    ] + [Rule.from_dict({"indicator": "vix", "kind": "move", "threshold": float(t)}) for t in rng.uniform(-50, 50, 10000)]
+    index = IndicatorRules(rules)
+    benchmark(index.match, 20.0, 20.4, "neutral", "neutral")
+
+@pytest.mark.parametrize("indicator", INDICATORS, ids=lambda i: i.key)
+def test_encode_indicator(benchmark, indicator):
+    benchmark(encode_indicator, processed(indicator))
+
+@pytest.mark.parametrize("shape", ["rows", "columnar"])
+def test_decode_and_render_all_indicators(benchmark, shape):
+    """The CPU side of /indicators for every indicator: unpack from the cache and encode the response."""
+    packed = [encode_indicator(processed(indicator)) for indicator in INDICATORS]
+    benchmark(lambda: dumps({str(i): decode_indicator(data, shape) for i, data in enumerate(packed)}))
+
+def test_alpha_vantage_full_history_fetch(benchmark, run, emulated_upstreams):
+    """Fetching and parsing the full SPY history through the real client, served by the emulator."""
+    client = AlphaVantageClient(rate_per_minute=10 ** 9, max_concurrency=4)
+    bars = benchmark(lambda: run(client.get_daily_closes("SPY", "full")))
+    assert len(bars) > 6000
@@ -0,0 +1,35 @@
+"""Cold-start benchmarks: a fresh interpreter importing an app and running its lifespan startup.
+
+This is what a container the orchestrator scales up spends before it can
+serve. Needs no Redis; the background watchers just log that it is missing.
+"""
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+START = """
+import asyncio
+from {module} import app
+
+async def start():
+    async with app.router.lifespan_context(app):
+        pass
+
+asyncio.run(start())
+"""
+
+@pytest.mark.parametrize("module", [
+    "services.economic_service.main",
+    "services.sentiment_service.main",
+    "services.technicals_service.main",
+    "services.cross_asset_service.main",
+    "api_gateway.main",
+])
+def test_cold_start(benchmark, module):
+    def start():
+        subprocess.run([sys.executable, "-c", START.format(module=module)], cwd=BACKEND, check=True, capture_output=True)
+
+    benchmark.pedantic(start, rounds=5, iterations=1, warmup_rounds=1)
@@ -0,0 +1,323 @@
+"""Alert rules on indicators, checked as each indicator is ingested.
+
+A rule watches one indicator (by registry key) for one kind of event
+between its previous and latest point:
+
+- "above" / "below": the indicator's signal crosses `threshold` upwards / downwards
+- "move": the signal changes by at least `threshold` percent (negative for falls)
+- "status": the indicator's status turns into `status` (e.g. "bearish")
+
+Rules live in the Redis hash RULES_KEY. Every process keeps them in an
+in-memory index keyed by indicator, with crossing and move thresholds in
+sorted lists, so an ingestion only bisects the rules of the indicator that
+changed. An indicator whose latest point has already been checked is skipped.
+A fired alert is sent once per event (ALERTS_DEDUP_SECONDS) and at most once
+per rule every throttleSeconds, then delivered through the configured sink.
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Iterable, Optional, Tuple
+from .config import settings
+from .database import redis_cache
+from .http import ALERTS, get_client
+from .metrics import ALERTS_SENT
+from .registry import Indicator, get_indicator
+
+RULES_KEY = "alerts:rules"
+RULES_VERSION_KEY = "alerts:rules:version"
+CHECKED_KEY = "alerts:checked"
+DEDUP_PREFIX = "alerts:sent:"
+THROTTLE_PREFIX = "alerts:throttle:"
+RULE_KINDS = ("above", "below", "move", "status")
+
+# Returns 1 to send, 0 for an event already sent, -1 while the rule is throttled.
+_CLAIM = """
+if redis.call('exists', KEYS[2]) == 1 then
+    return -1
+end
+if not redis.call('set', KEYS[1], 1, 'NX', 'EX', ARGV[1]) then
+    return 0
+end
+if tonumber(ARGV[2]) > 0 then
+    redis.call('set', KEYS[2], 1, 'EX', ARGV[2])
+end
+return 1
+"""
+_claim = redis_cache.register_script(_CLAIM)
+
+@dataclass(frozen=True)
+class Rule:
+    id: str
+    indicator: str
+    kind: str
+    threshold: Optional[float] = None
+    status: Optional[str] = None
+    throttle_seconds: Optional[int] = None  # ALERTS_THROTTLE_SECONDS if None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id, "indicator": self.indicator, "kind": self.kind, "threshold": self.threshold,
+            "status": self.status, "throttleSeconds": self.throttle_seconds,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Rule":
+        """Validates a rule as submitted or stored; raises ValueError naming what is wrong."""
+        kind = data.get("kind")
+        if kind not in RULE_KINDS:
+            raise ValueError(f"kind must be one of {', '.join(RULE_KINDS)}")
+        if get_indicator(data.get("indicator", "")) is None:
+            raise ValueError(f"Unknown indicator: {data.get('indicator')}")
+        if kind == "status":
+            if not isinstance(data.get("status"), str):
+                raise ValueError("A status rule needs the status to watch for")
+        elif not isinstance(data.get("threshold"), (int, float)) or (kind == "move" and not data["threshold"]):
+            raise ValueError(f"A {kind} rule needs a numeric threshold" + (" other than 0" if kind == "move" else ""))
+        throttle = data.get("throttleSeconds")
+        if throttle is not None and (not isinstance(throttle, int) or throttle < 0):
+            raise ValueError("throttleSeconds must be a non-negative integer")
+        return cls(
+            id=data.get("id") or uuid.uuid4().hex, indicator=data["indicator"], kind=kind,
+            threshold=None if kind == "status" else float(data["threshold"]),
+            status=data.get("status") if kind == "status" else None, throttle_seconds=throttle,
+        )
+
+class _Thresholds:
+    """Rules sorted by threshold, for bisecting out the ones an event reaches."""
+
+    def __init__(self, rules: Iterable[tuple]):
+        pairs = sorted(rules, key=lambda pair: pair[0])
+        self.keys = [threshold for threshold, _ in pairs]
+        self.rules = [rule for _, rule in pairs]
+
+    def span(self, start: int, end: int) -> list:
+        return self.rules[start:end]
+
+class IndicatorRules:
+    """One indicator's rules, indexed by what would fire them."""
+
+    def __init__(self, rules: Iterable[Rule]):
+        by_kind = defaultdict(list)
+        for rule in rules:
+            by_kind[rule.kind].append(rule)
+        self.above = _Thresholds((r.threshold, r) for r in by_kind["above"])
+        self.below = _Thresholds((r.threshold, r) for r in by_kind["below"])
+        self.rises = _Thresholds((r.threshold, r) for r in by_kind["move"] if r.threshold > 0)
+        self.falls = _Thresholds((-r.threshold, r) for r in by_kind["move"] if r.threshold < 0)
+        self.statuses = defaultdict(list)
+        for rule in by_kind["status"]:
+            self.statuses[rule.status].append(rule)
+
+    def match(self, previous: Optional[float], value: Optional[float],
+              previous_status: Optional[str], status: Optional[str]) -> list:
+        """The rules fired by moving from (previous, previous_status) to (value, status)."""
+        fired = []
+        if previous is not None and value is not None:
+            if value > previous:
+                # Crossed upwards: previous <= threshold < value
+                a = self.above
+                fired += a.span(bisect_left(a.keys, previous), bisect_left(a.keys, value))
+            elif value < previous:
+                # Crossed downwards: value < threshold <= previous
+                b = self.below
+                fired += b.span(bisect_right(b.keys, value), bisect_right(b.keys, previous))
+            if previous != 0 and value != previous:
+                move = (value - previous) / abs(previous) * 100
+                moves = self.rises if move > 0 else self.falls
+                fired += moves.span(0, bisect_right(moves.keys, abs(move)))
+        if status is not None and status != previous_status:
+            fired += self.statuses.get(status, [])
+        return fired
+
+class RuleIndex:
+    """Every rule, grouped by indicator; refresh() reloads it when the rule set changes."""
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._by_indicator: dict[str, IndicatorRules] = {}
+        self._loaded = False
+        self._version = None
+
+    def load(self, rules: Iterable[Rule]) -> None:
+        grouped = defaultdict(list)
+        for rule in rules:
+            grouped[rule.indicator].append(rule)
+        self._by_indicator = {key: IndicatorRules(group) for key, group in grouped.items()}
+
+    def rules_for(self, key: str) -> Optional[IndicatorRules]:
+        return self._by_indicator.get(key)
+
+    async def refresh(self) -> None:
+        """Reloads the rules if their version has moved since the last load."""
+        version = await redis_cache.get(RULES_VERSION_KEY)
+        if self._loaded and version == self._version:
+            return
+        stored = await redis_cache.hgetall(RULES_KEY)
+        rules = []
+        for data in stored.values():
+            try:
+                rules.append(Rule.from_dict(json.loads(data)))
+            except ValueError as e:
+                logging.warning(f"Skipping invalid alert rule {data}: {e}")
+        self.load(rules)
+        self._loaded, self._version = True, version
+        logging.info(f"Loaded {len(rules)} alert rules.")
+
+    async def watch(self) -> None:
+        """Refreshes the index every refresh_seconds until cancelled; errors keep the last rules."""
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logging.error(f"Could not refresh alert rules: {e!r}")
+            await asyncio.sleep(self.refresh_seconds)
+
+rule_index = RuleIndex(settings.ALERTS_REFRESH_SECONDS)
+
+# --- Sinks ---
+
+class LogSink:
+    """Logs alerts; the default when no webhook is configured."""
+
+    async def send(self, alert: dict) -> None:
+        logging.warning(f"Alert: {alert['message']}")
+
+class MemorySink:
+    """Keeps the latest alerts in memory, for tests and local runs."""
+
+    def __init__(self, maxlen: int = 1000):
+        self.alerts = deque(maxlen=maxlen)
+
+    async def send(self, alert: dict) -> None:
+        self.alerts.append(alert)
+
+class WebhookSink:
+    """POSTs each alert as JSON to a URL."""
+
+    def __init__(self, url: str):
+        self.url = url
+
+    async def send(self, alert: dict) -> None:
+        response = await get_client(ALERTS).post(self.url, json=alert)
+        response.raise_for_status()
+
+def default_sink():
+    return WebhookSink(settings.ALERTS_WEBHOOK_URL) if settings.ALERTS_WEBHOOK_URL else LogSink()
+
+sink = default_sink()
+
+# --- Checking ---
+
+def _latest(indicator: Indicator, history: list) -> Tuple[Optional[float], Optional[float], Optional[str], Optional[str]]:
+    """(previous signal, signal, previous status, status): the last point's and the one before it's.
+
+    Any of them is None if unusable. A status that compares points (e.g.
+    direction) has none before the second point, so with two points the
+    previous status is None.
+    """
+    def signal(point):
+        try:
+            return float(indicator.signal(point))
+        except (KeyError, TypeError, ValueError, ZeroDivisionError):
+            return None
+
+    def status(points):
+        try:
+            return indicator.status(points)
+        except IndexError:
+            return None
+
+    return signal(history[-2]), signal(history[-1]), status(history[:-1]), status(history)
+
+def describe(rule: Rule, indicator: Indicator, previous, value, status) -> str:
+    if rule.kind == "status":
+        return f"{indicator.name} turned {status}"
+    if rule.kind == "move":
+        return f"{indicator.name} moved {(value - previous) / abs(previous) * 100:+.1f}% ({previous:g} to {value:g})"
+    return f"{indicator.name} crossed {rule.kind} {rule.threshold:g} ({previous:g} to {value:g})"
+
+def alerts_for(indicator: Indicator, history: list, rules: IndicatorRules) -> list:
+    """The (rule, alert) pairs an indicator's latest point raises against its rules."""
+    if len(history) < 2:
+        return []
+    previous, value, previous_status, status = _latest(indicator, history)
+    as_of = str(history[-1]["name"])
+    return [
+        (rule, {
+            "ruleId": rule.id, "indicator": indicator.key, "name": indicator.name, "kind": rule.kind,
+            "threshold": rule.threshold, "status": status, "previousStatus": previous_status,
+            "value": value, "previous": previous, "asOf": as_of, "firedAt": time.time(),
+            "message": describe(rule, indicator, previous, value, status),
+        })
+        for rule in rules.match(previous, value, previous_status, status)
+    ]
+
+async def _claim_all(fired: list) -> list:
+    """Dedups and throttles (rule, alert) pairs in one round trip; returns the alerts to send."""
+    async with redis_cache.pipeline(transaction=False) as pipe:
+        for rule, alert in fired:
+            throttle = settings.ALERTS_THROTTLE_SECONDS if rule.throttle_seconds is None else rule.throttle_seconds
+            await _claim(
+                keys=[f"{DEDUP_PREFIX}{rule.id}:{alert['asOf']}", THROTTLE_PREFIX + rule.id],
+                args=[settings.ALERTS_DEDUP_SECONDS, throttle], client=pipe,
+            )
+        claims = await pipe.execute()
+    send = []
+    for (_, alert), claim in zip(fired, claims):
+        if claim == 1:
+            send.append(alert)
+        else:
+            ALERTS_SENT.labels(alert["indicator"], "duplicate" if claim == 0 else "throttled").inc()
+    return send
+
+async def _deliver(alert: dict) -> None:
+    try:
+        await sink.send(alert)
+        ALERTS_SENT.labels(alert["indicator"], "sent").inc()
+    except Exception as e:
+        ALERTS_SENT.labels(alert["indicator"], "failed").inc()
+        logging.error(f"Failed to deliver alert for rule {alert['ruleId']}: {e!r}")
+
+async def check_alerts(indicator: Indicator, history: list) -> None:
+    """Checks an indicator's freshly ingested history against its rules and sends what fires.
+
+    Failures are logged, never raised to ingestion.
+    """
+    rules = rule_index.rules_for(indicator.key)
+    if not settings.ALERTS_ENABLED or rules is None or not history:
+        return
+    try:
+        # Only a new latest point can raise anything new.
+        latest = json.dumps(history[-1], sort_keys=True, default=str)
+        if await redis_cache.hget(CHECKED_KEY, indicator.key) == latest:
+            return
+        fired = alerts_for(indicator, history, rules)
+        if fired:
+            await asyncio.gather(*(_deliver(alert) for alert in await _claim_all(fired)))
+        await redis_cache.hset(CHECKED_KEY, indicator.key, latest)
+    except Exception as e:
+        logging.error(f"Failed to check alerts for {indicator.key}: {e!r}")
+
+# --- Rule storage ---
+
+async def save_rule(rule: Rule) -> None:
+    async with redis_cache.pipeline(transaction=True) as pipe:
+        pipe.hset(RULES_KEY, rule.id, json.dumps(rule.to_dict()))
+        pipe.incr(RULES_VERSION_KEY)
+        await pipe.execute()
+
+async def delete_rule(rule_id: str) -> bool:
+    async with redis_cache.pipeline(transaction=True) as pipe:
+        pipe.hdel(RULES_KEY, rule_id)
+        pipe.incr(RULES_VERSION_KEY)
+        deleted, _ = await pipe.execute()
+    return bool(deleted)
+
+async def list_rules() -> list:
+    return [json.loads(data) for data in (await redis_cache.hgetall(RULES_KEY)).values()]
@@ -0,0 +1,48 @@
+import asyncio
+from .config import settings
+from .http import ALPHA_VANTAGE, get_client
+from .metrics import RATE_LIMIT_BUDGET, upstream_timer
+from .ratelimit import TokenBucket
+
+ALPHA_VANTAGE_URL = f"{settings.ALPHA_VANTAGE_BASE_URL}/query"
+
+class AlphaVantageError(Exception):
+    """Raised when Alpha Vantage answers 200 with an error or throttling notice."""
+
+class AlphaVantageClient:
+    """Rate-limited Alpha Vantage client shared by every service that reads it."""
+
+    def __init__(self, rate_per_minute: int, max_concurrency: int):
+        self._bucket = TokenBucket(rate_per_minute / 60.0, capacity=max(1, max_concurrency))
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @property
+    def remaining_budget(self) -> float:
+        return self._bucket.remaining
+
+    async def query(self, **params) -> dict:
+        """Calls the query endpoint with the given parameters and returns the JSON body."""
+        async with self._semaphore:
+            await self._bucket.acquire()
+            with upstream_timer(ALPHA_VANTAGE, params.get("symbol", params.get("function"))):
+                response = await get_client(ALPHA_VANTAGE).get(
+                    ALPHA_VANTAGE_URL, params={**params, "apikey": settings.ALPHA_VANTAGE_API_KEY}
+                )
+                response.raise_for_status()
+                data = response.json()
+                for notice in ("Error Message", "Note", "Information"):
+                    if notice in data and len(data) == 1:
+                        raise AlphaVantageError(data[notice])
+        return data
+
+    async def get_daily_closes(self, symbol: str, outputsize: str = "compact") -> list:
+        """Returns a symbol's daily (ISO date, close) bars, oldest first."""
+        data = await self.query(function="TIME_SERIES_DAILY", symbol=symbol, outputsize=outputsize)
+        series = data.get("Time Series (Daily)", {})
+        return sorted((day, float(bar["4. close"])) for day, bar in series.items())
+
+alpha_vantage_client = AlphaVantageClient(
+    rate_per_minute=settings.ALPHA_VANTAGE_RATE_LIMIT_PER_MINUTE,
+    max_concurrency=settings.ALPHA_VANTAGE_MAX_CONCURRENCY,
+)
+RATE_LIMIT_BUDGET.labels(ALPHA_VANTAGE).set_function(lambda: alpha_vantage_client.remaining_budget)
@@ -0,0 +1,90 @@
+import json
+import time
+from typing import Optional
+from .codec import dumps, encode_indicator
+from .config import settings
+from .database import redis_binary, redis_cache
+from .metrics import REDIS_LATENCY
+from .history import record_history_later
+from .registry import Indicator
+
+# Every write bumps the version key and publishes {"key", "service", "data"}
+# on the updates channel, so readers can invalidate or stream without polling.
+INDICATOR_KEY_PREFIX = "indicator:"
+VERSION_KEY = "indicators:version"
+UPDATES_CHANNEL = "indicators:updates"
+# Hash of registry key -> {"fetchedAt", "expiresAt"} for every indicator and job
+META_KEY = "indicators:meta"
+
+def indicator_key(name: str) -> str:
+    """Returns the Redis key an indicator is cached under."""
+    return f"{INDICATOR_KEY_PREFIX}{name}"
+
+def _refreshed_meta(ttl_seconds: int) -> dict:
+    now = int(time.time())
+    return {"fetchedAt": now, "expiresAt": now + ttl_seconds}
+
+async def write_indicator(indicator: Indicator, payload: dict) -> None:
+    """Stores an indicator in the cache, marks it refreshed, notifies subscribers and starts recording its history.
+
+    The cached copy is packed (see core.codec). Subscribers get plain JSON
+    whose data is shaped like the indicator in a snapshot: rows history,
+    "updatedAt", "expiresAt" and "stale".
+    """
+    meta = _refreshed_meta(indicator.refresh_seconds)
+    data = {**payload, "updatedAt": meta["fetchedAt"], "expiresAt": meta["expiresAt"], "stale": False}
+    update = {"key": indicator.key, "service": indicator.service, "data": data}
+    async with redis_binary.pipeline(transaction=True) as pipe:
+        pipe.set(indicator_key(indicator.name), encode_indicator(payload))
+        pipe.hset(META_KEY, indicator.key, json.dumps(meta))
+        pipe.incr(VERSION_KEY)
+        pipe.publish(UPDATES_CHANNEL, dumps(update))
+        with REDIS_LATENCY.labels("write_indicator").time():
+            await pipe.execute()
+    record_history_later(indicator.name, payload)
+
+async def read_cached(names: dict) -> tuple:
+    """Reads cached indicators and their refresh metadata in one pipelined round trip.
+
+    names maps indicator names to registry keys, as registry.key_map does.
+    Returns the packed payloads and the raw metadata, both in that order and
+    None where missing.
+    """
+    async with redis_binary.pipeline(transaction=False) as pipe:
+        pipe.mget([indicator_key(name) for name in names])
+        pipe.hmget(META_KEY, list(names.values()))
+        with REDIS_LATENCY.labels("read_indicators").time():
+            payloads, metas = await pipe.execute()
+    return payloads, metas
+
+async def mark_refreshed(key: str, ttl_seconds: int) -> None:
+    """Records that an indicator or job was refreshed and when it next falls due."""
+    await redis_cache.hset(META_KEY, key, json.dumps(_refreshed_meta(ttl_seconds)))
+
+async def mark_failed(key: str) -> float:
+    """Records a failed refresh and backs off retrying it, exponentially up to a cap; returns the delay.
+
+    The indicator keeps its last fetch time and stays stale, but is not due
+    again until retryAt. The next successful refresh clears the failures.
+    """
+    meta = await redis_cache.hget(META_KEY, key)
+    meta = json.loads(meta) if meta else {}
+    failures = meta.get("failures", 0) + 1
+    delay = min(settings.REFRESH_RETRY_BASE_SECONDS * 2 ** (failures - 1), settings.REFRESH_RETRY_MAX_SECONDS)
+    meta.update(failures=failures, retryAt=int(time.time() + delay))
+    await redis_cache.hset(META_KEY, key, json.dumps(meta))
+    return delay
+
+def is_due(meta: Optional[dict], now: float) -> bool:
+    """Whether refresh metadata says to refresh now: expired or never refreshed, and not backing off."""
+    meta = meta or {}
+    return meta.get("expiresAt", 0) <= now and meta.get("retryAt", 0) <= now
+
+async def is_fresh(key: str) -> bool:
+    """Whether an indicator or job needs no refresh yet: not fallen due, or backing off after a failure."""
+    meta = await redis_cache.hget(META_KEY, key)
+    return not is_due(json.loads(meta) if meta else None, time.time())
+
+async def read_refresh_meta() -> dict:
+    """Returns the refresh metadata of every indicator and job, keyed by registry key."""
+    return {key: json.loads(meta) for key, meta in (await redis_cache.hgetall(META_KEY)).items()}
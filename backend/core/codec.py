@@ -0,0 +1,89 @@
+import json
+from typing import Any
+import msgpack
+import numpy as np
+import orjson
+from fastapi import Response
+from .rolling import from_day, to_day
+
+# Response shapes for an indicator's history: a list of points, or one list per field.
+SHAPES = ("rows", "columnar")
+
+def dumps(data: Any) -> bytes:
+    """Encodes a response body as compact JSON, NumPy arrays included."""
+    return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+class OrjsonResponse(Response):
+    """A JSON response encoded with orjson, skipping FastAPI's jsonable_encoder pass."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def columnar(history: list) -> dict:
+    """Turns history points into {"name": [...], <field>: [...]} columns."""
+    fields = list(history[0]) if history else ["name"]
+    return {field: [point.get(field) for point in history] for field in fields}
+
+def _pack_names(names: list) -> dict:
+    # Point names are ISO dates or Unix timestamps; anything else is kept as text.
+    if names and all(isinstance(n, str) and n.isdigit() for n in names):
+        return {"kind": "epoch", "data": np.array([int(n) for n in names], dtype=np.int64).tobytes()}
+    try:
+        days = [to_day(n) for n in names]
+    except (TypeError, ValueError):
+        days = None
+    if days is not None and all(from_day(d) == n for d, n in zip(days, names)):
+        return {"kind": "day", "data": np.array(days, dtype=np.int32).tobytes()}
+    return {"kind": "text", "data": names}
+
+def _unpack_names(packed: dict) -> list:
+    if packed["kind"] == "epoch":
+        return [str(t) for t in np.frombuffer(packed["data"], dtype=np.int64).tolist()]
+    if packed["kind"] == "day":
+        return [from_day(d) for d in np.frombuffer(packed["data"], dtype=np.int32).tolist()]
+    return packed["data"]
+
+def _pack_values(values: list) -> dict:
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+        return {"dtype": "<i8", "data": np.array(values, dtype=np.int64).tobytes()}
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+        return {"dtype": "<f8", "data": np.array(values, dtype=np.float64).tobytes()}
+    return {"dtype": None, "data": values}
+
+def _unpack_values(packed: dict) -> list:
+    if packed["dtype"] is None:
+        return packed["data"]
+    return np.frombuffer(packed["data"], dtype=packed["dtype"]).tolist()
+
+def encode_indicator(payload: dict) -> bytes:
+    """Packs an indicator for Redis: msgpack, with history stored as packed columns."""
+    if "history" not in payload:
+        return msgpack.packb(payload, use_bin_type=True)
+    columns = columnar(payload["history"])
+    packed = {**payload, "history": {
+        "name": _pack_names(columns.pop("name")),
+        "fields": {field: _pack_values(values) for field, values in columns.items()},
+    }}
+    return msgpack.packb(packed, use_bin_type=True)
+
+def decode_indicator(data: bytes, shape: str = "rows") -> dict:
+    """Unpacks a cached indicator with its history in the requested shape."""
+    if data[:1] == b"{":
+        # Written as JSON before the packed format existed.
+        payload = json.loads(data)
+        if shape == "columnar" and "history" in payload:
+            payload["history"] = columnar(payload["history"])
+        return payload
+    payload = msgpack.unpackb(data, raw=False)
+    if "history" not in payload:
+        return payload
+    packed = payload["history"]
+    columns = {"name": _unpack_names(packed["name"])}
+    columns.update((field, _unpack_values(values)) for field, values in packed["fields"].items())
+    if shape == "columnar":
+        payload["history"] = columns
+    else:
+        fields = list(columns)
+        payload["history"] = [dict(zip(fields, point)) for point in zip(*columns.values())]
+    return payload
@@ -0,0 +1,144 @@
+"""Runs CPU-heavy transforms off the event loop, so reads stay responsive while ingestion computes.
+
+Transforms take NumPy arrays (plus small keyword arguments) and return an
+array or a dict of arrays. They are registered by name with @transform and
+run with `await compute.run(name, *arrays, **kwargs)`. COMPUTE_EXECUTOR picks
+where they run:
+
+- "thread": a pool of COMPUTE_WORKERS threads. Arrays are passed by
+  reference, and NumPy releases the GIL inside its kernels.
+- "process": a pool of COMPUTE_WORKERS processes. Arrays travel through
+  shared memory, so only their names, shapes and dtypes are pickled.
+- "inline": on the calling thread, for tests and debugging.
+"""
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any, Callable, Optional
+import numpy as np
+from .config import settings
+from .metrics import COMPUTE_CPU
+
+_TRANSFORMS: dict[str, Callable] = {}
+
+def transform(name: str) -> Callable[[Callable], Callable]:
+    """Registers a module-level function as a compute transform under `name`."""
+    def register(func: Callable) -> Callable:
+        _TRANSFORMS[name] = func
+        return func
+    return register
+
+@dataclass(frozen=True)
+class SharedArray:
+    """Where to find an array in shared memory."""
+    name: str
+    shape: tuple
+    dtype: str
+
+def _share(array: np.ndarray) -> tuple:
+    segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, array.dtype, buffer=segment.buf)[...] = array
+    return segment, SharedArray(segment.name, array.shape, array.dtype.str)
+
+def _attach(shared: SharedArray) -> tuple:
+    segment = shared_memory.SharedMemory(name=shared.name)
+    return segment, np.ndarray(shared.shape, np.dtype(shared.dtype), buffer=segment.buf)
+
+def _map_arrays(result: Any, func: Callable) -> Any:
+    if isinstance(result, dict):
+        return {key: _map_arrays(value, func) for key, value in result.items()}
+    return func(result) if isinstance(result, (np.ndarray, SharedArray)) else result
+
+def _timed(func: Callable, args: tuple, kwargs: dict) -> tuple:
+    started = time.thread_time()
+    result = func(*args, **kwargs)
+    return result, time.thread_time() - started
+
+def _compute_shared(func: Callable, args: tuple, kwargs: dict, segments: list) -> tuple:
+    # Views into the segments must all be gone before they can be closed, so
+    # they only ever live in this frame.
+    arrays = []
+    for arg in args:
+        if isinstance(arg, SharedArray):
+            segment, arg = _attach(arg)
+            segments.append(segment)
+        arrays.append(arg)
+    result, cpu = _timed(func, tuple(arrays), kwargs)
+
+    def share(array):
+        segment, shared = _share(np.ascontiguousarray(array))
+        segment.close()
+        return shared
+    return _map_arrays(result, share), cpu
+
+def _run_shared(func: Callable, args: tuple, kwargs: dict) -> tuple:
+    """Worker side of the process pool: inputs and outputs stay in shared memory.
+
+    Pool workers share the parent's resource tracker, and the parent unlinks
+    every segment once it is done with it, inputs and outputs alike.
+    """
+    segments = []
+    try:
+        return _compute_shared(func, args, kwargs, segments)
+    finally:
+        for segment in segments:
+            segment.close()
+
+def _collect(shared: SharedArray) -> np.ndarray:
+    segment = shared_memory.SharedMemory(name=shared.name)
+    try:
+        return np.ndarray(shared.shape, np.dtype(shared.dtype), buffer=segment.buf).copy()
+    finally:
+        segment.close()
+        segment.unlink()
+
+class ComputeExecutor:
+    """Runs registered transforms on a lazily started thread or process pool."""
+
+    def __init__(self, kind: str, workers: int):
+        self.kind = kind
+        self.workers = workers
+        self._pool: Optional[Executor] = None
+
+    def _executor(self) -> Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="compute")
+        return self._pool
+
+    async def run(self, name: str, *args, **kwargs) -> Any:
+        """Runs the transform registered as `name` and records its CPU time under that step."""
+        func = _TRANSFORMS[name]
+        if self.kind == "inline":
+            result, cpu = _timed(func, args, kwargs)
+        elif self.kind == "thread":
+            result, cpu = await asyncio.get_running_loop().run_in_executor(self._executor(), _timed, func, args, kwargs)
+        else:
+            result, cpu = await self._run_in_process(func, args, kwargs)
+        COMPUTE_CPU.labels(name).observe(cpu)
+        return result
+
+    async def _run_in_process(self, func: Callable, args: tuple, kwargs: dict) -> tuple:
+        shared = [_share(np.ascontiguousarray(arg)) if isinstance(arg, np.ndarray) else (None, arg) for arg in args]
+        try:
+            result, cpu = await asyncio.get_running_loop().run_in_executor(
+                self._executor(), _run_shared, func, tuple(arg for _, arg in shared), kwargs,
+            )
+        finally:
+            for segment, _ in shared:
+                if segment:
+                    segment.close()
+                    segment.unlink()
+        return _map_arrays(result, _collect), cpu
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+compute = ComputeExecutor(settings.COMPUTE_EXECUTOR, settings.COMPUTE_WORKERS)
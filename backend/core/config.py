@@ -1,22 +1,167 @@
+from typing import Literal
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
-    """Manages application settings and environment variables."""
-    ALPHA_VANTAGE_API_KEY: str
-    FINNHUB_API_KEY: str
-    FRED_API_KEY: str
-    DATABASE_URL: str
+    """Manages application settings and environment variables.
+
+    Only REDIS_URL is needed by every process. Credentials and URLs that only
+    some of them use default to empty, and each entry point checks the ones
+    it needs with require() when it starts.
+    """
+    ALPHA_VANTAGE_API_KEY: str = ""
+    FINNHUB_API_KEY: str = ""
+    FRED_API_KEY: str = ""
+    DATABASE_URL: str = ""
     REDIS_URL: str
-    API_KEY: str
-    SCHEDULER_INTERVAL_HOURS: int = 4
+    API_KEY: str = ""
+    SCHEDULER_INTERVAL_HOURS: int = 4  # default refresh policy for indicators without their own
+    SCHEDULER_TICK_MINUTES: int = 5     # how often the scheduler looks for due indicators
+    SCHEDULER_JITTER_SECONDS: float = 30.0
+    SCHEDULER_JOB_TIMEOUT_SECONDS: float = 900.0  # how long the scheduler follows one refresh job
+    SCHEDULER_READY_TIMEOUT_SECONDS: float = 60.0  # how long the scheduler waits for services' /ready at startup
+    # Serve expired indicators flagged "stale" while refreshing them in the background.
+    STALE_WHILE_REVALIDATE: bool = True
+    # A failed refresh is retried after the base delay, doubling per consecutive
+    # failure up to the cap, instead of on every scheduler tick or stale read.
+    REFRESH_RETRY_BASE_SECONDS: int = 60
+    REFRESH_RETRY_MAX_SECONDS: int = 3600
+    # Leases in Redis: one replica refreshes an indicator at a time (renewed while
+    # it runs) and one scheduler container fires its jobs.
+    REFRESH_LOCK_SECONDS: float = 60.0
+    SCHEDULER_LEASE_SECONDS: float = 30.0
+    # Refresh jobs (see core/refresh_jobs.py): keys refreshed at once per
+    # service, and how long job records and completion events are kept.
+    REFRESH_CONCURRENCY: int = 4
+    REFRESH_JOB_TTL_SECONDS: int = 86400
+    REFRESH_EVENTS_MAXLEN: int = 1000
+    # "services": the gateway forwards to one process per service.
+    # "monolith": every service runs inside the gateway process, mounted at
+    # /services/<name>, and the gateway calls them in-process.
+    RUN_MODE: Literal["services", "monolith"] = "services"
+    # Persist every indicator's history to Postgres on write (see core/history.py)
+    HISTORY_ENABLED: bool = True
+    # Bounds on connecting to Postgres and on any one statement, so an
+    # unreachable database fails fast instead of after asyncpg's 60s default.
+    DATABASE_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    DATABASE_COMMAND_TIMEOUT_SECONDS: float = 30.0
+
+    # Upper bound on how long the gateway serves a pre-encoded /api/all snapshot
+    # if an update notification is missed.
+    SNAPSHOT_MAX_AGE_SECONDS: int = 300
+    # A snapshot with failed sections is rebuilt sooner, once services recover.
+    SNAPSHOT_PARTIAL_MAX_AGE_SECONDS: int = 5
+
+    # Where /api/all reads indicators: "redis" reads the shared cache directly
+    # in one round trip; "services" fans out to each service's /indicators.
+    GATEWAY_READ_PATH: Literal["redis", "services"] = "redis"
+
+    # Gateway fan-out: the whole /api/all build finishes within the deadline.
+    # Each service gets its budget (capped by the deadline, less the time kept
+    # for a fallback read from Redis), and a second request is hedged once a
+    # call runs past the service's recent p95.
+    GATEWAY_DEADLINE_SECONDS: float = 2.0
+    GATEWAY_FALLBACK_SECONDS: float = 0.25
+    GATEWAY_SERVICE_BUDGETS_SECONDS: dict[str, float] = {"default": 1.5}
+    GATEWAY_HEDGE_PERCENTILE: int = 95
+
+    # Composite regime score (see core/regime.py). Weights are per indicator
+    # key; the sign says which direction is bullish and 0 leaves an indicator
+    # out of the score (it still gets a z-score and correlations).
+    REGIME_ENABLED: bool = True
+    REGIME_WEIGHTS: dict[str, float] = {
+        "yieldCurve": 1.0, "ismPmi": 1.0, "joblessClaims": -1.0, "vix": -1.0,
+        "fearGreed": -0.5, "movingAverages": 1.0, "bondSpreads": -1.0, "gold": 0.0,
+    }
+    REGIME_Z_CLIP: float = 3.0
+    REGIME_THRESHOLD: float = 0.5           # |score| beyond this is bullish or bearish
+    REGIME_CORRELATION_WINDOW_DAYS: int = 60
+    REGIME_HISTORY_DAYS: int = 365
+
+    # Alerts (see core/alerts.py): a webhook to POST them to (logged if unset),
+    # how often one rule may fire, how long a sent event is remembered, and how
+    # often each process re-checks the rule set for changes.
+    ALERTS_ENABLED: bool = True
+    ALERTS_WEBHOOK_URL: str = ""
+    ALERTS_THROTTLE_SECONDS: int = 3600
+    ALERTS_DEDUP_SECONDS: int = 86400
+    ALERTS_REFRESH_SECONDS: float = 5.0
+
+    # /api/stream: per-client backlog before a client is resynced, and the
+    # comment interval that keeps idle connections open through proxies.
+    STREAM_QUEUE_SIZE: int = 64
+    STREAM_KEEPALIVE_SECONDS: float = 15.0
+
+    # Shared HTTP client pools (see core/http.py); timeouts are per upstream.
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    HTTP_TIMEOUTS: dict[str, float] = {
+        "default": 10.0,
+        "fred": 10.0,
+        "alpha_vantage": 30.0,
+        "fear_greed": 10.0,
+        "services": 15.0,
+        "scheduler": 60.0,
+    }
+
+    # Shared FRED client (see core/fred.py)
+    FRED_RATE_LIMIT_PER_MINUTE: int = 120
+    FRED_MAX_CONCURRENCY: int = 8
+    FRED_CACHE_TTL_SECONDS: int = 300
+    FRED_CACHE_OBSERVATIONS: int = 120
 
-    # Service URLs for scheduler
-    ECONOMIC_SERVICE_URL: str
-    SENTIMENT_SERVICE_URL: str
-    TECHNICALS_SERVICE_URL: str
-    CROSS_ASSET_SERVICE_URL: str
+    # Shared Alpha Vantage client (see core/alpha_vantage.py)
+    ALPHA_VANTAGE_RATE_LIMIT_PER_MINUTE: int = 5
+    ALPHA_VANTAGE_MAX_CONCURRENCY: int = 4
+
+    # Symbols tracked by the technicals service's vectorized indicator pass
+    TECHNICALS_UNIVERSE: list[str] = [
+        "SPY", "QQQ", "IWM", "DIA",
+        "XLB", "XLC", "XLE", "XLF", "XLI", "XLK", "XLP", "XLRE", "XLU", "XLV", "XLY",
+    ]
+    TECHNICALS_LOOKBACK_DAYS: int = 260
+
+    # Feature flags (see core/feature_flags.py): read from Redis or a JSON
+    # file (default backend/feature_flags.json) and re-read this often.
+    FEATURE_FLAGS_SOURCE: Literal["redis", "file"] = "redis"
+    FEATURE_FLAGS_FILE: str = ""
+    FEATURE_FLAGS_REFRESH_SECONDS: float = 2.0
+
+    # Gateway API keys (see api_gateway/keys.py): how often the key list is
+    # re-read from Redis, and the token bucket each key gets unless it sets its own.
+    API_KEYS_REFRESH_SECONDS: float = 5.0
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_PER_MINUTE: int = 600
+    RATE_LIMIT_BURST: int = 60
+
+    # Where CPU-heavy transforms run (see core/compute.py): "thread", "process" or "inline"
+    COMPUTE_EXECUTOR: Literal["inline", "thread", "process"] = "thread"
+    COMPUTE_WORKERS: int = 2
+
+    # History backfill (python -m scheduler.backfill): date-range chunk size,
+    # concurrent series per upstream, and where a run starts by default.
+    BACKFILL_CHUNK_DAYS: int = 1825
+    BACKFILL_CONCURRENCY: dict[str, int] = {"default": 4, "alpha_vantage": 1}
+    BACKFILL_START: str = "1970-01-01"
+
+    # Upstream base URLs; point them at the offline emulator (backend/emulator) for local runs
+    FRED_BASE_URL: str = "https://api.stlouisfed.org"
+    ALPHA_VANTAGE_BASE_URL: str = "https://www.alphavantage.co"
+    FEAR_GREED_BASE_URL: str = "https://api.alternative.me"
+
+    # Service URLs for the gateway and scheduler
+    ECONOMIC_SERVICE_URL: str = ""
+    SENTIMENT_SERVICE_URL: str = ""
+    TECHNICALS_SERVICE_URL: str = ""
+    CROSS_ASSET_SERVICE_URL: str = ""
 
     class Config:
         env_file = ".env"
 
+    def require(self, who: str, *names: str) -> None:
+        """Raises at startup if any of the named settings is empty, listing every one that is."""
+        missing = [name for name in names if not getattr(self, name)]
+        if missing:
+            raise RuntimeError(f"{who} needs {', '.join(missing)} to be set")
+
 settings = Settings()
@@ -1,16 +1,50 @@
 import redis.asyncio as redis
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
 from .config import settings
 
-# Setup for PostgreSQL
-# engine = create_async_engine(settings.DATABASE_URL, echo=False)
-# AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+def async_database_url(url: str) -> str:
+    """Points a plain postgresql:// URL at the asyncpg driver."""
+    for prefix in ("postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
 
 # Setup for Redis Cache
 redis_cache = redis.from_url(settings.REDIS_URL, encoding="utf-8", decode_responses=True)
+# Raw-bytes client for packed binary values (e.g. NumPy buffers)
+redis_binary = redis.from_url(settings.REDIS_URL)
 
-# async def get_db():
-#     """Dependency to get a database session."""
-#     async with AsyncSessionLocal() as session:
-#         yield session
+# Setup for PostgreSQL: SQLAlchemy is only imported, and the engine only
+# built, once something first reads or writes history.
+_engine = None
+_sessions = None
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        _engine = create_async_engine(
+            async_database_url(settings.DATABASE_URL), echo=False, pool_pre_ping=True,
+            connect_args={
+                "timeout": settings.DATABASE_CONNECT_TIMEOUT_SECONDS,
+                "command_timeout": settings.DATABASE_COMMAND_TIMEOUT_SECONDS,
+            },
+        )
+    return _engine
+
+async def close_connections() -> None:
+    """Closes the Redis pools and, if it was ever built, the Postgres engine; called from lifespans."""
+    global _engine, _sessions
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = _sessions = None
+    await redis_cache.aclose()
+    await redis_binary.aclose()
+
+async def get_db():
+    """Dependency to get a database session."""
+    global _sessions
+    if _sessions is None:
+        from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+        _sessions = async_sessionmaker(get_engine(), class_=AsyncSession, expire_on_commit=False)
+    async with _sessions() as session:
+        yield session
@@ -1,25 +1,130 @@
+"""Feature flags, evaluated from an in-memory snapshot that a background task keeps current.
+
+Flags are dotted names mapped to booleans, e.g. "indicators.movingAverages".
+They live in the Redis hash FLAGS_KEY (FEATURE_FLAGS_SOURCE="redis") or in a
+JSON file such as {"indicators": {"movingAverages": false}}
+(FEATURE_FLAGS_SOURCE="file"). Every process re-reads the source every
+FEATURE_FLAGS_REFRESH_SECONDS, so a change reaches all of them within seconds:
+
+    python -m core.feature_flags indicators.movingAverages off
+"""
+import asyncio
 import json
+import logging
+import os
+import sys
 from functools import wraps
+from pathlib import Path
+from typing import Callable, Optional
 from fastapi import HTTPException
+from .config import settings
+from .database import redis_cache
+
+FLAGS_KEY = "feature_flags"
+DEFAULT_FLAGS_FILE = Path(__file__).resolve().parent.parent / "feature_flags.json"
+
+def indicator_flag(key: str) -> str:
+    """The flag that gates an indicator's (or job's) ingestion and serving, by registry key."""
+    return f"indicators.{key}"
+
+def flatten(flags: dict, prefix: str = "") -> dict:
+    """Turns nested {"indicators": {"vix": false}} into {"indicators.vix": False}."""
+    flat = {}
+    for name, value in flags.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{name}."))
+        else:
+            flat[f"{prefix}{name}"] = bool(value)
+    return flat
+
+class RedisFlagSource:
+    async def load(self) -> Optional[dict]:
+        return {name: json.loads(value) for name, value in (await redis_cache.hgetall(FLAGS_KEY)).items()}
+
+class FileFlagSource:
+    """Reads a JSON flag file again only when its modification time changes."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._mtime = None
+
+    async def load(self) -> Optional[dict]:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._mtime:
+            return None
+        self._mtime = mtime
+        if mtime is None:
+            return {}
+        return flatten(json.loads(self.path.read_text()))
+
+class FeatureFlags:
+    """Answers flag checks from memory; refresh() and watch() keep the snapshot current."""
 
-def load_flags():
-    """Loads feature flags from a JSON file."""
-    try:
-        with open("feature_flags.json", "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {"indicators": {}}
+    def __init__(self, source, refresh_seconds: float):
+        self.source = source
+        self.refresh_seconds = refresh_seconds
+        self._snapshot: dict = {}
+        self._listeners: list = []
 
-feature_flags = load_flags()
+    def is_enabled(self, name: str, default: bool = True) -> bool:
+        return self._snapshot.get(name, default)
+
+    def indicator_enabled(self, key: str) -> bool:
+        """Indicators and jobs are on unless their flag turns them off."""
+        return self._snapshot.get(indicator_flag(key), True)
+
+    def on_change(self, listener: Callable[[], None]) -> None:
+        self._listeners.append(listener)
+
+    async def refresh(self) -> None:
+        """Reloads the snapshot from the source, notifying listeners if any flag changed."""
+        flags = await self.source.load()
+        if flags is None or flags == self._snapshot:
+            return
+        logging.info(f"Feature flags changed: {flags}")
+        self._snapshot = flags
+        for listener in self._listeners:
+            listener()
+
+    async def watch(self) -> None:
+        """Refreshes the snapshot every refresh_seconds until cancelled; errors keep the last snapshot."""
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logging.error(f"Could not refresh feature flags: {e!r}")
+            await asyncio.sleep(self.refresh_seconds)
+
+def _source():
+    if settings.FEATURE_FLAGS_SOURCE == "file":
+        return FileFlagSource(Path(settings.FEATURE_FLAGS_FILE) if settings.FEATURE_FLAGS_FILE else DEFAULT_FLAGS_FILE)
+    return RedisFlagSource()
+
+feature_flags = FeatureFlags(_source(), settings.FEATURE_FLAGS_REFRESH_SECONDS)
 
 def flag_enabled(flag_name: str):
-    """Decorator to check if a feature flag is enabled for an endpoint."""
+    """Decorator to check if an indicator's flag (indicators.<flag_name>) is enabled for an endpoint.
+
+    Unlike ingestion, an endpoint stays off until its flag is explicitly turned on.
+    """
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            if feature_flags.get("indicators", {}).get(flag_name, False):
+            if feature_flags.is_enabled(indicator_flag(flag_name), default=False):
                 return await func(*args, **kwargs)
             else:
                 raise HTTPException(status_code=404, detail=f"Indicator '{flag_name}' is not enabled.")
         return wrapper
     return decorator
+
+async def set_flag(name: str, enabled: bool) -> None:
+    """Sets a flag in Redis; every process picks it up on its next refresh."""
+    await redis_cache.hset(FLAGS_KEY, name, json.dumps(enabled))
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[2] not in ("on", "off"):
+        sys.exit("usage: python -m core.feature_flags <flag> on|off")
+    asyncio.run(set_flag(sys.argv[1], sys.argv[2] == "on"))
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import time
+from typing import Iterable
+from .config import settings
+from .database import redis_cache
+from .http import FRED, get_client
+from .metrics import RATE_LIMIT_BUDGET, upstream_timer
+from .ratelimit import TokenBucket
+
+FRED_API_URL = f"{settings.FRED_BASE_URL}/fred/series/observations"
+
+def series_key(series_id: str) -> str:
+    """Returns the Redis key holding the observations cached for a FRED series."""
+    return f"fred:series:{series_id}"
+
+class FredClient:
+    """Coalescing, rate-limited FRED fetcher shared by every service that reads FRED.
+
+    Series cached in Redis are only topped up from their last date, and series
+    fetched within FRED_CACHE_TTL_SECONDS are served without an upstream call.
+    """
+
+    def __init__(self, rate_per_minute: int, max_concurrency: int, cache_ttl_seconds: int):
+        self._bucket = TokenBucket(rate_per_minute / 60.0, capacity=max(1, max_concurrency))
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._cache_ttl = cache_ttl_seconds
+        self._inflight: dict[tuple, asyncio.Task] = {}
+
+    @property
+    def remaining_budget(self) -> float:
+        return self._bucket.remaining
+
+    async def get_observations(self, series_id: str, limit: int = 12) -> list[dict]:
+        """Returns the latest `limit` observations of a series, newest first."""
+        key = (series_id, limit)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._refresh(series_id, limit))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def get_many(self, series_ids: Iterable[str], limit: int = 12) -> dict[str, list[dict]]:
+        """Fetches several series in parallel, bounded by the client's concurrency."""
+        series_ids = list(dict.fromkeys(series_ids))
+        results = await asyncio.gather(*(self.get_observations(sid, limit) for sid in series_ids))
+        return dict(zip(series_ids, results))
+
+    async def get_range(self, series_id: str, start: str, end: str) -> list[dict]:
+        """Returns every observation of a series between two ISO dates, newest first.
+
+        Bypasses the Redis cache; meant for backfills, which want whole date ranges.
+        """
+        fetched = await self._fetch({
+            "series_id": series_id, "api_key": settings.FRED_API_KEY, "file_type": "json",
+            "observation_start": start, "observation_end": end, "sort_order": "desc", "limit": 100000,
+        })
+        return [{"date": obs["date"], "value": float(obs["value"])} for obs in fetched if obs["value"] != "."]
+
+    async def _refresh(self, series_id: str, limit: int) -> list[dict]:
+        cached = await redis_cache.get(series_key(series_id))
+        cached = json.loads(cached) if cached else {"fetched_at": 0, "observations": []}
+        observations = dict(cached["observations"])
+
+        is_recent = time.time() - cached["fetched_at"] < self._cache_ttl
+        if not (is_recent and len(observations) >= limit):
+            params = {
+                "series_id": series_id, "api_key": settings.FRED_API_KEY, "file_type": "json",
+                "limit": limit, "sort_order": "desc",
+            }
+            if len(observations) >= limit:
+                # Re-request the last cached date too, in case it was revised.
+                params["observation_start"] = max(observations)
+            fetched = await self._fetch(params)
+            observations.update((obs["date"], float(obs["value"])) for obs in fetched if obs["value"] != ".")
+
+            retained = sorted(observations.items())[-max(limit, settings.FRED_CACHE_OBSERVATIONS):]
+            observations = dict(retained)
+            await redis_cache.set(series_key(series_id), json.dumps({"fetched_at": time.time(), "observations": retained}))
+
+        latest = sorted(observations.items(), reverse=True)[:limit]
+        return [{"date": date, "value": value} for date, value in latest]
+
+    async def _fetch(self, params: dict) -> list[dict]:
+        async with self._semaphore:
+            await self._bucket.acquire()
+            with upstream_timer(FRED, params["series_id"]):
+                response = await get_client(FRED).get(FRED_API_URL, params=params)
+                response.raise_for_status()
+            return response.json()["observations"]
+
+fred_client = FredClient(
+    rate_per_minute=settings.FRED_RATE_LIMIT_PER_MINUTE,
+    max_concurrency=settings.FRED_MAX_CONCURRENCY,
+    cache_ttl_seconds=settings.FRED_CACHE_TTL_SECONDS,
+)
+RATE_LIMIT_BUDGET.labels(FRED).set_function(lambda: fred_client.remaining_budget)
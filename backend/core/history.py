@@ -0,0 +1,125 @@
+import asyncio
+import functools
+import logging
+import math
+from datetime import date, datetime, timezone
+from typing import Optional
+from .config import settings
+from .database import get_engine
+
+@functools.cache
+def history_table():
+    """The history table, defined on first use so SQLAlchemy stays out of startup."""
+    from sqlalchemy import Column, Date, Float, Index, MetaData, Table, Text
+    # One row per (series, day). Rows arrive roughly in date order, so a BRIN
+    # index on the date stays tiny while still pruning range scans.
+    return Table(
+        "indicator_history", MetaData(),
+        Column("indicator", Text, primary_key=True),
+        Column("observed_on", Date, primary_key=True),
+        Column("value", Float(precision=53), nullable=False),
+        Index("ix_indicator_history_observed_on_brin", "observed_on", postgresql_using="brin"),
+    )
+
+RESAMPLE_PERIODS = ("day", "week", "month", "quarter", "year")
+
+def parse_point_date(name: str) -> date:
+    """Parses a history point's date: an ISO date or a Unix timestamp in seconds."""
+    if name.isdigit():
+        return datetime.fromtimestamp(int(name), tz=timezone.utc).date()
+    return date.fromisoformat(name[:10])
+
+def series_name(name: str, field: str = "value") -> str:
+    """The stored series for one field of an indicator's history points."""
+    return name if field == "value" else f"{name}:{field}"
+
+def history_rows(name: str, payload: dict) -> list:
+    """Flattens an indicator's history into (series, day, value) rows.
+
+    A point's "value" is stored under the indicator name; any other numeric
+    field (e.g. the "50D" line of the moving averages) under "<name>:<field>".
+    """
+    rows = []
+    for point in payload.get("history", []):
+        observed_on = parse_point_date(str(point["name"]))
+        for field, value in point.items():
+            if field == "name" or not isinstance(value, (int, float)) or math.isnan(value):
+                continue
+            rows.append({"indicator": series_name(name, field), "observed_on": observed_on, "value": float(value)})
+    return rows
+
+_schema_lock = asyncio.Lock()
+_schema_ready = False
+
+async def ensure_schema() -> None:
+    """Creates the history table once per process."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    async with _schema_lock:
+        if not _schema_ready:
+            async with get_engine().begin() as conn:
+                await conn.run_sync(history_table().metadata.create_all)
+            _schema_ready = True
+
+async def upsert_history(rows: list) -> None:
+    """Bulk-upserts history rows in one executemany round trip."""
+    if not rows:
+        return
+    from sqlalchemy.dialects.postgresql import insert
+    await ensure_schema()
+    indicator_history = history_table()
+    stmt = insert(indicator_history)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[indicator_history.c.indicator, indicator_history.c.observed_on],
+        set_={"value": stmt.excluded.value},
+    )
+    async with get_engine().begin() as conn:
+        await conn.execute(stmt, rows)
+
+async def record_history(name: str, payload: dict) -> None:
+    """Persists an indicator's history; failures are logged, never raised to ingestion."""
+    if not settings.HISTORY_ENABLED:
+        return
+    try:
+        await upsert_history(history_rows(name, payload))
+    except Exception as e:
+        logging.error(f"Failed to record history for {name}: {e}")
+
+# History writes in flight; holding the task keeps it alive until it finishes.
+_recording: set = set()
+
+def record_history_later(name: str, payload: dict) -> None:
+    """Persists an indicator's history in the background, so a slow database never holds up a refresh."""
+    if not settings.HISTORY_ENABLED:
+        return
+    task = asyncio.create_task(record_history(name, payload))
+    _recording.add(task)
+    task.add_done_callback(_recording.discard)
+
+async def query_history(indicator: str, start: Optional[date], end: Optional[date], resample: str = "day") -> list:
+    """Returns (day, value) points for a series, averaged per resample period."""
+    if resample not in RESAMPLE_PERIODS:
+        raise ValueError(f"Unsupported resample period: {resample}")
+    from sqlalchemy import func, literal_column, select
+    await ensure_schema()
+    indicator_history = history_table()
+    column = indicator_history.c.observed_on
+    if resample == "day":
+        bucket = column
+        value = indicator_history.c.value
+    else:
+        # Inlined rather than bound so GROUP BY matches the selected expression.
+        bucket = func.date_trunc(literal_column(f"'{resample}'"), column).label("bucket")
+        value = func.avg(indicator_history.c.value)
+    query = select(bucket, value).where(indicator_history.c.indicator == indicator)
+    if start:
+        query = query.where(column >= start)
+    if end:
+        query = query.where(column <= end)
+    if resample != "day":
+        query = query.group_by(bucket)
+    query = query.order_by(bucket)
+    async with get_engine().connect() as conn:
+        result = await conn.execute(query)
+        return [(row[0], row[1]) for row in result]
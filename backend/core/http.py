@@ -0,0 +1,91 @@
+import asyncio
+import functools
+import hashlib
+import json
+import httpx
+from .config import settings
+from .database import redis_cache
+
+# Upstream names used to pick a pooled client and its timeout.
+FRED = "fred"
+ALPHA_VANTAGE = "alpha_vantage"
+FEAR_GREED = "fear_greed"
+SERVICES = "services"
+SCHEDULER = "scheduler"
+ALERTS = "alerts"
+
+# Settings an upstream's client cannot work without.
+UPSTREAM_SETTINGS = {FRED: ("FRED_API_KEY",), ALPHA_VANTAGE: ("ALPHA_VANTAGE_API_KEY",)}
+# The setting holding each service's base URL, for the gateway and scheduler.
+SERVICE_URL_SETTINGS = {
+    "economic": "ECONOMIC_SERVICE_URL",
+    "sentiment": "SENTIMENT_SERVICE_URL",
+    "technicals": "TECHNICALS_SERVICE_URL",
+    "cross_asset": "CROSS_ASSET_SERVICE_URL",
+}
+
+# Returned by conditional_get when the upstream reports nothing has changed.
+NOT_MODIFIED = object()
+
+_clients: dict[str, httpx.AsyncClient] = {}
+
+@functools.cache
+def _ssl_context():
+    # Loading the CA bundle is most of what building a client costs, so every client shares one.
+    return httpx.create_ssl_context()
+
+def _build_client(upstream: str, transport: httpx.AsyncBaseTransport = None) -> httpx.AsyncClient:
+    timeout = settings.HTTP_TIMEOUTS.get(upstream, settings.HTTP_TIMEOUTS.get("default", 10.0))
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    )
+    return httpx.AsyncClient(timeout=timeout, limits=limits, transport=transport, verify=_ssl_context())
+
+def get_client(upstream: str) -> httpx.AsyncClient:
+    """Returns the long-lived, connection-pooled client for an upstream."""
+    client = _clients.get(upstream)
+    if client is None or client.is_closed:
+        client = _clients[upstream] = _build_client(upstream)
+    return client
+
+def open_clients(*upstreams: str) -> None:
+    """Creates the clients an app needs up front, typically from its lifespan."""
+    for upstream in upstreams:
+        get_client(upstream)
+
+def mount_transport(transport: httpx.AsyncBaseTransport, *upstreams: str) -> None:
+    """Routes upstreams through a custom transport, e.g. the in-process upstream emulator."""
+    for upstream in upstreams:
+        _clients[upstream] = _build_client(upstream, transport)
+
+async def close_clients() -> None:
+    """Closes every pooled client, releasing their keep-alive connections."""
+    clients = list(_clients.values())
+    _clients.clear()
+    await asyncio.gather(*(client.aclose() for client in clients))
+
+async def conditional_get(upstream: str, url: str, params: dict = None):
+    """GETs a URL, revalidating with the ETag/Last-Modified of its previous response.
+
+    Returns NOT_MODIFIED when the upstream answers 304, otherwise the response.
+    """
+    request_id = hashlib.sha1(json.dumps([url, sorted((params or {}).items())]).encode()).hexdigest()
+    validators_key = f"http:validators:{request_id}"
+    validators = json.loads(await redis_cache.get(validators_key) or "{}")
+    headers = {}
+    if "etag" in validators:
+        headers["If-None-Match"] = validators["etag"]
+    if "last_modified" in validators:
+        headers["If-Modified-Since"] = validators["last_modified"]
+
+    response = await get_client(upstream).get(url, params=params, headers=headers)
+    if response.status_code == 304:
+        return NOT_MODIFIED
+    response.raise_for_status()
+    latest = {"etag": response.headers.get("etag"), "last_modified": response.headers.get("last-modified")}
+    latest = {k: v for k, v in latest.items() if v}
+    if latest != validators:
+        await redis_cache.set(validators_key, json.dumps(latest))
+    return response
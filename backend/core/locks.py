@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Optional
+from redis.exceptions import RedisError
+from .database import redis_cache
+
+LOCK_PREFIX = "lock:"
+
+# Only the holder's token may extend or drop a lease.
+_RENEW = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class RedisLock:
+    """A lease on a Redis key, held by whoever set it and expiring unless renewed."""
+
+    def __init__(self, name: str, ttl_seconds: float):
+        self.key = LOCK_PREFIX + name
+        self.ttl_seconds = ttl_seconds
+        self._token = uuid.uuid4().hex
+
+    async def acquire(self) -> bool:
+        return bool(await redis_cache.set(self.key, self._token, nx=True, px=int(self.ttl_seconds * 1000)))
+
+    async def renew(self) -> bool:
+        return bool(await redis_cache.eval(_RENEW, 1, self.key, self._token, int(self.ttl_seconds * 1000)))
+
+    async def release(self) -> None:
+        await redis_cache.eval(_RELEASE, 1, self.key, self._token)
+
+async def _keep_alive(lock: RedisLock) -> None:
+    while True:
+        await asyncio.sleep(lock.ttl_seconds / 3)
+        if not await lock.renew():
+            logging.warning(f"Lost lease on {lock.key} while still running.")
+            return
+
+async def _run_locked(name: str, run: Callable[[], Awaitable[Any]], ttl_seconds: float) -> Optional[Any]:
+    lock = RedisLock(name, ttl_seconds)
+    if not await lock.acquire():
+        logging.info(f"{name} is already running in another process; skipping.")
+        return None
+    keeper = asyncio.create_task(_keep_alive(lock))
+    try:
+        return await run()
+    finally:
+        keeper.cancel()
+        await lock.release()
+
+async def run_exclusive(name: str, run: Callable[[], Awaitable[Any]], ttl_seconds: float, wait_seconds: float) -> Any:
+    """Runs run() holding the named lock, waiting up to wait_seconds while another process holds it.
+
+    For short read-modify-write sections that must not be skipped; raises
+    TimeoutError if the lock does not come free in time.
+    """
+    lock = RedisLock(name, ttl_seconds)
+    deadline = time.monotonic() + wait_seconds
+    while not await lock.acquire():
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"{name} is still held by another process")
+        await asyncio.sleep(0.05)
+    try:
+        return await run()
+    finally:
+        await lock.release()
+
+_inflight: dict[str, asyncio.Task] = {}
+
+async def single_flight(name: str, run: Callable[[], Awaitable[Any]], ttl_seconds: float) -> Optional[Any]:
+    """Runs run() at most once at a time per name across every process sharing Redis.
+
+    Concurrent callers in this process share one call and its result. While
+    another process holds the lock, run() is skipped and None is returned;
+    the lease is renewed for as long as run() takes.
+    """
+    task = _inflight.get(name)
+    if task is None:
+        task = _inflight[name] = asyncio.create_task(_run_locked(name, run, ttl_seconds))
+        task.add_done_callback(lambda _: _inflight.pop(name, None))
+    # Shielded so one caller going away does not cancel the call for the others.
+    return await asyncio.shield(task)
+
+class LeaderLease:
+    """Elects one leader among processes competing for the same lease."""
+
+    def __init__(self, name: str, ttl_seconds: float):
+        self._lock = RedisLock(name, ttl_seconds)
+        self.is_leader = False
+        # Set once the first attempt has settled whether this process leads.
+        self.decided = asyncio.Event()
+
+    async def maintain(self) -> None:
+        """Takes or renews the lease every third of its TTL until cancelled."""
+        try:
+            while True:
+                was_leader = self.is_leader
+                try:
+                    self.is_leader = await (self._lock.renew() if was_leader else self._lock.acquire())
+                except RedisError as e:
+                    logging.error(f"Could not maintain lease {self._lock.key}: {e}")
+                    self.is_leader = False
+                if self.is_leader != was_leader:
+                    logging.info(f"{'Acquired' if self.is_leader else 'Lost'} lease {self._lock.key}.")
+                self.decided.set()
+                await asyncio.sleep(self._lock.ttl_seconds / 3)
+        finally:
+            if self.is_leader:
+                self.is_leader = False
+                await self._lock.release()
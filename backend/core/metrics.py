@@ -0,0 +1,73 @@
+import time
+from contextlib import contextmanager
+from fastapi import Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# --- Upstreams ---
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_seconds", "Latency of requests to upstream data APIs.", ["source", "series"],
+)
+UPSTREAM_ERRORS = Counter(
+    "upstream_request_errors_total", "Upstream requests that failed or returned an error body.", ["source", "series"],
+)
+RATE_LIMIT_BUDGET = Gauge(
+    "upstream_rate_limit_budget", "Requests an upstream's rate-limit bucket allows right now.", ["source"],
+)
+
+# --- Redis and the gateway ---
+REDIS_LATENCY = Histogram("redis_round_trip_seconds", "Round-trip time of Redis commands.", ["operation"])
+FORWARD_LATENCY = Histogram(
+    "gateway_forward_seconds", "Latency of gateway requests to a service.", ["service", "endpoint"],
+)
+SECTION_RESULTS = Counter(
+    "gateway_sections_total", "Fan-out sections by outcome: ok, fallback or unavailable.", ["service", "status"],
+)
+HEDGED_REQUESTS = Counter("gateway_hedged_requests_total", "Second attempts started past a service's p95.", ["service"])
+RATE_LIMITED = Counter("gateway_rate_limited_total", "Requests rejected with 429 by an API key's rate limit.", ["key"])
+
+# --- Indicator cache ---
+CACHE_READS = Counter(
+    "indicator_cache_reads_total", "Cached indicator reads by result: hit, stale or miss.", ["indicator", "result"],
+)
+CACHE_AGE = Gauge("indicator_cache_age_seconds", "Age of an indicator when it was last read.", ["indicator"])
+REFRESH_ERRORS = Counter(
+    "indicator_refresh_errors_total", "Indicator and job refreshes that raised.", ["service", "key"],
+)
+REFRESH_JOB_SECONDS = Histogram(
+    "refresh_job_seconds", "Wall time of a service's refresh jobs, from start to the last key.", ["service"],
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+
+# --- Alerts ---
+ALERTS_SENT = Counter(
+    "alerts_total", "Fired alerts by outcome: sent, duplicate, throttled or failed.", ["indicator", "outcome"],
+)
+
+# --- In-process computation ---
+COMPUTE_CPU = Histogram(
+    "compute_cpu_seconds", "CPU time spent in transforms and other in-process computation.", ["step"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+
+@contextmanager
+def upstream_timer(source: str, series: str):
+    """Times one upstream request, counting it as an error if it raises."""
+    try:
+        with UPSTREAM_LATENCY.labels(source, series).time():
+            yield
+    except Exception:
+        UPSTREAM_ERRORS.labels(source, series).inc()
+        raise
+
+@contextmanager
+def cpu_timer(step: str):
+    """Records the CPU time (not wall time) the enclosed synchronous code uses."""
+    start = time.thread_time()
+    try:
+        yield
+    finally:
+        COMPUTE_CPU.labels(step).observe(time.thread_time() - start)
+
+def metrics_response() -> Response:
+    """The Prometheus exposition of this process's metrics."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
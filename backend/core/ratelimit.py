@@ -0,0 +1,32 @@
+import asyncio
+import time
+
+class TokenBucket:
+    """An async token bucket for pacing calls against an upstream's rate limit."""
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def remaining(self) -> float:
+        """Tokens currently available without waiting."""
+        self._refill()
+        return self._tokens
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Waits until enough tokens are available, then takes them."""
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
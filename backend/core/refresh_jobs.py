@@ -0,0 +1,141 @@
+"""Tracked refresh jobs: each /update-cache trigger becomes a job with an ID, a status and per-key results.
+
+A service runs one job at a time. A trigger for keys the running job
+already covers joins it; any other trigger is merged into the single job
+queued behind it, so a burst of triggers never piles up refreshes. Job
+records are kept in Redis (readable from any replica) and each finished job
+is appended to the EVENTS_STREAM stream.
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+from .config import settings
+from .database import redis_cache
+from .metrics import REFRESH_JOB_SECONDS
+
+JOB_KEY_PREFIX = "refresh:job:"
+EVENTS_STREAM = "refresh:events"
+
+def job_key(job_id: str) -> str:
+    return f"{JOB_KEY_PREFIX}{job_id}"
+
+def _covers(keys: Optional[list], wanted: Optional[list]) -> bool:
+    """Whether a job for `keys` (None meaning everything) refreshes everything in `wanted`."""
+    return keys is None or (wanted is not None and set(wanted) <= set(keys))
+
+def _merge(keys: Optional[list], more: Optional[list]) -> Optional[list]:
+    return None if keys is None or more is None else sorted(set(keys) | set(more))
+
+async def save_job(job: dict, finished: bool = False) -> None:
+    """Stores a job record, and on completion publishes it; failures are logged, never raised to the job."""
+    try:
+        async with redis_cache.pipeline(transaction=False) as pipe:
+            pipe.set(job_key(job["id"]), json.dumps(job), ex=settings.REFRESH_JOB_TTL_SECONDS)
+            if finished:
+                pipe.xadd(EVENTS_STREAM, {"job": json.dumps(job)}, maxlen=settings.REFRESH_EVENTS_MAXLEN, approximate=True)
+            await pipe.execute()
+    except Exception as e:
+        logging.error(f"Could not record refresh job {job['id']}: {e!r}")
+
+async def read_job(job_id: str) -> Optional[dict]:
+    data = await redis_cache.get(job_key(job_id))
+    return json.loads(data) if data else None
+
+class RefreshJobs:
+    """Runs a service's refreshes as jobs, one at a time, with at most one merged job waiting."""
+
+    def __init__(self, service: str, refresh: Callable[[Optional[list]], Awaitable[list]]):
+        self.service = service
+        self._refresh = refresh
+        self._running: Optional[dict] = None
+        self._pending: Optional[dict] = None
+        self._done: dict[str, asyncio.Event] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """A job this process is running or has queued."""
+        for job in (self._running, self._pending):
+            if job and job["id"] == job_id:
+                return job
+        return None
+
+    async def submit(self, keys: Optional[list] = None) -> dict:
+        """Starts, joins or queues a refresh of keys (None for everything) and returns its job."""
+        keys = None if keys is None else sorted(set(keys))
+        if self._running and _covers(self._running["keys"], keys):
+            return self._running
+        if self._pending:
+            self._pending["keys"] = _merge(self._pending["keys"], keys)
+            await save_job(self._pending)
+            return self._pending
+        job = {
+            "id": uuid.uuid4().hex, "service": self.service, "keys": keys, "status": "queued",
+            "queuedAt": time.time(), "startedAt": None, "finishedAt": None, "results": [],
+        }
+        self._done[job["id"]] = asyncio.Event()
+        # Decided before any await, so concurrent triggers see this job at once.
+        if self._running:
+            self._pending = job
+            await save_job(job)
+        else:
+            self._start(job)
+        return job
+
+    async def wait(self, job: dict) -> dict:
+        """Waits for a job returned by submit() to finish; the record is updated in place."""
+        done = self._done.get(job["id"])
+        if done:
+            await done.wait()
+        return job
+
+    def _start(self, job: dict) -> None:
+        self._running = job
+        self._task = asyncio.create_task(self._run(job))
+
+    async def _run(self, job: dict) -> None:
+        started = time.monotonic()
+        cancelled = False
+        try:
+            job["status"] = "running"
+            job["startedAt"] = time.time()
+            await save_job(job)
+            job["results"] = await self._refresh(job["keys"])
+            job["status"] = "done"
+        except asyncio.CancelledError as e:
+            # Shutting down: the job and the one queued behind it end as failed.
+            cancelled = True
+            job["status"] = "failed"
+            job["error"] = repr(e)
+            raise
+        except Exception as e:
+            logging.error(f"Refresh job {job['id']} for {self.service} failed: {e!r}")
+            job["status"] = "failed"
+            job["error"] = repr(e)
+        finally:
+            await self._finish(job, time.monotonic() - started, cancelled)
+
+    async def _finish(self, job: dict, duration: float, cancelled: bool) -> None:
+        """Records a finished job and wakes its waiters, then starts the queued job unless cancelled.
+
+        Waiters are released and the queue cleared before any await, so a
+        second cancellation cannot leave them hanging.
+        """
+        REFRESH_JOB_SECONDS.labels(self.service).observe(duration)
+        job["finishedAt"] = time.time()
+        job["durationMs"] = round(duration * 1000)
+        job["counts"] = {
+            status: sum(r["status"] == status for r in job["results"]) for status in ("updated", "skipped", "failed")
+        }
+        self._done.pop(job["id"]).set()
+        self._running, pending, self._pending = None, self._pending, None
+        if pending and cancelled:
+            pending.update(status="failed", error=job["error"], finishedAt=job["finishedAt"])
+            self._done.pop(pending["id"]).set()
+        await save_job(job, finished=True)
+        if pending and cancelled:
+            await save_job(pending, finished=True)
+        elif pending:
+            self._start(pending)
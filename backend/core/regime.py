@@ -0,0 +1,263 @@
+import json
+import logging
+import math
+from typing import Iterable, Optional, Tuple
+import numpy as np
+from .codec import dumps
+from .config import settings
+from .database import redis_binary
+from .history import parse_point_date
+from .locks import run_exclusive
+from .metrics import cpu_timer
+from .registry import INDICATORS
+from .rolling import from_day, to_day
+
+REGIME_STATE_KEY = "regime:state"
+REGIME_KEY = "regime:latest"
+REGIME_NAME = "Market Regime"
+
+class RunningStats:
+    """Welford's running mean and variance of one indicator's signal over every point it has had."""
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0,
+                 last_day: Optional[int] = None, latest: Optional[float] = None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.last_day = last_day
+        self.latest = latest
+
+    def update(self, points: Iterable[Tuple[int, float]]) -> int:
+        """Applies (day, value) points newer than the last seen point; returns how many."""
+        applied = 0
+        for day, value in sorted(points):
+            if (self.last_day is not None and day <= self.last_day) or math.isnan(value):
+                continue
+            self.count += 1
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (value - self.mean)
+            self.last_day = day
+            self.latest = value
+            applied += 1
+        return applied
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan
+
+    def zscore(self) -> Optional[float]:
+        """The latest value in standard deviations from the mean, or None without spread yet."""
+        std = self.std
+        if self.latest is None or not std > 0:
+            return None
+        return (self.latest - self.mean) / std
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "mean": self.mean, "m2": self.m2, "lastDay": self.last_day, "latest": self.latest}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RunningStats":
+        return cls(data["count"], data["mean"], data["m2"], data["lastDay"], data["latest"])
+
+class RegimeState:
+    """Running z-scores of every indicator and a daily series of them with the composite score.
+
+    Rows are keyed by market day: an update lands on the day of its newest
+    point and holds every indicator's latest (clipped) z-score. An update
+    whose newest point is not after the last row's day replaces that row. Sums and cross-products over the last
+    `window` rows are kept alongside, so rolling correlations cost O(K^2)
+    per update for K indicators rather than a pass over the window.
+    """
+
+    def __init__(self, keys: Iterable[str], history_days: int, window: int):
+        self.keys = list(keys)
+        self.window = window
+        self.history_days = max(history_days, window)
+        self.stats = {key: RunningStats() for key in self.keys}
+        self.days = np.zeros(0, dtype=np.int32)
+        self.scores = np.zeros(0)
+        self.z = np.zeros((0, len(self.keys)))
+        self._sum = np.zeros(len(self.keys))
+        self._cross = np.zeros((len(self.keys), len(self.keys)))
+
+    def _accumulate(self, row: np.ndarray, sign: int) -> None:
+        self._sum += sign * row
+        self._cross += sign * np.outer(row, row)
+
+    def _resum(self) -> None:
+        rows = self.z[-self.window:]
+        self._sum = rows.sum(axis=0)
+        self._cross = rows.T @ rows
+
+    def zscores(self) -> dict:
+        """Each indicator's latest z-score, clipped to ±REGIME_Z_CLIP; None without enough history."""
+        clip = settings.REGIME_Z_CLIP
+        scores = {}
+        for key, stats in self.stats.items():
+            z = stats.zscore()
+            scores[key] = None if z is None else min(max(z, -clip), clip)
+        return scores
+
+    def composite(self, weights: dict) -> Optional[float]:
+        """Weighted mean of the clipped z-scores, or None if no weighted indicator has one."""
+        total = norm = 0.0
+        for key, z in self.zscores().items():
+            weight = weights.get(key, 0.0)
+            if z is not None and weight:
+                total += weight * z
+                norm += abs(weight)
+        return total / norm if norm else None
+
+    def ingest(self, key: str, points: Iterable[Tuple[int, float]], weights: dict, day: int) -> int:
+        """Applies an indicator's new points and records the composite as of `day`; returns points applied."""
+        applied = self.stats[key].update(points)
+        if not applied:
+            return 0
+        score = self.composite(weights)
+        row = np.array([0.0 if z is None else z for z in self.zscores().values()])
+        if len(self.days) and day <= self.days[-1]:
+            # Not a new day: swap the last row out of the window sums.
+            self._accumulate(self.z[-1], -1)
+            self.z[-1] = row
+            self.scores[-1] = np.nan if score is None else score
+        else:
+            # The oldest row in the window leaves it; subtracted before truncating
+            # in case history_days == window drops it from self.z too.
+            if len(self.z) >= self.window:
+                self._accumulate(self.z[-self.window], -1)
+            self.days = np.append(self.days, np.int32(day))[-self.history_days:]
+            self.scores = np.append(self.scores, np.nan if score is None else score)[-self.history_days:]
+            self.z = np.vstack([self.z, row])[-self.history_days:]
+        self._accumulate(row, 1)
+        return applied
+
+    def correlations(self) -> dict:
+        """Pearson correlations between indicators' z-scores over the rolling window.
+
+        Pairs where either side has not varied over the window are left out.
+        """
+        n = min(len(self.z), self.window)
+        if n < 2:
+            return {}
+        mean = self._sum / n
+        cov = self._cross / n - np.outer(mean, mean)
+        std = np.sqrt(np.clip(np.diag(cov), 0, None))
+        varied = std > 1e-9
+        result = {}
+        for i, a in enumerate(self.keys):
+            if varied[i]:
+                result[a] = {
+                    b: round(float(np.clip(cov[i, j] / (std[i] * std[j]), -1, 1)), 4)
+                    for j, b in enumerate(self.keys) if j != i and varied[j]
+                }
+        return result
+
+    def summary(self, weights: dict) -> dict:
+        """The dashboard payload: score, status, per-indicator components, correlations and score history."""
+        score = self.composite(weights)
+        norm = sum(abs(weights.get(key, 0.0)) for key, z in self.zscores().items() if z is not None) or 1.0
+        threshold = settings.REGIME_THRESHOLD
+        status = (
+            "neutral" if score is None or abs(score) <= threshold else "bullish" if score > 0 else "bearish"
+        )
+        return {
+            "name": REGIME_NAME,
+            "value": "n/a" if score is None else f"{score:+.2f}",
+            "score": score,
+            "status": status,
+            "components": {
+                key: {
+                    "value": self.stats[key].latest, "zScore": z, "weight": weights.get(key, 0.0),
+                    "contribution": None if z is None else weights.get(key, 0.0) * z / norm,
+                }
+                for key, z in self.zscores().items()
+            },
+            "correlations": self.correlations(),
+            "history": [
+                {"name": from_day(day), "value": float(score)}
+                for day, score in zip(self.days, self.scores) if not np.isnan(score)
+            ],
+        }
+
+    def to_redis(self) -> dict:
+        return {
+            "meta": json.dumps({"keys": self.keys, "stats": {key: s.to_dict() for key, s in self.stats.items()}}),
+            "days": self.days.tobytes(),
+            "scores": self.scores.tobytes(),
+            "z": self.z.tobytes(),
+        }
+
+    @classmethod
+    def from_redis(cls, mapping: dict, keys: Iterable[str], history_days: int, window: int) -> "RegimeState":
+        """Restores a state for `keys`; indicators added since it was saved start with no history."""
+        state = cls(keys, history_days, window)
+        meta = json.loads(mapping[b"meta"])
+        for key, stats in meta["stats"].items():
+            if key in state.stats:
+                state.stats[key] = RunningStats.from_dict(stats)
+        days = np.frombuffer(mapping[b"days"], dtype=np.int32)
+        z = np.frombuffer(mapping[b"z"], dtype=np.float64).reshape(len(days), len(meta["keys"]))
+        state.days = days[-state.history_days:].copy()
+        state.scores = np.frombuffer(mapping[b"scores"], dtype=np.float64)[-state.history_days:].copy()
+        state.z = np.zeros((len(state.days), len(state.keys)))
+        for i, key in enumerate(meta["keys"]):
+            if key in state.stats:
+                state.z[:, state.keys.index(key)] = z[-state.history_days:, i]
+        # Re-summing on load keeps floating-point drift from accumulating across runs.
+        state._resum()
+        return state
+
+def signal_points(indicator, history: list) -> list:
+    """An indicator's history as (day, signal) points."""
+    points = []
+    for point in history:
+        try:
+            value = float(indicator.signal(point))
+        except (KeyError, TypeError, ValueError, ZeroDivisionError):
+            continue
+        points.append((to_day(parse_point_date(str(point["name"])).isoformat()), value))
+    return points
+
+async def load_regime() -> RegimeState:
+    keys = [i.key for i in INDICATORS]
+    mapping = await redis_binary.hgetall(REGIME_STATE_KEY)
+    if mapping:
+        return RegimeState.from_redis(mapping, keys, settings.REGIME_HISTORY_DAYS, settings.REGIME_CORRELATION_WINDOW_DAYS)
+    return RegimeState(keys, settings.REGIME_HISTORY_DAYS, settings.REGIME_CORRELATION_WINDOW_DAYS)
+
+async def save_regime(state: RegimeState, summary: dict) -> None:
+    async with redis_binary.pipeline(transaction=True) as pipe:
+        pipe.hset(REGIME_STATE_KEY, mapping=state.to_redis())
+        pipe.set(REGIME_KEY, dumps(summary))
+        await pipe.execute()
+
+async def update_regime(indicator, history: list) -> None:
+    """Folds an indicator's newly ingested points into the regime score.
+
+    Runs under a lock since every service updates the one shared state;
+    failures are logged, never raised to ingestion.
+    """
+    if not settings.REGIME_ENABLED:
+        return
+
+    async def run():
+        points = signal_points(indicator, history)
+        if not points:
+            return
+        state = await load_regime()
+        with cpu_timer("regime"):
+            applied = state.ingest(indicator.key, points, settings.REGIME_WEIGHTS, max(day for day, _ in points))
+            summary = state.summary(settings.REGIME_WEIGHTS) if applied else None
+        if summary:
+            await save_regime(state, summary)
+
+    try:
+        await run_exclusive("regime", run, ttl_seconds=10, wait_seconds=5)
+    except Exception as e:
+        logging.error(f"Failed to update the regime score with {indicator.key}: {e!r}")
+
+async def read_regime() -> Optional[dict]:
+    """The latest regime summary, or None before any indicator has been folded in."""
+    data = await redis_binary.get(REGIME_KEY)
+    return json.loads(data) if data else None
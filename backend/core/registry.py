@@ -0,0 +1,178 @@
+import math
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+from .config import settings
+from .technicals import read_universe, refresh_universe
+
+HOUR = 3600
+DEFAULT_REFRESH_SECONDS = settings.SCHEDULER_INTERVAL_HOURS * HOUR
+
+# --- Transforms: raw source payload -> history points, oldest first ---
+
+def fred_history(observations: list) -> list:
+    return [{"name": obs["date"], "value": obs["value"]} for obs in reversed(observations)]
+
+def alpha_vantage_history(value_field: str, limit: int = 12) -> Callable[[dict], list]:
+    # limit=None keeps every point, as backfills do
+    def transform(payload: dict, limit: Optional[int] = limit) -> list:
+        return [{"name": d["date"], "value": float(d[value_field])} for d in reversed(payload["data"][:limit])]
+    return transform
+
+def fear_greed_history(payload: dict) -> list:
+    return [{"name": d["timestamp"], "value": int(d["value"])} for d in reversed(payload["data"])]
+
+def moving_average_history(state) -> list:
+    return [
+        {"name": day, **{f"{w}D": ma[w] for w in state.windows}}
+        for day, ma in state.history() if not math.isnan(ma[max(state.windows)])
+    ]
+
+# --- Status rules and display formats: history points -> string ---
+
+def above(level: float, status: str, otherwise: str) -> Callable[[list], str]:
+    return lambda history: status if history[-1]["value"] > level else otherwise
+
+def below(level: float, status: str, otherwise: str) -> Callable[[list], str]:
+    return lambda history: status if history[-1]["value"] < level else otherwise
+
+def bands(low: float, high: float, below_low: str, above_high: str, between: str = "neutral") -> Callable[[list], str]:
+    def rule(history: list) -> str:
+        value = history[-1]["value"]
+        return above_high if value > high else below_low if value < low else between
+    return rule
+
+def direction(rising: str, falling: str) -> Callable[[list], str]:
+    return lambda history: rising if history[-1]["value"] > history[-2]["value"] else falling
+
+def crossover(fast: str, slow: str, above_slow: str, below_slow: str) -> Callable[[list], str]:
+    return lambda history: above_slow if history[-1][fast] > history[-1][slow] else below_slow
+
+def constant(status: str) -> Callable[[list], str]:
+    return lambda history: status
+
+def formatted(template: str) -> Callable[[list], str]:
+    return lambda history: template.format(history[-1]["value"])
+
+# --- Signals: history point -> number fed to the regime score (see core/regime.py) ---
+
+def point_value(point: dict) -> float:
+    return point["value"]
+
+def spread_pct(fast: str, slow: str) -> Callable[[dict], float]:
+    return lambda point: (point[fast] / point[slow] - 1) * 100
+
+# --- Registry ---
+
+@dataclass(frozen=True)
+class Indicator:
+    """One dashboard indicator: where it comes from and how it is presented."""
+    key: str            # key in /indicators responses
+    name: str           # display name, also the indicator:<name> cache key
+    service: str        # service that ingests and serves it
+    source: str         # fetcher in core.sources.SOURCES
+    series: str         # source-specific series id, function or symbol
+    description: str
+    transform: Callable[[Any], list]
+    status: Callable[[list], str]
+    display: Callable[[list], str]
+    params: dict = field(default_factory=dict)
+    refresh_seconds: int = DEFAULT_REFRESH_SECONDS  # how long a fetch stays fresh before it is due again
+    signal: Callable[[dict], float] = point_value    # a point's number for the regime score
+
+INDICATORS = (
+    Indicator(
+        key="yieldCurve", name="Yield Curve (10Y vs 2Y)", service="economic",
+        source="fred", series="T10Y2Y", params={"limit": 12},
+        description="Market's expectation for future growth.",
+        transform=fred_history, status=below(0, "bearish", otherwise="bullish"), display=formatted("{:.2f}"),
+    ),
+    Indicator(
+        key="ismPmi", name="ISM Manufacturing PMI", service="economic",
+        source="fred", series="NAPM", params={"limit": 12},
+        description="Health of the manufacturing sector.",
+        transform=fred_history, status=above(50, "bullish", otherwise="bearish"), display=formatted("{:.2f}"),
+        refresh_seconds=24 * HOUR,  # monthly release
+    ),
+    Indicator(
+        key="joblessClaims", name="Initial Jobless Claims", service="economic",
+        source="fred", series="ICSA", params={"limit": 12},
+        description="Health of the labor market.",
+        transform=fred_history, status=constant("neutral"), display=formatted("{:.2f}"),
+        refresh_seconds=12 * HOUR,  # weekly release
+    ),
+    Indicator(
+        key="vix", name="VIX (Fear Gauge)", service="sentiment",
+        source="alpha_vantage", series="VIX",
+        description="The market's expectation of 30-day volatility.",
+        transform=alpha_vantage_history("value"),
+        status=bands(15, 35, below_low="bullish", above_high="bearish"), display=formatted("{:.2f}"),
+    ),
+    Indicator(
+        key="fearGreed", name="CNN Fear & Greed", service="sentiment",
+        source="fear_greed", series="fng", params={"limit": 30},
+        description="A composite index of 7 sentiment indicators.",
+        transform=fear_greed_history,
+        status=bands(25, 75, below_low="bullish", above_high="bearish"), display=formatted("{}"),
+    ),
+    Indicator(
+        key="movingAverages", name="50-Day vs 200-Day MA", service="technicals",
+        source="moving_averages", series="SPY", params={"windows": (50, 200), "history_length": 60},
+        description="The long-term trend of the S&P 500 (SPY).",
+        transform=moving_average_history,
+        status=crossover("50D", "200D", "bullish", "bearish"),
+        display=crossover("50D", "200D", "Golden Cross", "Death Cross"), signal=spread_pct("50D", "200D"),
+    ),
+    Indicator(
+        key="bondSpreads", name="High-Yield Spreads", service="cross_asset",
+        source="fred", series="BAMLH0A0HYM2", params={"limit": 12},  # BofA US High Yield Index Option-Adjusted Spread
+        description="Extra yield investors demand for risky corporate bonds.",
+        transform=fred_history, status=direction(rising="bearish", falling="bullish"), display=formatted("{:.2f}%"),
+    ),
+    Indicator(
+        key="gold", name="Gold Price", service="cross_asset",
+        source="alpha_vantage", series="COMMODITIES", params={"interval": "monthly", "commodities": "GOLD"},
+        description="A traditional safe-haven asset.",
+        transform=alpha_vantage_history("price"), status=constant("neutral"), display=formatted("${:,.2f}"),
+        refresh_seconds=24 * HOUR,  # monthly series
+    ),
+)
+
+@dataclass(frozen=True)
+class Job:
+    """A service-specific refresh task that is not a single indicator."""
+    key: str            # key in the refresh metadata and ?indicators= filters
+    run: Callable[[], Awaitable[Any]]
+    refresh_seconds: int = DEFAULT_REFRESH_SECONDS
+
+@dataclass(frozen=True)
+class Service:
+    """A group of indicators deployed together, plus any service-specific jobs and endpoints."""
+    name: str
+    title: str
+    label: str
+    jobs: tuple = ()                               # extra Jobs refreshed alongside the indicators
+    endpoints: dict = field(default_factory=dict)  # extra GET endpoints: path -> async callable
+
+SERVICES = {
+    "economic": Service("economic", "Economic Indicators Service", "Economic"),
+    "sentiment": Service("sentiment", "Sentiment Indicators Service", "Sentiment"),
+    "technicals": Service(
+        "technicals", "Technical & Market Internals Service", "Technicals",
+        jobs=(Job("universe", refresh_universe),), endpoints={"universe": read_universe},
+    ),
+    "cross_asset": Service("cross_asset", "Cross-Asset Indicators Service", "Cross-asset"),
+}
+
+def get_indicator(key: str) -> Optional[Indicator]:
+    return next((i for i in INDICATORS if i.key == key), None)
+
+def indicators_for(service: str) -> tuple:
+    return tuple(i for i in INDICATORS if i.service == service)
+
+def refreshables(service: str) -> tuple:
+    """Indicators and jobs of a service, each with a key and a refresh_seconds policy."""
+    return indicators_for(service) + SERVICES[service].jobs
+
+def key_map(service: Optional[str] = None) -> dict:
+    """Maps indicator names to their response keys, for one service or all."""
+    return {i.name: i.key for i in INDICATORS if service is None or i.service == service}
@@ -0,0 +1,142 @@
+import json
+from datetime import date
+from typing import Iterable, Optional, Tuple
+import numpy as np
+from .database import redis_binary
+
+_EPOCH = date(1970, 1, 1)
+
+def to_day(iso_date: str) -> int:
+    """Converts an ISO date to days since the Unix epoch."""
+    return (date.fromisoformat(iso_date) - _EPOCH).days
+
+def from_day(day: int) -> str:
+    """Converts days since the Unix epoch back to an ISO date."""
+    return date.fromordinal(_EPOCH.toordinal() + int(day)).isoformat()
+
+class RingBuffer:
+    """Fixed-capacity NumPy ring buffer; appends overwrite the oldest value."""
+
+    def __init__(self, capacity: int, dtype=np.float64, values: Optional[np.ndarray] = None):
+        self._data = np.full(capacity, np.nan) if dtype == np.float64 else np.zeros(capacity, dtype=dtype)
+        self._start = 0
+        self.size = 0
+        if values is not None:
+            for value in values[-capacity:]:
+                self.append(value)
+
+    @property
+    def capacity(self) -> int:
+        return len(self._data)
+
+    def append(self, value) -> None:
+        end = (self._start + self.size) % self.capacity
+        self._data[end] = value
+        if self.size < self.capacity:
+            self.size += 1
+        else:
+            self._start = (self._start + 1) % self.capacity
+
+    def from_end(self, offset: int):
+        """Returns the value `offset` positions back from the newest (1 = newest)."""
+        return self._data[(self._start + self.size - offset) % self.capacity]
+
+    def to_array(self) -> np.ndarray:
+        """Returns the contents oldest-first as a contiguous array."""
+        index = (self._start + np.arange(self.size)) % self.capacity
+        return self._data[index]
+
+class MovingAverageState:
+    """Running simple moving averages over the last closes of one symbol.
+
+    Keeps the last max(windows) closes plus `history_length` points of each
+    average, so each new bar costs O(len(windows)) and nothing is recomputed.
+    """
+
+    def __init__(self, windows: Iterable[int], history_length: int):
+        self.windows = tuple(sorted(set(windows)))
+        self.history_length = history_length
+        self.closes = RingBuffer(max(self.windows))
+        self.days = RingBuffer(history_length, dtype=np.int32)
+        self.averages = {w: RingBuffer(history_length) for w in self.windows}
+        self._sums = {w: 0.0 for w in self.windows}
+        self.last_day: Optional[int] = None
+
+    @property
+    def seed_length(self) -> int:
+        """Bars needed to fill both the close window and the average history."""
+        return max(self.windows) + self.history_length - 1
+
+    @property
+    def is_warm(self) -> bool:
+        return self.closes.size == self.closes.capacity
+
+    def update(self, bars: Iterable[Tuple[str, float]]) -> int:
+        """Applies bars (ISO date, close) newer than the last seen bar; returns how many."""
+        applied = 0
+        for iso_date, close in sorted(bars):
+            day = to_day(iso_date)
+            if self.last_day is not None and day <= self.last_day:
+                continue
+            for w in self.windows:
+                if self.closes.size >= w:
+                    self._sums[w] -= self.closes.from_end(w)
+            self.closes.append(close)
+            self.days.append(day)
+            for w in self.windows:
+                self._sums[w] += close
+                self.averages[w].append(self._sums[w] / w if self.closes.size >= w else np.nan)
+            self.last_day = day
+            applied += 1
+        return applied
+
+    def latest(self) -> dict:
+        """Returns the newest value of each moving average."""
+        return {w: float(self.averages[w].from_end(1)) for w in self.windows}
+
+    def history(self) -> list:
+        """Returns (ISO date, {window: average}) pairs, oldest first."""
+        days = self.days.to_array()
+        averages = {w: self.averages[w].to_array() for w in self.windows}
+        return [(from_day(day), {w: float(averages[w][i]) for w in self.windows}) for i, day in enumerate(days)]
+
+    def to_redis(self) -> dict:
+        mapping = {
+            "meta": json.dumps({"windows": self.windows, "history_length": self.history_length, "last_day": self.last_day}),
+            "closes": self.closes.to_array().tobytes(),
+            "days": self.days.to_array().tobytes(),
+        }
+        for w in self.windows:
+            mapping[f"ma:{w}"] = self.averages[w].to_array().tobytes()
+        return mapping
+
+    @classmethod
+    def from_redis(cls, mapping: dict) -> "MovingAverageState":
+        meta = json.loads(mapping[b"meta"])
+        state = cls(meta["windows"], meta["history_length"])
+        closes = np.frombuffer(mapping[b"closes"], dtype=np.float64)
+        state.closes = RingBuffer(state.closes.capacity, values=closes)
+        state.days = RingBuffer(state.history_length, dtype=np.int32, values=np.frombuffer(mapping[b"days"], dtype=np.int32))
+        for w in state.windows:
+            state.averages[w] = RingBuffer(state.history_length, values=np.frombuffer(mapping[f"ma:{w}".encode()], dtype=np.float64))
+            # Re-summing on load keeps floating-point drift from accumulating across runs.
+            state._sums[w] = float(closes[-w:].sum())
+        state.last_day = meta["last_day"]
+        return state
+
+def state_key(symbol: str, windows: Iterable[int]) -> str:
+    """Returns the Redis key of a symbol's moving-average state for a set of windows."""
+    return f"ma-state:{symbol}:{'-'.join(str(w) for w in sorted(set(windows)))}"
+
+async def load_state(symbol: str, windows: Iterable[int], history_length: int) -> MovingAverageState:
+    """Loads a symbol's state from Redis, or returns an empty one."""
+    mapping = await redis_binary.hgetall(state_key(symbol, windows))
+    if mapping:
+        state = MovingAverageState.from_redis(mapping)
+        if state.history_length == history_length:
+            return state
+    return MovingAverageState(windows, history_length)
+
+async def save_state(symbol: str, state: MovingAverageState) -> None:
+    """Persists a symbol's state to Redis."""
+    await redis_binary.hset(state_key(symbol, state.windows), mapping=state.to_redis())
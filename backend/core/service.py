@@ -0,0 +1,264 @@
+import asyncio
+import functools
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Iterable, Literal, Optional, Sequence
+from fastapi import FastAPI, HTTPException
+from .cache import is_due, is_fresh, mark_failed, mark_refreshed, read_cached, write_indicator
+from .codec import OrjsonResponse, decode_indicator
+from .compute import compute
+from .config import settings
+from .database import close_connections, redis_cache
+from .feature_flags import feature_flags
+from .http import NOT_MODIFIED, UPSTREAM_SETTINGS, open_clients, close_clients
+from .locks import single_flight
+from .metrics import CACHE_AGE, CACHE_READS, REFRESH_ERRORS, cpu_timer, metrics_response
+from .refresh_jobs import RefreshJobs, read_job
+from .registry import INDICATORS, SERVICES, Indicator, Job, indicators_for, key_map
+from .sources import SOURCES
+
+async def _refresh_indicator(indicator: Indicator) -> Optional[dict]:
+    fetch, _ = SOURCES[indicator.source]
+    raw = await fetch(indicator)
+    if raw is NOT_MODIFIED:
+        # The cached copy is still current; only its refresh deadline moves.
+        await mark_refreshed(indicator.key, indicator.refresh_seconds)
+        return None
+    if raw is None:
+        # Nothing usable came back (e.g. a throttled upstream): back off like a failure.
+        await mark_failed(indicator.key)
+        return None
+    with cpu_timer(indicator.key):
+        history = indicator.transform(raw)
+        processed_data = {
+            "name": indicator.name, "value": indicator.display(history), "status": indicator.status(history),
+            "description": indicator.description,
+            "history": history,
+        }
+    # Marks the indicator refreshed in the same transaction.
+    await write_indicator(indicator, processed_data)
+    # Imported on first use, and only if enabled, so a service starts without them.
+    if settings.REGIME_ENABLED:
+        from .regime import update_regime
+        await update_regime(indicator, history)
+    if settings.ALERTS_ENABLED:
+        from .alerts import check_alerts
+        await check_alerts(indicator, history)
+    return processed_data
+
+async def _refresh_once(key: str, refresh: Callable[[], Awaitable], force: bool):
+    """Runs a refresh under the key's single-flight lock.
+
+    Unless forced, a key another replica refreshed while we waited, or one
+    backing off after failures, is left alone. A refresh that raises records a
+    failure, so it is retried with backoff rather than on every tick or read.
+    """
+    async def run():
+        if not force and await is_fresh(key):
+            return None
+        try:
+            return await refresh()
+        except Exception:
+            await mark_failed(key)
+            raise
+    return await single_flight(f"refresh:{key}", run, settings.REFRESH_LOCK_SECONDS)
+
+async def refresh_indicator(indicator: Indicator, force: bool = True) -> Optional[dict]:
+    """Fetches, transforms and caches one indicator, once at a time across replicas.
+
+    Returns the processed data, or None if nothing was written.
+    """
+    return await _refresh_once(indicator.key, lambda: _refresh_indicator(indicator), force)
+
+async def run_job(job: Job, force: bool = True) -> Optional[bool]:
+    """Runs a service job once at a time across replicas; returns None if it was skipped."""
+    async def run():
+        await job.run()
+        await mark_refreshed(job.key, job.refresh_seconds)
+        return True
+    return await _refresh_once(job.key, run, force)
+
+async def _timed_refresh(service: str, key: str, refresh: Awaitable, workers: asyncio.Semaphore) -> dict:
+    async with workers:
+        started = time.monotonic()
+        try:
+            result = {"key": key, "status": "skipped" if await refresh is None else "updated"}
+        except Exception as e:
+            logging.error(f"Failed to refresh {key} in {service}: {e!r}")
+            REFRESH_ERRORS.labels(service, key).inc()
+            result = {"key": key, "status": "failed", "error": repr(e)}
+    result["durationMs"] = round((time.monotonic() - started) * 1000)
+    return result
+
+async def update_service(service: str, keys: Optional[Iterable[str]] = None) -> list:
+    """The core logic for the scheduler to call: refreshes a service's indicators and jobs.
+
+    With keys, only the indicators and jobs with those registry keys are refreshed,
+    and only if no other replica has refreshed them since they fell due. Anything
+    switched off by its feature flag is never fetched. At most REFRESH_CONCURRENCY
+    refreshes run at once. Returns each one's {"key", "status", "durationMs"}, the
+    status being "updated", "skipped" (nothing new was written) or "failed".
+    """
+    force = keys is None
+    keys = None if keys is None else set(keys)
+
+    def wanted(item) -> bool:
+        return (force or item.key in keys) and feature_flags.indicator_enabled(item.key)
+
+    items = [i for i in indicators_for(service) if wanted(i)]
+    jobs = [job for job in SERVICES[service].jobs if wanted(job)]
+    workers = asyncio.Semaphore(settings.REFRESH_CONCURRENCY)
+    tasks = [_timed_refresh(service, i.key, refresh_indicator(i, force), workers) for i in items]
+    tasks += [_timed_refresh(service, job.key, run_job(job, force), workers) for job in jobs]
+    return list(await asyncio.gather(*tasks))
+
+# Background refreshes started by readers, by indicator key; holding the task
+# keeps it alive and stops concurrent readers from starting a second one.
+_revalidating: dict[str, asyncio.Task] = {}
+
+def _revalidated(key: str, task: asyncio.Task) -> None:
+    _revalidating.pop(key, None)
+    if not task.cancelled() and task.exception():
+        logging.error(f"Background refresh of {key} failed: {task.exception()}")
+
+def revalidate_stale(indicators: Iterable[Indicator]) -> None:
+    """Refreshes stale indicators in the background, at most once at a time per indicator."""
+    for indicator in indicators:
+        if indicator.key not in _revalidating and feature_flags.indicator_enabled(indicator.key):
+            task = asyncio.create_task(refresh_indicator(indicator, force=False))
+            _revalidating[indicator.key] = task
+            task.add_done_callback(lambda t, key=indicator.key: _revalidated(key, t))
+
+async def read_indicators(service: Optional[str] = None, shape: str = "rows", revalidate: bool = True) -> dict:
+    """Fetches a service's indicators (or all of them) from the cache in one round trip.
+
+    shape picks the history layout, "rows" or "columnar" (see core.codec).
+    Each indicator carries "updatedAt", "expiresAt" and a "stale" flag once
+    its refresh policy has expired; stale indicators are still served while
+    they are revalidated. Indicators switched off by their feature flag are left out.
+    Readers that do not ingest (the gateway) pass revalidate=False and leave
+    refreshing to the services.
+    """
+    names = {name: key for name, key in key_map(service).items() if feature_flags.indicator_enabled(key)}
+    cached_results, meta_results = await read_cached(names)
+    meta_by_key = {key: json.loads(meta) for key, meta in zip(names.values(), meta_results) if meta}
+    now = time.time()
+    final_data = {}
+    due = []
+    for key, data in zip(names.values(), cached_results):
+        if not data:
+            CACHE_READS.labels(key, "miss").inc()
+            continue
+        indicator_data = decode_indicator(data, shape)
+        final_key = names.get(indicator_data["name"])
+        if final_key:
+            meta = meta_by_key.get(final_key, {})
+            indicator_data["updatedAt"] = meta.get("fetchedAt")
+            indicator_data["expiresAt"] = meta.get("expiresAt")
+            indicator_data["stale"] = meta.get("expiresAt", 0) <= now
+            if is_due(meta, now):
+                due.append(final_key)
+            if "fetchedAt" in meta:
+                CACHE_AGE.labels(final_key).set(now - meta["fetchedAt"])
+            CACHE_READS.labels(final_key, "stale" if indicator_data["stale"] else "hit").inc()
+            final_data[final_key] = indicator_data
+    if due and revalidate and settings.STALE_WHILE_REVALIDATE:
+        revalidate_stale(i for i in INDICATORS if i.key in due)
+    return final_data
+
+async def read_sections(shape: str = "rows", revalidate: bool = True) -> dict:
+    """Every service's indicators from one cache read, as {service: {key: indicator}}."""
+    indicators = await read_indicators(shape=shape, revalidate=revalidate)
+    sections = {name: {} for name in SERVICES}
+    for indicator in INDICATORS:
+        if indicator.key in indicators:
+            sections[indicator.service][indicator.key] = indicators[indicator.key]
+    return sections
+
+def service_endpoints(service: str) -> dict:
+    """GET endpoints a service exposes, as path -> async callable."""
+    async def get_indicators(shape: Literal["rows", "columnar"] = "rows"):
+        return await read_indicators(service, shape)
+    return {"indicators": get_indicators, **SERVICES[service].endpoints}
+
+def orjson_route(endpoint: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+    """Wraps an endpoint returning plain data so its result is encoded by orjson directly."""
+    @functools.wraps(endpoint)
+    async def route(*args, **kwargs):
+        return OrjsonResponse(await endpoint(*args, **kwargs))
+    return route
+
+def upstreams_for(service: str) -> set:
+    return {SOURCES[i.source][1] for i in indicators_for(service)}
+
+def required_settings(service: str) -> list:
+    """Settings a service cannot start without: its upstreams' credentials, and Postgres if history is on."""
+    names = sorted({name for upstream in upstreams_for(service) for name in UPSTREAM_SETTINGS.get(upstream, ())})
+    return names + ["DATABASE_URL"] if settings.HISTORY_ENABLED else names
+
+async def check_ready():
+    """Readiness probe: 200 once this process can reach Redis, 503 until then."""
+    try:
+        await asyncio.wait_for(redis_cache.ping(), timeout=1.0)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Redis is not reachable: {e!r}")
+    return {"status": "ready"}
+
+def create_service_app(service: str, dependencies: Sequence = ()) -> FastAPI:
+    """Builds the FastAPI app for one service from the indicator registry.
+
+    dependencies apply to every route, e.g. the gateway's API key check when
+    it mounts the service in monolith mode.
+    """
+    spec = SERVICES[service]
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        settings.require(f"The {service} service", *required_settings(service))
+        open_clients(*upstreams_for(service))
+        flag_watcher = asyncio.create_task(feature_flags.watch())
+        rule_watcher = None
+        if settings.ALERTS_ENABLED:
+            from .alerts import rule_index
+            rule_watcher = asyncio.create_task(rule_index.watch())
+        yield
+        if rule_watcher:
+            rule_watcher.cancel()
+        flag_watcher.cancel()
+        compute.shutdown()
+        await close_clients()
+        await close_connections()
+
+    app = FastAPI(title=spec.title, lifespan=lifespan, dependencies=list(dependencies))
+    app.add_api_route("/metrics", metrics_response, methods=["GET"], include_in_schema=False)
+    app.add_api_route("/ready", check_ready, methods=["GET"], include_in_schema=False)
+
+    jobs = RefreshJobs(service, lambda keys: update_service(service, keys))
+
+    @app.post("/update-cache")
+    async def trigger_update_cache(indicators: Optional[str] = None, wait: bool = False):
+        """Starts a tracked refresh job for the scheduler and returns it without waiting.
+
+        ?indicators=key1,key2 limits the refresh to the indicators and jobs that are due.
+        A trigger the running job already covers joins it; any other is merged into the
+        one job queued behind it. ?wait=true responds once the job has finished.
+        """
+        keys = indicators.split(",") if indicators else None
+        job = await jobs.submit(keys)
+        if wait:
+            job = await jobs.wait(job)
+        return {"message": f"{spec.label} indicators cache update triggered.", "job": job}
+
+    @app.get("/jobs/{job_id}")
+    async def get_refresh_job(job_id: str):
+        """A refresh job's status and, once finished, each key's result and duration."""
+        job = jobs.get(job_id) or await read_job(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Unknown refresh job {job_id}")
+        return job
+
+    for path, endpoint in service_endpoints(service).items():
+        app.add_api_route(f"/{path}", orjson_route(endpoint), methods=["GET"])
+    return app
@@ -0,0 +1,46 @@
+from .alpha_vantage import alpha_vantage_client
+from .config import settings
+from .fred import fred_client
+from .http import ALPHA_VANTAGE, FEAR_GREED, FRED, NOT_MODIFIED, conditional_get
+from .metrics import cpu_timer, upstream_timer
+from .rolling import MovingAverageState, load_state, save_state, to_day
+
+FEAR_GREED_URL = f"{settings.FEAR_GREED_BASE_URL}/fng/"
+
+async def update_moving_averages(symbol: str, windows=(50, 200), history_length: int = 60):
+    """Advances a symbol's stored moving averages with only the bars it has not seen."""
+    state = await load_state(symbol, windows, history_length)
+    bars = await alpha_vantage_client.get_daily_closes(symbol, "compact") if state.is_warm else []
+    # A cold state, or a gap longer than a compact fetch covers, needs the full history once.
+    if not bars or to_day(bars[0][0]) > state.last_day:
+        bars = await alpha_vantage_client.get_daily_closes(symbol, "full")
+        if not bars: return None
+        state = MovingAverageState(windows, history_length)
+        bars = bars[-state.seed_length:]
+    with cpu_timer(f"moving_averages:{symbol}"):
+        state.update(bars)
+    await save_state(symbol, state)
+    return state
+
+async def fetch_fred(indicator):
+    return await fred_client.get_observations(indicator.series, **indicator.params)
+
+async def fetch_alpha_vantage(indicator):
+    return await alpha_vantage_client.query(function=indicator.series, **indicator.params)
+
+async def fetch_fear_greed(indicator):
+    with upstream_timer(FEAR_GREED, indicator.series):
+        response = await conditional_get(FEAR_GREED, FEAR_GREED_URL, params=indicator.params)
+    return response if response is NOT_MODIFIED else response.json()
+
+async def fetch_moving_averages(indicator):
+    return await update_moving_averages(indicator.series, **indicator.params)
+
+# Source name -> (fetcher returning the raw payload for an Indicator, upstream it uses).
+# Fetchers return None when there is no data and NOT_MODIFIED when nothing changed.
+SOURCES = {
+    "fred": (fetch_fred, FRED),
+    "alpha_vantage": (fetch_alpha_vantage, ALPHA_VANTAGE),
+    "fear_greed": (fetch_fear_greed, FEAR_GREED),
+    "moving_averages": (fetch_moving_averages, ALPHA_VANTAGE),
+}
@@ -0,0 +1,236 @@
+import asyncio
+import json
+import logging
+from typing import Iterable
+import numpy as np
+from .alpha_vantage import alpha_vantage_client
+from .config import settings
+from .database import redis_binary, redis_cache
+from .compute import compute, transform
+from .rolling import from_day, to_day
+
+PRICE_MATRIX_KEY = "technicals:closes"
+UNIVERSE_KEY = "technicals:universe"
+
+class PriceMatrix:
+    """Daily closes for a universe of symbols as one (symbols x days) float64 array.
+
+    Days are trading days (as days since the epoch) shared by every row; a
+    symbol without a bar on a day carries its previous close forward, and
+    leading NaNs mark days before a symbol has any history.
+    """
+
+    def __init__(self, symbols: list, days: np.ndarray, closes: np.ndarray, capacity: int):
+        self.symbols = list(symbols)
+        self.days = days
+        self.closes = closes
+        self.capacity = capacity
+        self._rows = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+    @classmethod
+    def empty(cls, symbols: Iterable[str], capacity: int) -> "PriceMatrix":
+        symbols = list(symbols)
+        return cls(symbols, np.zeros(0, dtype=np.int32), np.full((len(symbols), 0), np.nan), capacity)
+
+    def reindex(self, symbols: Iterable[str]) -> "PriceMatrix":
+        """Returns a matrix over `symbols`; new symbols start with no history."""
+        symbols = list(symbols)
+        closes = np.full((len(symbols), len(self.days)), np.nan)
+        for i, symbol in enumerate(symbols):
+            if symbol in self._rows:
+                closes[i] = self.closes[self._rows[symbol]]
+        return PriceMatrix(symbols, self.days, closes, self.capacity)
+
+    def last_day(self, symbol: str):
+        """Returns the last day a symbol has a close for, or None."""
+        valid = np.flatnonzero(~np.isnan(self.closes[self._rows[symbol]]))
+        return int(self.days[valid[-1]]) if len(valid) else None
+
+    def merge(self, bars_by_symbol: dict) -> "PriceMatrix":
+        """Returns a matrix with new (ISO date, close) bars merged in, keeping the last `capacity` days."""
+        parsed = {
+            symbol: (np.array([to_day(d) for d, _ in bars], dtype=np.int32), np.array([c for _, c in bars], dtype=np.float64))
+            for symbol, bars in bars_by_symbol.items() if bars
+        }
+        days = np.union1d(self.days, np.concatenate([d for d, _ in parsed.values()] or [self.days]))
+        days = days[-self.capacity:].astype(np.int32)
+
+        closes = np.full((len(self.symbols), len(days)), np.nan)
+        src, dst = _align(self.days, days)
+        closes[:, dst] = self.closes[:, src]
+        for symbol, (bar_days, bar_closes) in parsed.items():
+            src, dst = _align(bar_days, days)
+            closes[self._rows[symbol], dst] = bar_closes[src]
+        return PriceMatrix(self.symbols, days, _forward_fill(closes), self.capacity)
+
+    def to_redis(self) -> dict:
+        return {
+            "symbols": json.dumps(self.symbols),
+            "days": self.days.tobytes(),
+            "closes": self.closes.tobytes(),
+        }
+
+    @classmethod
+    def from_redis(cls, mapping: dict, capacity: int) -> "PriceMatrix":
+        symbols = json.loads(mapping[b"symbols"])
+        days = np.frombuffer(mapping[b"days"], dtype=np.int32)
+        closes = np.frombuffer(mapping[b"closes"], dtype=np.float64).reshape(len(symbols), len(days))
+        return cls(symbols, days[-capacity:].copy(), closes[:, -capacity:].copy(), capacity)
+
+def _align(source_days: np.ndarray, target_days: np.ndarray):
+    """Returns (source indexes, target indexes) of the days present in both."""
+    positions = np.searchsorted(target_days, source_days)
+    found = positions < len(target_days)
+    found[found] = target_days[positions[found]] == source_days[found]
+    return np.flatnonzero(found), positions[found]
+
+def _forward_fill(values: np.ndarray) -> np.ndarray:
+    mask = np.isnan(values)
+    index = np.where(mask, 0, np.arange(values.shape[1]))
+    np.maximum.accumulate(index, axis=1, out=index)
+    # Leading gaps map to column 0, which is itself NaN for them, so they stay NaN.
+    return values[np.arange(values.shape[0])[:, None], index]
+
+async def load_price_matrix(symbols: Iterable[str], capacity: int) -> PriceMatrix:
+    """Loads the stored price matrix re-indexed to `symbols`, or an empty one."""
+    mapping = await redis_binary.hgetall(PRICE_MATRIX_KEY)
+    if not mapping:
+        return PriceMatrix.empty(symbols, capacity)
+    return PriceMatrix.from_redis(mapping, capacity).reindex(symbols)
+
+async def save_price_matrix(matrix: PriceMatrix) -> None:
+    await redis_binary.hset(PRICE_MATRIX_KEY, mapping=matrix.to_redis())
+
+# --- Vectorized indicators (every function works row-wise on symbols x days) ---
+
+def _sma(closes: np.ndarray, window: int, lag: int = 0) -> np.ndarray:
+    end = closes.shape[1] - lag
+    if end < window:
+        return np.full(closes.shape[0], np.nan)
+    return closes[:, end - window:end].mean(axis=1)
+
+def _std(closes: np.ndarray, window: int) -> np.ndarray:
+    if closes.shape[1] < window:
+        return np.full(closes.shape[0], np.nan)
+    return closes[:, -window:].std(axis=1)
+
+def _ewm(values: np.ndarray, alpha: float) -> np.ndarray:
+    """Exponentially weighted mean along days, seeded at each row's first valid value."""
+    out = np.empty_like(values)
+    current = np.full(values.shape[0], np.nan)
+    for t in range(values.shape[1]):
+        x = values[:, t]
+        current = np.where(np.isnan(current), x, alpha * x + (1 - alpha) * current)
+        out[:, t] = current
+    return out
+
+def _ema(closes: np.ndarray, span: int, counts: np.ndarray) -> np.ndarray:
+    ema = _ewm(closes, 2.0 / (span + 1))
+    # Until a row has `span` closes its EMA is mostly seed, so report nothing.
+    ema[counts < span] = np.nan
+    return ema
+
+def _rsi(closes: np.ndarray, period: int, counts: np.ndarray) -> np.ndarray:
+    deltas = np.diff(closes, axis=1)
+    gains = _ewm(np.clip(deltas, 0, None), 1.0 / period)[:, -1]
+    losses = _ewm(np.clip(-deltas, 0, None), 1.0 / period)[:, -1]
+    rsi = 100 - 100 / (1 + gains / losses)
+    rsi = np.where(losses == 0, np.where(gains > 0, 100.0, 50.0), rsi)
+    return np.where(counts > period, rsi, np.nan)
+
+def _cross(fast_now, slow_now, fast_prev, slow_prev) -> np.ndarray:
+    """+1 where fast crossed above slow on the last day, -1 where below, else 0."""
+    now, prev = np.sign(fast_now - slow_now), np.sign(fast_prev - slow_prev)
+    return np.where((now > 0) & (prev <= 0), 1, np.where((now < 0) & (prev >= 0), -1, 0))
+
+@transform("technicals:universe")
+def compute_indicators(closes: np.ndarray) -> dict:
+    """Computes every technical indicator for all symbols in one pass.
+
+    Returns a dict of (symbols,) arrays, NaN where a symbol lacks history.
+    """
+    if closes.shape[1] < 2:
+        closes = np.full((closes.shape[0], 2), np.nan)
+    counts = (~np.isnan(closes)).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sma50, sma200 = _sma(closes, 50), _sma(closes, 200)
+        ema12, ema26 = _ema(closes, 12, counts), _ema(closes, 26, counts)
+        sma20, std20 = _sma(closes, 20), _std(closes, 20)
+        year = closes[:, -252:]
+        high52, low52 = np.fmax.reduce(year, axis=1), np.fmin.reduce(year, axis=1)
+        last = closes[:, -1]
+        return {
+            "close": last,
+            "sma50": sma50,
+            "sma200": sma200,
+            "smaCross": _cross(sma50, sma200, _sma(closes, 50, lag=1), _sma(closes, 200, lag=1)),
+            "ema12": ema12[:, -1],
+            "ema26": ema26[:, -1],
+            "emaCross": _cross(ema12[:, -1], ema26[:, -1], ema12[:, -2], ema26[:, -2]),
+            "rsi14": _rsi(closes, 14, counts),
+            "bollingerWidth": 4 * std20 / sma20,
+            "high52w": high52,
+            "low52w": low52,
+            "pctFromHigh52w": (last / high52 - 1) * 100,
+        }
+
+def indicator_rows(matrix: PriceMatrix, indicators: dict) -> dict:
+    """Turns computed indicator arrays into one JSON-ready dict per symbol."""
+    as_of = from_day(matrix.days[-1]) if len(matrix.days) else None
+    rows = {}
+    for i, symbol in enumerate(matrix.symbols):
+        row = {"symbol": symbol, "date": as_of}
+        for name, values in indicators.items():
+            value = values[i].item()
+            row[name] = None if isinstance(value, float) and np.isnan(value) else value
+        rows[symbol] = row
+    return rows
+
+# --- Universe refresh ---
+
+async def fetch_symbol_bars(symbol: str, last_day):
+    """Fetches the bars a symbol is missing, using a full fetch only when needed."""
+    bars = await alpha_vantage_client.get_daily_closes(symbol, "compact") if last_day is not None else []
+    if not bars or to_day(bars[0][0]) > last_day:
+        bars = await alpha_vantage_client.get_daily_closes(symbol, "full")
+    return bars
+
+async def refresh_universe(symbols=None):
+    """Updates closes for the whole universe and recomputes its indicators in one pass."""
+    symbols = symbols or settings.TECHNICALS_UNIVERSE
+    matrix = await load_price_matrix(symbols, settings.TECHNICALS_LOOKBACK_DAYS)
+    # Fetches run concurrently; the shared client paces them under the rate limit.
+    results = await asyncio.gather(
+        *(fetch_symbol_bars(symbol, matrix.last_day(symbol)) for symbol in symbols), return_exceptions=True
+    )
+    for symbol, bars in zip(symbols, results):
+        if isinstance(bars, Exception):
+            logging.error(f"Failed to fetch bars for {symbol}: {bars}")
+    matrix = matrix.merge({s: bars for s, bars in zip(symbols, results) if not isinstance(bars, Exception)})
+    await save_price_matrix(matrix)
+
+    # Off the event loop, so reads stay fast while a large universe computes.
+    rows = indicator_rows(matrix, await compute.run("technicals:universe", matrix.closes))
+    summary = {
+        "asOf": from_day(matrix.days[-1]) if len(matrix.days) else None,
+        "symbols": list(rows),
+        "aboveSma200": sum(1 for r in rows.values() if r["close"] is not None and r["sma200"] is not None and r["close"] > r["sma200"]),
+        "goldenCrosses": [s for s, r in rows.items() if r["smaCross"] == 1],
+        "deathCrosses": [s for s, r in rows.items() if r["smaCross"] == -1],
+    }
+    async with redis_cache.pipeline(transaction=False) as pipe:
+        for symbol, row in rows.items():
+            pipe.set(f"technicals:symbol:{symbol}", json.dumps(row))
+        pipe.set(UNIVERSE_KEY, json.dumps(summary))
+        await pipe.execute()
+    return summary
+
+async def read_universe():
+    """Returns the latest technicals for every symbol in the universe."""
+    summary = await redis_cache.get(UNIVERSE_KEY)
+    if not summary:
+        return {"symbols": {}}
+    summary = json.loads(summary)
+    rows = await redis_cache.mget([f"technicals:symbol:{symbol}" for symbol in summary["symbols"]])
+    summary["symbols"] = {row["symbol"]: row for row in map(json.loads, filter(None, rows))}
+    return summary
@@ -0,0 +1,135 @@
+"""Upstream payloads for the emulator: recorded responses where present, generated otherwise.
+
+Recordings (see emulator/record.py) live under emulator/recordings/ as the raw
+upstream JSON. Anything not recorded is generated deterministically from a seed
+in the same format, with realistic lengths: decades of daily FRED series and
+the full SPY daily history Alpha Vantage returns for outputsize=full.
+"""
+import json
+import zlib
+from datetime import date, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+import numpy as np
+
+RECORDINGS_DIR = Path(__file__).parent / "recordings"
+
+# Generated series end here so that fixture data never depends on today's date.
+FIXTURE_END = date(2024, 12, 31)
+
+# FRED series id -> (first date, frequency, start level, daily volatility, decimals)
+FRED_SERIES = {
+    "T10Y2Y": (date(1976, 6, 1), "business", 1.0, 0.03, 2),
+    "NAPM": (date(1948, 1, 1), "monthly", 52.0, 0.35, 1),
+    "ICSA": (date(1967, 1, 7), "weekly", 250000.0, 0.02, 0),
+    "BAMLH0A0HYM2": (date(1996, 12, 31), "business", 5.0, 0.02, 2),
+}
+
+def recording_path(*parts: str) -> Path:
+    return RECORDINGS_DIR.joinpath(*parts).with_suffix(".json")
+
+def load_recording(*parts: str) -> Optional[dict]:
+    path = recording_path(*parts)
+    return json.loads(path.read_text()) if path.exists() else None
+
+def _rng(name: str, seed: int) -> np.random.Generator:
+    return np.random.default_rng([seed, zlib.crc32(name.encode())])
+
+def _dates(start: date, frequency: str) -> list:
+    if frequency == "monthly":
+        months = (FIXTURE_END.year - start.year) * 12 + FIXTURE_END.month - start.month + 1
+        return [date(start.year + (start.month - 1 + m) // 12, (start.month - 1 + m) % 12 + 1, 1) for m in range(months)]
+    step = 7 if frequency == "weekly" else 1
+    days = [start + timedelta(days=d) for d in range(0, (FIXTURE_END - start).days + 1, step)]
+    return [d for d in days if frequency != "business" or d.weekday() < 5]
+
+def _walk(rng: np.random.Generator, count: int, start: float, volatility: float, multiplicative: bool) -> np.ndarray:
+    steps = rng.normal(0.0, volatility, count)
+    if multiplicative:
+        return start * np.exp(np.cumsum(steps))
+    # Mean-reverting, so long additive series stay in a plausible range.
+    values = np.empty(count)
+    level = start
+    for i, step in enumerate(steps):
+        level += step + 0.002 * (start - level)
+        values[i] = level
+    return values
+
+@lru_cache(maxsize=None)
+def fred_observations(series_id: str, seed: int = 0) -> Optional[list]:
+    """All observations of a FRED series, oldest first, as FRED returns them."""
+    recorded = load_recording("fred", series_id)
+    if recorded is not None:
+        return recorded["observations"]
+    if series_id not in FRED_SERIES:
+        return None
+    start, frequency, level, volatility, decimals = FRED_SERIES[series_id]
+    days = _dates(start, frequency)
+    values = _walk(_rng(series_id, seed), len(days), level, volatility, multiplicative=series_id == "ICSA")
+    observations = [
+        {"realtime_start": FIXTURE_END.isoformat(), "realtime_end": FIXTURE_END.isoformat(),
+         "date": d.isoformat(), "value": f"{v:.{decimals}f}"}
+        for d, v in zip(days, values)
+    ]
+    # FRED reports missing days (e.g. market holidays) as "."
+    for i in _rng(series_id + ":missing", seed).choice(len(observations), size=len(observations) // 200, replace=False):
+        observations[i]["value"] = "."
+    return observations
+
+@lru_cache(maxsize=None)
+def daily_bars(symbol: str, seed: int = 0) -> dict:
+    """A TIME_SERIES_DAILY outputsize=full response for a symbol."""
+    recorded = load_recording("alpha_vantage", f"TIME_SERIES_DAILY-{symbol}")
+    if recorded is not None:
+        return recorded
+    days = _dates(date(1999, 11, 1), "business")
+    closes = _walk(_rng(symbol, seed), len(days), 140.0, 0.012, multiplicative=True)
+    series = {}
+    for d, close in zip(reversed(days), closes[::-1]):
+        series[d.isoformat()] = {
+            "1. open": f"{close * 0.998:.4f}", "2. high": f"{close * 1.006:.4f}",
+            "3. low": f"{close * 0.993:.4f}", "4. close": f"{close:.4f}", "5. volume": "75000000",
+        }
+    return {
+        "Meta Data": {
+            "1. Information": "Daily Prices (open, high, low, close) and Volumes", "2. Symbol": symbol,
+            "3. Last Refreshed": days[-1].isoformat(), "4. Output Size": "Full size", "5. Time Zone": "US/Eastern",
+        },
+        "Time Series (Daily)": series,
+    }
+
+@lru_cache(maxsize=None)
+def alpha_vantage_data(function: str, seed: int = 0) -> Optional[dict]:
+    """The {"data": [...]} responses, newest first, for the non-price functions the services call."""
+    recorded = load_recording("alpha_vantage", function)
+    if recorded is not None:
+        return recorded
+    if function == "VIX":
+        days = _dates(date(1990, 1, 2), "business")
+        values = _walk(_rng(function, seed), len(days), 19.0, 0.6, multiplicative=False).clip(9, 80)
+        return {"name": "CBOE Volatility Index", "data": [
+            {"date": d.isoformat(), "value": f"{v:.2f}"} for d, v in zip(reversed(days), values[::-1])
+        ]}
+    if function == "COMMODITIES":
+        months = _dates(date(1990, 1, 1), "monthly")
+        prices = _walk(_rng(function, seed), len(months), 400.0, 0.04, multiplicative=True)
+        return {"name": "Global Price of Gold", "interval": "monthly", "unit": "USD per troy ounce", "data": [
+            {"date": d.isoformat(), "price": f"{p:.2f}"} for d, p in zip(reversed(months), prices[::-1])
+        ]}
+    return None
+
+@lru_cache(maxsize=None)
+def fear_greed(seed: int = 0) -> list:
+    """Daily Fear & Greed readings, newest first, as alternative.me returns them."""
+    recorded = load_recording("fear_greed", "fng")
+    if recorded is not None:
+        return recorded["data"]
+    end = (FIXTURE_END - date(1970, 1, 1)).days * 86400
+    values = _walk(_rng("fng", seed), 2500, 50.0, 4.0, multiplicative=False).clip(1, 99).round().astype(int)
+    classifications = ((25, "Extreme Fear"), (46, "Fear"), (55, "Neutral"), (75, "Greed"), (101, "Extreme Greed"))
+    return [
+        {"value": str(v), "value_classification": next(label for limit, label in classifications if v < limit),
+         "timestamp": str(end - 86400 * i)}
+        for i, v in enumerate(values[::-1])
+    ]
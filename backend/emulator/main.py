@@ -0,0 +1,96 @@
+"""Offline stand-in for FRED, Alpha Vantage and alternative.me.
+
+Serves emulator/fixtures.py payloads on the upstreams' own paths, so the
+services work unchanged when their *_BASE_URL settings point here, or in
+process through core.http.mount_transport(httpx.ASGITransport(app), ...).
+
+    uvicorn emulator.main:app --port 8090
+    EMULATOR_LATENCY_MS=250 EMULATOR_ERROR_RATE=0.05 uvicorn emulator.main:app --port 8090
+"""
+import asyncio
+import hashlib
+import json
+import random
+from fastapi import FastAPI, Request, Response
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from emulator import fixtures
+
+class EmulatorSettings(BaseSettings):
+    """Emulator behaviour, from EMULATOR_* environment variables."""
+    model_config = SettingsConfigDict(env_prefix="EMULATOR_")
+
+    LATENCY_MS: float = 0.0   # added to every response
+    JITTER_MS: float = 0.0    # uniform extra latency on top
+    ERROR_RATE: float = 0.0   # fraction of requests answered 503
+    SEED: int = 0             # seeds both the generated fixtures and the injected faults
+
+def json_response(data, request: Request) -> Response:
+    """A JSON response with an ETag, answering 304 when the client already has it."""
+    body = json.dumps(data, separators=(",", ":")).encode()
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(body, media_type="application/json", headers={"ETag": etag})
+
+def create_emulator_app(
+    latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0, seed: int = 0,
+) -> FastAPI:
+    app = FastAPI(title="Upstream Emulator")
+    faults = random.Random(seed)
+    app.state.requests = 0
+
+    @app.middleware("http")
+    async def latency_and_errors(request: Request, call_next):
+        app.state.requests += 1
+        delay = latency_ms + faults.uniform(0, jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        if faults.random() < error_rate:
+            return Response(status_code=503, content=b"Service Unavailable (emulated)")
+        return await call_next(request)
+
+    @app.get("/fred/series/observations")
+    async def fred_observations(
+        request: Request, series_id: str, limit: int = 100000, sort_order: str = "asc",
+        observation_start: str = None, observation_end: str = None,
+    ):
+        observations = fixtures.fred_observations(series_id, seed)
+        if observations is None:
+            return Response(
+                json.dumps({"error_code": 400, "error_message": "Bad Request.  The series does not exist."}),
+                status_code=400, media_type="application/json",
+            )
+        if observation_start:
+            observations = [o for o in observations if o["date"] >= observation_start]
+        if observation_end:
+            observations = [o for o in observations if o["date"] <= observation_end]
+        if sort_order == "desc":
+            observations = observations[::-1]
+        return json_response({
+            "observation_start": observation_start or "1776-07-04", "observation_end": observation_end or "9999-12-31",
+            "sort_order": sort_order,
+            "count": len(observations), "limit": limit, "observations": observations[:limit],
+        }, request)
+
+    @app.get("/query")
+    async def alpha_vantage_query(request: Request, function: str, symbol: str = None, outputsize: str = "compact"):
+        if function == "TIME_SERIES_DAILY" and symbol:
+            data = fixtures.daily_bars(symbol, seed)
+            if outputsize != "full":
+                data = {**data, "Time Series (Daily)": dict(list(data["Time Series (Daily)"].items())[:100])}
+            return json_response(data, request)
+        data = fixtures.alpha_vantage_data(function, seed)
+        if data is None:
+            # Alpha Vantage reports bad calls with a 200 and a single-key body.
+            data = {"Error Message": f"Invalid API call. Unknown function {function}."}
+        return json_response(data, request)
+
+    @app.get("/fng/")
+    async def fear_greed(request: Request, limit: int = 1):
+        data = fixtures.fear_greed(seed)[:limit] if limit else fixtures.fear_greed(seed)
+        return json_response({"name": "Fear and Greed Index", "data": data, "metadata": {"error": None}}, request)
+
+    return app
+
+_settings = EmulatorSettings()
+app = create_emulator_app(_settings.LATENCY_MS, _settings.JITTER_MS, _settings.ERROR_RATE, _settings.SEED)
@@ -0,0 +1,64 @@
+"""Captures real upstream responses into emulator/recordings/ for the emulator to replay.
+
+Needs network access and the real API keys from .env:
+
+    python -m emulator.record             # every series the registry and universe use
+    python -m emulator.record --only fred
+"""
+import argparse
+import asyncio
+import json
+import httpx
+from core.alpha_vantage import ALPHA_VANTAGE_URL
+from core.config import settings
+from core.fred import FRED_API_URL
+from core.registry import INDICATORS
+from core.sources import FEAR_GREED_URL
+from emulator.fixtures import recording_path
+
+def save(data: dict, *parts: str) -> None:
+    path = recording_path(*parts)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, separators=(",", ":")))
+    print(f"Recorded {path}")
+
+async def record_fred(client: httpx.AsyncClient) -> None:
+    for series_id in sorted({i.series for i in INDICATORS if i.source == "fred"}):
+        response = await client.get(FRED_API_URL, params={
+            "series_id": series_id, "api_key": settings.FRED_API_KEY, "file_type": "json",
+        })
+        response.raise_for_status()
+        save(response.json(), "fred", series_id)
+
+async def record_alpha_vantage(client: httpx.AsyncClient) -> None:
+    requests = [
+        (i.series, {"function": i.series, **i.params}) for i in INDICATORS if i.source == "alpha_vantage"
+    ]
+    symbols = {i.series for i in INDICATORS if i.source == "moving_averages"} | set(settings.TECHNICALS_UNIVERSE)
+    requests += [
+        (f"TIME_SERIES_DAILY-{symbol}", {"function": "TIME_SERIES_DAILY", "symbol": symbol, "outputsize": "full"})
+        for symbol in sorted(symbols)
+    ]
+    for name, params in requests:
+        response = await client.get(ALPHA_VANTAGE_URL, params={**params, "apikey": settings.ALPHA_VANTAGE_API_KEY})
+        response.raise_for_status()
+        save(response.json(), "alpha_vantage", name)
+        # Stay under the free tier's per-minute limit.
+        await asyncio.sleep(60 / settings.ALPHA_VANTAGE_RATE_LIMIT_PER_MINUTE)
+
+async def record_fear_greed(client: httpx.AsyncClient) -> None:
+    response = await client.get(FEAR_GREED_URL, params={"limit": 0})
+    response.raise_for_status()
+    save(response.json(), "fear_greed", "fng")
+
+RECORDERS = {"fred": record_fred, "alpha_vantage": record_alpha_vantage, "fear_greed": record_fear_greed}
+
+async def main(only: list) -> None:
+    async with httpx.AsyncClient(timeout=60) as client:
+        for name in only:
+            await RECORDERS[name](client)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=list(RECORDERS), default=list(RECORDERS))
+    asyncio.run(main(parser.parse_args().only))
@@ -0,0 +1,219 @@
+"""Backfills the full history of every registered indicator and universe symbol into Postgres.
+
+    python -m scheduler.backfill [--start 1990-01-01] [--end 2024-12-31] [--only yieldCurve,SPY] [--restart]
+
+Each series is written in date-range chunks (BACKFILL_CHUNK_DAYS) and the
+range it covers checkpointed in Redis after every chunk, so an interrupted run
+picks up from the last chunk it finished and an earlier --start fills in only
+the days before that range. Series run in parallel, at most
+BACKFILL_CONCURRENCY at a time per upstream, on top of the shared clients'
+own rate limits.
+"""
+import argparse
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import AsyncIterator, Callable, Iterable, Optional, Tuple
+import numpy as np
+from core.alpha_vantage import alpha_vantage_client
+from core.compute import compute, transform
+from core.config import settings
+from core.database import close_connections, redis_cache
+from core.fred import fred_client
+from core.history import history_rows, upsert_history
+from core.http import ALPHA_VANTAGE, FEAR_GREED, FRED, UPSTREAM_SETTINGS, close_clients, get_client, open_clients
+from core.metrics import upstream_timer
+from core.registry import INDICATORS, Indicator
+from core.sources import FEAR_GREED_URL
+
+CHECKPOINT_KEY = "backfill:checkpoints"
+
+def date_chunks(start: date, end: date, chunk_days: int) -> list:
+    """Splits [start, end] into consecutive (first, last) day ranges of at most chunk_days."""
+    chunks = []
+    while start <= end:
+        last = min(start + timedelta(days=chunk_days - 1), end)
+        chunks.append((start, last))
+        start = last + timedelta(days=1)
+    return chunks
+
+def split_rows(rows: list, start: date, end: date, chunk_days: int) -> Iterable:
+    """Groups rows of one already-fetched series into the date chunks they fall in, dropping those outside."""
+    for first, last in date_chunks(start, end, chunk_days):
+        yield last, [row for row in rows if first <= row["observed_on"] <= last]
+
+# --- Sources: each yields (last day covered, history rows) per chunk, oldest chunk first ---
+
+async def fred_chunks(indicator: Indicator, start: date, end: date, chunk_days: int) -> AsyncIterator:
+    # FRED filters by date, so only one chunk of observations is held at a time.
+    for first, last in date_chunks(start, end, chunk_days):
+        observations = await fred_client.get_range(indicator.series, first.isoformat(), last.isoformat())
+        yield last, history_rows(indicator.name, {"history": indicator.transform(observations)})
+
+async def alpha_vantage_chunks(indicator: Indicator, start: date, end: date, chunk_days: int) -> AsyncIterator:
+    payload = await alpha_vantage_client.query(function=indicator.series, **indicator.params)
+    rows = history_rows(indicator.name, {"history": indicator.transform(payload, limit=None)})
+    for chunk in split_rows(rows, start, end, chunk_days):
+        yield chunk
+
+async def fear_greed_chunks(indicator: Indicator, start: date, end: date, chunk_days: int) -> AsyncIterator:
+    with upstream_timer(FEAR_GREED, indicator.series):
+        response = await get_client(FEAR_GREED).get(FEAR_GREED_URL, params={"limit": 0})
+        response.raise_for_status()
+    rows = history_rows(indicator.name, {"history": indicator.transform(response.json())})
+    for chunk in split_rows(rows, start, end, chunk_days):
+        yield chunk
+
+@transform("backfill:moving_averages")
+def rolling_means(closes: np.ndarray, windows: Iterable[int]) -> dict:
+    """Every day's simple moving average per window, NaN until the window fills."""
+    sums = np.concatenate([[0.0], np.cumsum(closes)])
+    averages = {}
+    for w in windows:
+        average = np.full(len(closes), np.nan)
+        average[w - 1:] = (sums[w:] - sums[:-w]) / w
+        averages[w] = average
+    return averages
+
+async def moving_average_points(bars: list, windows: Iterable[int]) -> list:
+    """Every day's simple moving averages over a whole bar history, computed off the event loop."""
+    windows = list(windows)
+    averages = await compute.run("backfill:moving_averages", np.array([close for _, close in bars], dtype=np.float64), windows)
+    return [{"name": day, **{f"{w}D": float(averages[w][i]) for w in windows}} for i, (day, _) in enumerate(bars)]
+
+async def moving_average_chunks(indicator: Indicator, start: date, end: date, chunk_days: int) -> AsyncIterator:
+    bars = await alpha_vantage_client.get_daily_closes(indicator.series, "full")
+    points = await moving_average_points(bars, indicator.params.get("windows", (50, 200)))
+    for chunk in split_rows(history_rows(indicator.name, {"history": points}), start, end, chunk_days):
+        yield chunk
+
+async def symbol_close_chunks(symbol: str, start: date, end: date, chunk_days: int) -> AsyncIterator:
+    bars = await alpha_vantage_client.get_daily_closes(symbol, "full")
+    rows = history_rows(symbol, {"history": [{"name": day, "close": close} for day, close in bars]})
+    for chunk in split_rows(rows, start, end, chunk_days):
+        yield chunk
+
+# Indicator source -> (chunk generator, upstream it uses)
+BACKFILL_SOURCES = {
+    "fred": (fred_chunks, FRED),
+    "alpha_vantage": (alpha_vantage_chunks, ALPHA_VANTAGE),
+    "fear_greed": (fear_greed_chunks, FEAR_GREED),
+    "moving_averages": (moving_average_chunks, ALPHA_VANTAGE),
+}
+
+@dataclass(frozen=True)
+class Target:
+    """One series to backfill and resume by its key."""
+    key: str
+    upstream: str
+    chunks: Callable[[date, date, int], AsyncIterator]
+
+def targets(only: Optional[set] = None) -> list:
+    """Every registered indicator plus every universe symbol's closes, optionally filtered by key.
+
+    Symbol closes are stored as "<SYMBOL>:close" and served by /api/history/symbols/<SYMBOL>.
+    """
+    found = []
+    for indicator in INDICATORS:
+        source, upstream = BACKFILL_SOURCES[indicator.source]
+        found.append(Target(indicator.key, upstream, lambda *args, indicator=indicator, source=source: source(indicator, *args)))
+    for symbol in settings.TECHNICALS_UNIVERSE:
+        found.append(Target(symbol, ALPHA_VANTAGE, lambda *args, symbol=symbol: symbol_close_chunks(symbol, *args)))
+    return [t for t in found if only is None or t.key in only]
+
+async def load_checkpoint(key: str) -> Optional[Tuple[date, date]]:
+    """The (first, last) days a series has been backfilled over, or None."""
+    done = await redis_cache.hget(CHECKPOINT_KEY, key)
+    if not done:
+        return None
+    first, _, last = done.rpartition("/")
+    # A bare last day predates ranges: how far back it goes is unknown.
+    return date.fromisoformat(first) if first else date.min, date.fromisoformat(last)
+
+async def save_checkpoint(key: str, first: date, last: date) -> None:
+    await redis_cache.hset(CHECKPOINT_KEY, key, f"{first.isoformat()}/{last.isoformat()}")
+
+async def backfill_target(target: Target, start: date, end: date, chunk_days: int) -> int:
+    """Backfills one series over [start, end] outside the range it already covers; returns the rows written.
+
+    Days after the covered range resume from the last chunk written. Days
+    before it (an earlier --start than last time) join the range once they
+    have all been written.
+    """
+    covered = await load_checkpoint(target.key)
+    if covered is None:
+        gaps = [(start, end)]
+    else:
+        first, last = covered
+        gaps = [(start, min(end, first - timedelta(days=1))), (max(start, last + timedelta(days=1)), end)]
+    gaps = [(gap_start, gap_end) for gap_start, gap_end in gaps if gap_start <= gap_end]
+    if not gaps:
+        logging.info(f"{target.key}: already backfilled from {covered[0]} to {covered[1]}.")
+        return 0
+    written = 0
+    for gap_start, gap_end in gaps:
+        extends = covered is None or gap_start > covered[1]
+        async for last, rows in target.chunks(gap_start, gap_end, chunk_days):
+            await upsert_history(rows)
+            if extends:
+                covered = (covered[0] if covered else gap_start, last)
+                await save_checkpoint(target.key, *covered)
+            written += len(rows)
+            logging.info(f"{target.key}: {len(rows)} rows up to {last}")
+        if not extends:
+            covered = (gap_start, covered[1])
+            await save_checkpoint(target.key, *covered)
+    return written
+
+async def backfill(targets: list, start: date, end: date, chunk_days: int, concurrency: dict) -> dict:
+    """Backfills every target, bounding how many run at once against each upstream.
+
+    A failed series is logged and left at its last checkpoint; the rest carry on.
+    """
+    limits = {
+        upstream: asyncio.Semaphore(concurrency.get(upstream, concurrency.get("default", 1)))
+        for upstream in {t.upstream for t in targets}
+    }
+
+    async def run(target: Target):
+        async with limits[target.upstream]:
+            return await backfill_target(target, start, end, chunk_days)
+
+    results = await asyncio.gather(*(run(t) for t in targets), return_exceptions=True)
+    written = {}
+    for target, result in zip(targets, results):
+        if isinstance(result, Exception):
+            logging.error(f"{target.key}: backfill failed, will resume from its checkpoint: {result!r}")
+        else:
+            written[target.key] = result
+    return written
+
+def required_settings(selected: list) -> list:
+    """Postgres plus the credentials of every upstream the selected series use."""
+    upstreams = {t.upstream for t in selected}
+    return ["DATABASE_URL"] + sorted({name for upstream in upstreams for name in UPSTREAM_SETTINGS.get(upstream, ())})
+
+async def main(args) -> None:
+    selected = targets(set(args.only.split(",")) if args.only else None)
+    settings.require("The backfill", *required_settings(selected))
+    if args.restart:
+        await redis_cache.hdel(CHECKPOINT_KEY, *(t.key for t in selected))
+    open_clients(FRED, ALPHA_VANTAGE, FEAR_GREED)
+    try:
+        written = await backfill(selected, args.start, args.end, args.chunk_days, settings.BACKFILL_CONCURRENCY)
+        logging.info(f"Backfilled {sum(written.values())} rows across {len(written)} of {len(selected)} series.")
+    finally:
+        compute.shutdown()
+        await close_clients()
+        await close_connections()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--start", type=date.fromisoformat, default=date.fromisoformat(settings.BACKFILL_START))
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--only", help="Comma-separated indicator keys or symbols; all of them by default")
+    parser.add_argument("--chunk-days", type=int, default=settings.BACKFILL_CHUNK_DAYS)
+    parser.add_argument("--restart", action="store_true", help="Ignore and clear the selected series' checkpoints")
+    asyncio.run(main(parser.parse_args()))
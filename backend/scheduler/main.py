@@ -1,50 +1,188 @@
 import asyncio
 import httpx
 import logging
+import random
+import time
+from typing import Optional
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from core.cache import is_due, read_refresh_meta
 from core.config import settings
+from core.database import close_connections
+from core.feature_flags import feature_flags
+from core.http import SCHEDULER, SERVICE_URL_SETTINGS, get_client, open_clients, close_clients
+from core.locks import LeaderLease
+from core.registry import refreshables
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-SERVICE_URLS = {
-    "economic": settings.ECONOMIC_SERVICE_URL,
-    "sentiment": settings.SENTIMENT_SERVICE_URL,
-    "technicals": settings.TECHNICALS_SERVICE_URL,
-    "cross_asset": settings.CROSS_ASSET_SERVICE_URL,
-}
-
-async def trigger_cache_update(service_name: str, url: str):
-    """Makes a POST request to a service's /update-cache endpoint."""
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        try:
-            logging.info(f"Triggering cache update for {service_name} service...")
-            response = await client.post(f"{url}/update-cache")
+SERVICE_URLS = {name: getattr(settings, setting) for name, setting in SERVICE_URL_SETTINGS.items()}
+
+def due_keys(meta: dict, now: float) -> dict:
+    """Groups the indicators and jobs whose refresh policy has expired by service.
+
+    Anything never refreshed (no metadata yet) is due immediately; anything
+    backing off after failed refreshes is not due until its retry time, and
+    anything switched off by its feature flag never is.
+    """
+    due = {}
+    for service in SERVICE_URLS:
+        keys = [
+            item.key for item in refreshables(service)
+            if is_due(meta.get(item.key), now) and feature_flags.indicator_enabled(item.key)
+        ]
+        if keys:
+            due[service] = keys
+    return due
+
+class Pacer:
+    """Keeps one refresh job in flight per service and learns how long each service's jobs take.
+
+    A service whose last job has not finished is not triggered again, and a
+    job is polled at a rate that follows the service's measured duration.
+    """
+
+    def __init__(self, smoothing: float = 0.3):
+        self.smoothing = smoothing
+        self.durations: dict[str, float] = {}
+        self.in_flight: dict[str, asyncio.Task] = {}
+
+    def observe(self, service: str, seconds: float) -> None:
+        previous = self.durations.get(service)
+        self.durations[service] = seconds if previous is None else previous + self.smoothing * (seconds - previous)
+
+    def poll_interval(self, service: str) -> float:
+        return min(max(self.durations.get(service, 2.0) / 4, 0.25), 10.0)
+
+    def start(self, service: str, run) -> bool:
+        """Runs the coroutine as the service's job in flight, unless one already is."""
+        if service in self.in_flight:
+            run.close()
+            return False
+        task = self.in_flight[service] = asyncio.create_task(run)
+        task.add_done_callback(lambda _: self.in_flight.pop(service, None))
+        return True
+
+def service_headers() -> dict:
+    """In monolith mode the services sit behind the gateway's API key; separate services ignore it."""
+    return {"X-API-KEY": settings.API_KEY} if settings.API_KEY else {}
+
+async def trigger_cache_update(
+    service_name: str, url: str, keys: Optional[list] = None, delay: float = 0.0, pacer: Optional["Pacer"] = None,
+) -> Optional[dict]:
+    """Starts a refresh job on a service's /update-cache and follows it to completion.
+
+    Returns the finished job record, or None if the trigger failed or the job
+    did not finish within SCHEDULER_JOB_TIMEOUT_SECONDS.
+    """
+    pacer = pacer or Pacer()
+    if delay:
+        await asyncio.sleep(delay)
+    client = get_client(SCHEDULER)
+    params = {"indicators": ",".join(keys)} if keys else None
+    try:
+        logging.info(f"Triggering cache update for {service_name} service: {keys or 'all'}")
+        response = await client.post(f"{url}/update-cache", params=params, headers=service_headers())
+        response.raise_for_status()
+        job = response.json()["job"]
+        deadline = time.monotonic() + settings.SCHEDULER_JOB_TIMEOUT_SECONDS
+        while job["status"] in ("queued", "running"):
+            if time.monotonic() >= deadline:
+                logging.error(f"Refresh job {job['id']} for {service_name} is still {job['status']}; giving up on it.")
+                return None
+            await asyncio.sleep(pacer.poll_interval(service_name))
+            response = await client.get(f"{url}/jobs/{job['id']}", headers=service_headers())
+            if response.status_code == 429:
+                # Rate limited by the gateway (monolith mode): poll again once allowed.
+                await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+                continue
             response.raise_for_status()
-            logging.info(f"Successfully updated cache for {service_name}: {response.json()}")
-        except httpx.RequestError as e:
-            logging.error(f"Failed to trigger cache update for {service_name}: {e}")
+            job = response.json()
+    except httpx.HTTPError as e:
+        logging.error(f"Failed to trigger cache update for {service_name}: {e}")
+        return None
+    seconds = job.get("durationMs", 0) / 1000
+    pacer.observe(service_name, seconds)
+    log = logging.warning if job["status"] == "failed" or job.get("counts", {}).get("failed") else logging.info
+    log(f"Refresh job {job['id']} for {service_name} {job['status']} in {seconds:.1f}s: {job.get('counts')}")
+    return job
+
+pacer = Pacer()
+
+async def update_due_caches(pacer: Pacer = pacer):
+    """Starts refresh jobs for the due indicators of each service that is not still refreshing.
+
+    Each service's trigger is delayed by a random jitter so that indicators
+    that fell due together do not all hit their upstreams at once. Jobs are
+    followed in the background, so one slow service never holds up a tick.
+    """
+    try:
+        await feature_flags.refresh()
+    except Exception as e:
+        logging.error(f"Could not refresh feature flags, using the last ones: {e!r}")
+    due = due_keys(await read_refresh_meta(), time.time())
+    if not due:
+        logging.info("No indicators due for refresh.")
+        return
+    for name, keys in due.items():
+        delay = random.uniform(0, settings.SCHEDULER_JITTER_SECONDS)
+        if not pacer.start(name, trigger_cache_update(name, SERVICE_URLS[name], keys, delay=delay, pacer=pacer)):
+            logging.info(f"{name} is still refreshing (typically {pacer.durations.get(name, 0):.1f}s); not triggering it again.")
+
+async def wait_until_ready(urls: dict, timeout: float) -> set:
+    """Polls each service's /ready, backing off, until all of them answer or timeout passes.
+
+    Returns the services that became ready; the rest are left to later ticks.
+    """
+    client = get_client(SCHEDULER)
+    deadline = time.monotonic() + timeout
+    ready, delay = set(), 0.1
+    while True:
+        waiting = [name for name in urls if name not in ready]
+        responses = await asyncio.gather(
+            *(client.get(f"{urls[name]}/ready", timeout=1.0, headers=service_headers()) for name in waiting),
+            return_exceptions=True,
+        )
+        ready.update(name for name, r in zip(waiting, responses) if isinstance(r, httpx.Response) and r.status_code == 200)
+        if len(ready) == len(urls) or time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 2.0)
+    if len(ready) < len(urls):
+        logging.warning(f"Services not ready after {timeout:.0f}s: {sorted(set(urls) - ready)}; starting without them.")
+    return ready
 
-async def update_all_caches():
-    """Triggers cache updates for all services concurrently."""
-    tasks = [trigger_cache_update(name, url) for name, url in SERVICE_URLS.items()]
-    await asyncio.gather(*tasks)
+async def update_if_leader(lease: LeaderLease):
+    """Runs a scheduler tick only in the container currently holding the lease."""
+    if lease.is_leader:
+        await update_due_caches()
 
 if __name__ == "__main__":
+    settings.require("The scheduler", *SERVICE_URL_SETTINGS.values())
+    # Every scheduler container ticks, but only the lease holder triggers updates.
+    lease = LeaderLease("scheduler", settings.SCHEDULER_LEASE_SECONDS)
     scheduler = AsyncIOScheduler()
-    scheduler.add_job(update_all_caches, 'interval', hours=settings.SCHEDULER_INTERVAL_HOURS, misfire_grace_time=3600)
+    scheduler.add_job(update_if_leader, 'interval', args=[lease], minutes=settings.SCHEDULER_TICK_MINUTES, misfire_grace_time=3600)
     
     async def startup():
-        await asyncio.sleep(15) # Give services time to start up before initial trigger
+        open_clients(SCHEDULER)
+        await wait_until_ready(SERVICE_URLS, settings.SCHEDULER_READY_TIMEOUT_SECONDS)
+        await lease.decided.wait()
         logging.info("Running initial cache update on startup...")
-        await update_all_caches()
+        await update_if_leader(lease)
         
         scheduler.start()
-        logging.info(f"Scheduler started. Will run every {settings.SCHEDULER_INTERVAL_HOURS} hours.")
+        logging.info(f"Scheduler started. Will check for due indicators every {settings.SCHEDULER_TICK_MINUTES} minutes.")
 
     loop = asyncio.get_event_loop()
+    lease_task = loop.create_task(lease.maintain())
     loop.create_task(startup())
     try:
         loop.run_forever()
     except (KeyboardInterrupt, SystemExit):
         pass
+    finally:
+        lease_task.cancel()  # releases the lease so a standby takes over at once
+        loop.run_until_complete(asyncio.gather(lease_task, return_exceptions=True))
+        loop.run_until_complete(close_clients())
+        loop.run_until_complete(close_connections())
 
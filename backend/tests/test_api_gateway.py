@@ -1,7 +1,22 @@
+import argparse
+import asyncio
+import httpx
+import time
+import json
+from datetime import date, datetime
 import pytest
 from unittest.mock import patch, AsyncMock
+from fastapi import Depends
 from fastapi.testclient import TestClient
-from api_gateway.main import app, get_api_key
+from api_gateway.main import app, forward_request, get_api_key, snapshot
+from core.codec import encode_indicator
+from core.config import settings
+from core.registry import SERVICES as SERVICE_REGISTRY, get_indicator
+from core.service import create_service_app
+from api_gateway.fanout import LatencyTracker, hedged
+from api_gateway.keys import ApiKey, ApiKeys, add_key, digest, positive_int
+from api_gateway.snapshot import SnapshotCache
+from api_gateway.stream import Broadcaster, event_stream
 
 # Use the TestClient for synchronous testing of the API endpoints
 client = TestClient(app)
@@ -13,22 +28,37 @@ async def override_get_api_key():
 
 app.dependency_overrides[get_api_key] = override_get_api_key
 
+@pytest.fixture(autouse=True)
+def fresh_snapshot():
+    # Each test starts from an empty /api/all snapshot
+    snapshot.invalidate()
+    yield
+    snapshot.invalidate()
+
 # --- Tests ---
 def test_get_all_data_unauthorized():
-    # Test without providing the API key header
-    response = client.get("/api/all")
+    # Test without providing the API key header, using the real dependency
+    del app.dependency_overrides[get_api_key]
+    try:
+        response = client.get("/api/all")
+    finally:
+        app.dependency_overrides[get_api_key] = override_get_api_key
     assert response.status_code == 403
     assert response.json() == {"detail": "Not authenticated"}
 
 @patch('api_gateway.main.forward_request', new_callable=AsyncMock)
-def test_get_all_data_authorized(mock_forward_request):
-    # Arrange: Mock the return value of the forwarded requests
-    mock_forward_request.side_effect = [
-        {"economic_data": "ok"},
-        {"sentiment_data": "ok"},
-        {"technicals_data": "ok"},
-        {"cross_asset_data": "ok"},
-    ]
+@patch('core.service.read_cached', new_callable=AsyncMock)
+def test_get_all_data_authorized(mock_read_cached, mock_forward_request):
+    """Tests that /api/all reads every indicator from Redis in one round trip, without calling the services."""
+    # Arrange: only the VIX and the yield curve are cached
+    fresh = json.dumps({"fetchedAt": 1, "expiresAt": 2**40})
+    cached = {
+        "Yield Curve (10Y vs 2Y)": encode_indicator({"name": "Yield Curve (10Y vs 2Y)", "value": "0.50"}),
+        "VIX (Fear Gauge)": encode_indicator({"name": "VIX (Fear Gauge)", "value": "12.50"}),
+    }
+    mock_read_cached.side_effect = lambda names: (
+        [cached.get(name) for name in names], [fresh if name in cached else None for name in names],
+    )
     
     # Act: Call the endpoint with a valid (but fake) API key
     response = client.get("/api/all", headers={"X-API-KEY": "test_key"})
@@ -36,18 +66,330 @@ def test_get_all_data_authorized(mock_forward_request):
     # Assert
     assert response.status_code == 200
     data = response.json()
-    assert data["economic"] == {"economic_data": "ok"}
-    assert data["sentiment"] == {"sentiment_data": "ok"}
-    assert mock_forward_request.call_count == 4
-
-@patch('api_gateway.main.httpx.AsyncClient')
-def test_forward_request_service_unavailable(mock_client):
-    # Arrange: Mock the httpx client to raise a connection error
-    mock_client.return_value.__aenter__.return_value.get.side_effect = httpx.ConnectError("Connection refused")
-    
+    assert data["economic"] == {"yieldCurve": {"name": "Yield Curve (10Y vs 2Y)", "value": "0.50", "updatedAt": 1, "expiresAt": 2**40, "stale": False}}
+    assert data["sentiment"]["vix"]["value"] == "12.50"
+    assert data["technicals"] == data["cross_asset"] == {}
+    assert data["partial"] is False
+    mock_read_cached.assert_awaited_once()
+    mock_forward_request.assert_not_called()
+
+@patch('core.service.revalidate_stale')
+@patch('core.service.read_cached', new_callable=AsyncMock)
+def test_get_all_data_leaves_stale_indicators_to_the_services(mock_read_cached, mock_revalidate):
+    """Tests that the gateway serves expired indicators as stale without refreshing them itself."""
+    expired = json.dumps({"fetchedAt": 1, "expiresAt": 2})
+    vix = encode_indicator({"name": "VIX (Fear Gauge)", "value": "12.50"})
+    mock_read_cached.side_effect = lambda names: (
+        [vix if name == "VIX (Fear Gauge)" else None for name in names], [expired for _ in names],
+    )
+
+    response = client.get("/api/all", headers={"X-API-KEY": "test_key"})
+
+    assert response.json()["sentiment"]["vix"]["stale"] is True
+    mock_revalidate.assert_not_called()
+
+@patch('api_gateway.main.read_sections', new_callable=AsyncMock)
+def test_redis_failure_marks_every_section_unavailable(mock_read_sections):
+    """Tests that /api/all still answers, flagged partial, when the cache cannot be read."""
+    mock_read_sections.side_effect = ConnectionError("Redis is down")
+
+    data = client.get("/api/all", headers={"X-API-KEY": "test_key"}).json()
+
+    assert data["partial"] is True
+    assert data["economic"] == {}
+    assert {s["status"] for s in data["sections"].values()} == {"unavailable"}
+
+@patch('api_gateway.main.read_indicators', new_callable=AsyncMock)
+@patch('api_gateway.main.get_client')
+def test_unavailable_service_is_served_from_cache_fallback(mock_client, mock_read, monkeypatch):
+    """Tests that a down service degrades its own section instead of failing /api/all."""
+    monkeypatch.setattr(settings, "GATEWAY_READ_PATH", "services")
+    # Arrange: every service refuses connections; only economic has cached data
+    mock_client.return_value.get = AsyncMock(side_effect=httpx.ConnectError("Connection refused"))
+    mock_read.side_effect = lambda service, shape, revalidate: {"yieldCurve": {"value": "0.50", "stale": False}} if service == "economic" else {}
+
     # Act
     response = client.get("/api/all", headers={"X-API-KEY": "test_key"})
-    
+
+    # Assert
+    assert response.status_code == 200
+    data = response.json()
+    assert data["partial"] is True
+    assert data["economic"] == {"yieldCurve": {"value": "0.50", "stale": False}}
+    assert data["sections"]["economic"]["status"] == "fallback"
+    assert "Error communicating with economic service" in data["sections"]["economic"]["error"]
+    assert all(call.kwargs["revalidate"] is False for call in mock_read.call_args_list)
+
+@patch('api_gateway.main.read_indicators', new_callable=AsyncMock)
+@patch('api_gateway.main.forward_request', new_callable=AsyncMock)
+def test_slow_service_is_cut_off_at_its_budget(mock_forward_request, mock_read, monkeypatch):
+    """Tests that /api/all latency is bounded by the deadline, not the slowest service."""
+    # Arrange: sentiment hangs for far longer than the deadline
+    monkeypatch.setattr(settings, "GATEWAY_READ_PATH", "services")
+    monkeypatch.setattr(settings, "GATEWAY_DEADLINE_SECONDS", 0.3)
+    monkeypatch.setattr(settings, "GATEWAY_FALLBACK_SECONDS", 0.1)
+
+    async def forward(service, endpoint, params):
+        if service == "sentiment":
+            await asyncio.sleep(10)
+        return {"ok": {"stale": False}}
+    mock_forward_request.side_effect = forward
+    mock_read.return_value = {"vix": {"value": "12.50", "stale": True}}
+
+    # Act
+    started = time.monotonic()
+    data = client.get("/api/all", headers={"X-API-KEY": "test_key"}).json()
+
+    # Assert
+    assert time.monotonic() - started < 1
+    assert data["sections"]["sentiment"]["status"] == "fallback"
+    assert data["sections"]["sentiment"]["stale"] is True
+    assert data["sections"]["economic"] == {"status": "ok", "stale": False, "elapsedMs": data["sections"]["economic"]["elapsedMs"]}
+
+@pytest.mark.asyncio
+async def test_hedged_request_wins_when_first_attempt_is_slow():
+    """Tests that a call past the hedging delay gets a second attempt, and the faster one wins."""
+    delays = iter([10, 0.01])
+    calls = []
+
+    async def call():
+        delay = next(delays)
+        calls.append(delay)
+        await asyncio.sleep(delay)
+        return delay
+
+    tracker = LatencyTracker(min_samples=3)
+    for seconds in (0.01, 0.02, 0.03):
+        tracker.observe("economic", seconds)
+
+    result = await asyncio.wait_for(hedged(call, tracker.percentile("economic", 95)), timeout=1)
+
+    assert result == 0.01
+    assert calls == [10, 0.01]
+
+@patch('api_gateway.main.read_sections', new_callable=AsyncMock)
+def test_get_all_data_served_from_snapshot(mock_read_sections):
+    # Arrange
+    mock_read_sections.return_value = {name: {"ok": True} for name in SERVICE_REGISTRY}
+
+    # Act: two polls without any indicator update in between
+    first = client.get("/api/all", headers={"X-API-KEY": "test_key"})
+    second = client.get("/api/all", headers={"X-API-KEY": "test_key"})
+
+    # Assert: only the first poll reads the cache
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content
+    assert first.headers["etag"] == second.headers["etag"]
+    assert mock_read_sections.await_count == 1
+
+@patch('api_gateway.main.read_sections', new_callable=AsyncMock)
+def test_get_all_data_not_modified(mock_read_sections):
+    # Arrange
+    mock_read_sections.return_value = {name: {"ok": True} for name in SERVICE_REGISTRY}
+    etag = client.get("/api/all", headers={"X-API-KEY": "test_key"}).headers["etag"]
+
+    # Act
+    response = client.get("/api/all", headers={"X-API-KEY": "test_key", "If-None-Match": etag})
+
     # Assert
-    assert response.status_code == 503
-    assert "Error communicating with economic service" in response.json()["detail"]
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+@patch('api_gateway.main.read_sections', new_callable=AsyncMock)
+def test_get_all_data_rebuilt_after_update(mock_read_sections):
+    # Arrange
+    mock_read_sections.return_value = {name: {"value": 1} for name in SERVICE_REGISTRY}
+    etag = client.get("/api/all", headers={"X-API-KEY": "test_key"}).headers["etag"]
+
+    # Act: a service publishes a new indicator value
+    mock_read_sections.return_value = {name: {"value": 2} for name in SERVICE_REGISTRY}
+    snapshot.invalidate()
+    response = client.get("/api/all", headers={"X-API-KEY": "test_key", "If-None-Match": etag})
+
+    # Assert
+    assert response.status_code == 200
+    assert response.json()["economic"] == {"value": 2}
+    assert response.headers["etag"] != etag
+
+@patch('api_gateway.main.read_sections', new_callable=AsyncMock)
+def test_get_all_data_rebuilt_once_an_indicator_expires(mock_read_sections):
+    """Tests that a snapshot is not served past its first indicator's expiry just because nothing was written."""
+    # Arrange: the VIX falls due in a moment, the yield curve much later
+    expires = time.time() + 0.2
+    sections = {name: {} for name in SERVICE_REGISTRY}
+    sections["sentiment"] = {"vix": {"value": "12.50", "expiresAt": expires, "stale": False}}
+    sections["economic"] = {"yieldCurve": {"value": "0.50", "expiresAt": expires + 3600, "stale": False}}
+    mock_read_sections.return_value = sections
+    snapshot.invalidate()
+    etag = client.get("/api/all", headers={"X-API-KEY": "test_key"}).headers["etag"]
+    assert client.get("/api/all", headers={"X-API-KEY": "test_key", "If-None-Match": etag}).status_code == 304
+
+    # Act: the VIX expires with no write in between
+    mock_read_sections.return_value = {**sections, "sentiment": {"vix": {**sections["sentiment"]["vix"], "stale": True}}}
+    time.sleep(0.25)
+    response = client.get("/api/all", headers={"X-API-KEY": "test_key", "If-None-Match": etag})
+
+    # Assert
+    assert response.status_code == 200
+    assert response.json()["sections"]["sentiment"]["stale"] is True
+    assert mock_read_sections.await_count == 2
+
+@patch('api_gateway.main.read_regime', new_callable=AsyncMock)
+def test_get_regime(mock_read_regime):
+    mock_read_regime.return_value = None
+    assert client.get("/api/regime", headers={"X-API-KEY": "test_key"}).status_code == 503
+
+    mock_read_regime.return_value = {"name": "Market Regime", "score": 0.8, "status": "bullish"}
+    response = client.get("/api/regime", headers={"X-API-KEY": "test_key"})
+    assert response.json()["status"] == "bullish"
+
+@pytest.mark.asyncio
+async def test_stream_sends_snapshot_then_updates():
+    # Arrange
+    snapshot = SnapshotCache(AsyncMock(return_value={"sentiment": {}}), max_age_seconds=60)
+    broadcaster = Broadcaster(queue_size=2)
+    stream = event_stream(broadcaster, snapshot, keepalive_seconds=0.05)
+
+    # Act / Assert: the first event is the full snapshot
+    assert await stream.__anext__() == b'event: snapshot\ndata: {"sentiment":{}}\n\n'
+    assert broadcaster.client_count == 1
+
+    # An idle connection gets keepalive comments
+    assert await stream.__anext__() == b": keepalive\n\n"
+
+    # A published write is forwarded as-is
+    broadcaster.publish('{"key":"vix","service":"sentiment","data":{}}')
+    assert await stream.__anext__() == b'event: indicator\ndata: {"key":"vix","service":"sentiment","data":{}}\n\n'
+
+    await stream.aclose()
+    assert broadcaster.client_count == 0
+
+@pytest.mark.asyncio
+async def test_stream_resyncs_slow_clients():
+    # Arrange
+    build = AsyncMock(return_value={"v": 1})
+    snapshot = SnapshotCache(build, max_age_seconds=60)
+    broadcaster = Broadcaster(queue_size=2)
+    stream = event_stream(broadcaster, snapshot, keepalive_seconds=1)
+    await stream.__anext__()
+
+    # Act: more updates arrive than the client's backlog can hold
+    build.return_value = {"v": 2}
+    snapshot.invalidate()
+    for i in range(3):
+        broadcaster.publish(f'{{"key":"x","service":"sentiment","data":{i}}}')
+
+    # Assert: the backlog is replaced by one fresh snapshot
+    assert await stream.__anext__() == b'event: snapshot\ndata: {"v":2}\n\n'
+    await stream.aclose()
+
+def test_stream_requires_api_key():
+    response = client.get("/api/stream?api_key=wrong")
+    assert response.status_code == 403
+
+@patch('api_gateway.main.take_token', new_callable=AsyncMock, return_value=(False, 1.2))
+def test_rate_limited_key_gets_429_with_retry_after(mock_take_token):
+    del app.dependency_overrides[get_api_key]
+    try:
+        response = client.get("/api/regime", headers={"X-API-KEY": settings.API_KEY})
+    finally:
+        app.dependency_overrides[get_api_key] = override_get_api_key
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+    assert mock_take_token.call_args.args[0].name == "default"
+
+@pytest.mark.asyncio
+@patch('api_gateway.keys.redis_cache')
+async def test_api_keys_are_looked_up_by_digest_from_memory(mock_redis):
+    """Tests that stored keys are matched by digest and revoked keys stop working after a refresh."""
+    keys = ApiKeys(refresh_seconds=1)
+    mock_redis.hgetall = AsyncMock(return_value={digest("tab-key"): ApiKey("tab", 60, 10).to_json()})
+    await keys.refresh()
+    assert keys.lookup("tab-key") == ApiKey("tab", 60, 10)
+    assert keys.lookup("other-key") is None
+    assert keys.lookup(settings.API_KEY).name == "default"
+
+    mock_redis.hgetall = AsyncMock(return_value={})
+    await keys.refresh()
+    assert keys.lookup("tab-key") is None
+
+@pytest.mark.asyncio
+@patch('api_gateway.keys.redis_cache')
+async def test_add_key_rejects_a_bucket_that_never_refills(mock_redis):
+    """Tests that a zero or negative rate is refused before it reaches Redis, where it would break every request."""
+    mock_redis.hset = AsyncMock()
+    for per_minute, burst in [(0, 10), (60, 0), (-1, 10)]:
+        with pytest.raises(ValueError):
+            await add_key("tab", per_minute, burst)
+    mock_redis.hset.assert_not_awaited()
+    with pytest.raises(argparse.ArgumentTypeError):
+        positive_int("0")
+    assert positive_int("600") == 600
+
+@patch('api_gateway.main.query_history', new_callable=AsyncMock)
+def test_get_indicator_history_resampled(mock_query):
+    # Arrange
+    mock_query.return_value = [(datetime(2025, 7, 1), 12.5), (datetime(2025, 8, 1), 14.0)]
+
+    # Act
+    response = client.get("/api/history/vix?start=2025-07-01&resample=month", headers={"X-API-KEY": "test_key"})
+    moving_averages = client.get("/api/history/movingAverages?field=50D", headers={"X-API-KEY": "test_key"})
+
+    # Assert: registry keys map to the stored series names
+    assert response.status_code == 200
+    assert response.json()["history"] == [{"name": "2025-07-01", "value": 12.5}, {"name": "2025-08-01", "value": 14.0}]
+    mock_query.assert_any_await("VIX (Fear Gauge)", date(2025, 7, 1), None, "month")
+    assert moving_averages.status_code == 200
+    assert mock_query.await_args.args[0] == f"{get_indicator('movingAverages').name}:50D"
+
+@patch('api_gateway.main.query_history', new_callable=AsyncMock)
+def test_get_indicator_history_unknown_or_disabled(mock_query, monkeypatch):
+    assert client.get("/api/history/VIX (Fear Gauge)", headers={"X-API-KEY": "test_key"}).status_code == 404
+
+    monkeypatch.setattr(settings, "HISTORY_ENABLED", False)
+    assert client.get("/api/history/vix", headers={"X-API-KEY": "test_key"}).status_code == 503
+    mock_query.assert_not_awaited()
+
+@patch('api_gateway.main.query_history', new_callable=AsyncMock)
+def test_get_symbol_history_reads_backfilled_closes(mock_query):
+    mock_query.return_value = [(datetime(2025, 7, 1), 620.5)]
+
+    response = client.get("/api/history/symbols/SPY?resample=week", headers={"X-API-KEY": "test_key"})
+
+    assert response.status_code == 200
+    assert response.json() == {"symbol": "SPY", "resample": "week", "history": [{"name": "2025-07-01", "value": 620.5}]}
+    mock_query.assert_awaited_once_with("SPY:close", None, None, "week")
+    assert client.get("/api/history/symbols/NOPE", headers={"X-API-KEY": "test_key"}).status_code == 404
+
+def test_get_indicator_history_rejects_unknown_resample():
+    response = client.get("/api/history/vix?resample=hour", headers={"X-API-KEY": "test_key"})
+    assert response.status_code == 422
+
+@pytest.mark.asyncio
+@patch('core.service.read_cached', new_callable=AsyncMock)
+async def test_forward_request_in_process_in_monolith_mode(mock_read_cached, monkeypatch):
+    # Arrange
+    monkeypatch.setattr(settings, "RUN_MODE", "monolith")
+    mock_read_cached.return_value = (
+        [encode_indicator({"name": "VIX (Fear Gauge)", "value": "12.50"}), None],
+        [json.dumps({"fetchedAt": 1, "expiresAt": 2**40}), None],
+    )
+
+    # Act
+    result = await forward_request("sentiment", "indicators")
+
+    # Assert: served from the registry-generated handler, no HTTP hop
+    assert result == {"vix": {"name": "VIX (Fear Gauge)", "value": "12.50", "updatedAt": 1, "expiresAt": 2**40, "stale": False}}
+
+@patch('api_gateway.main.take_token', new_callable=AsyncMock, return_value=(True, 0.0))
+def test_monolith_service_routes_require_an_api_key(mock_take_token):
+    """Tests that services mounted on the gateway's port cannot be triggered without a key."""
+    services = create_service_app("economic", dependencies=[Depends(get_api_key)])
+    service_client = TestClient(services)
+    with patch('core.service.RefreshJobs.submit', new_callable=AsyncMock, return_value={"id": "abc"}) as mock_submit:
+        assert service_client.post("/update-cache").status_code == 403
+        mock_submit.assert_not_called()
+        response = service_client.post("/update-cache", headers={"X-API-KEY": settings.API_KEY})
+    assert response.status_code == 200
+    assert mock_take_token.await_count == 1
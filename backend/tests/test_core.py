@@ -0,0 +1,509 @@
+import asyncio
+import json
+import time
+from datetime import date
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from core import alerts, http
+from core.cache import META_KEY, write_indicator
+from core.alerts import IndicatorRules, MemorySink, Rule
+from core.codec import decode_indicator, encode_indicator
+from core.compute import ComputeExecutor
+from core.config import Settings
+from core.feature_flags import FeatureFlags, FileFlagSource, flag_enabled
+from core.fred import FredClient
+from core import history as history_module
+from core.history import history_rows, query_history, record_history, record_history_later
+from core.locks import LeaderLease, single_flight
+from core.ratelimit import TokenBucket
+from core.regime import RegimeState, RunningStats, update_regime
+from core.registry import INDICATORS, get_indicator
+from core.rolling import MovingAverageState, from_day
+from core.technicals import PriceMatrix, compute_indicators
+
+@pytest.mark.asyncio
+async def test_shared_client_is_reused_per_upstream():
+    """Tests that each upstream gets one pooled client with its own timeout."""
+    try:
+        fred = http.get_client(http.FRED)
+        assert http.get_client(http.FRED) is fred
+        assert http.get_client(http.SCHEDULER) is not fred
+        assert http.get_client(http.SCHEDULER).timeout.read == 60.0
+    finally:
+        await http.close_clients()
+
+    # Act: a closed pool is replaced on next use
+    assert fred.is_closed
+    assert http.get_client(http.FRED) is not fred
+    await http.close_clients()
+
+@pytest.mark.asyncio
+@patch('core.http.redis_cache', new_callable=AsyncMock)
+@patch('core.http.get_client')
+async def test_conditional_get_revalidates_with_stored_etag(mock_get_client, mock_redis):
+    """Tests that a repeat request sends the stored ETag and maps a 304 to NOT_MODIFIED."""
+    # Arrange
+    mock_redis.get.return_value = json.dumps({"etag": '"v1"'})
+    mock_get_client.return_value.get = AsyncMock(return_value=MagicMock(status_code=304))
+
+    # Act
+    result = await http.conditional_get(http.FEAR_GREED, "https://example.test/fng/", {"limit": 30})
+
+    # Assert
+    assert result is http.NOT_MODIFIED
+    assert mock_get_client.return_value.get.call_args.kwargs["headers"] == {"If-None-Match": '"v1"'}
+    mock_redis.set.assert_not_awaited()
+
+def fred_response(observations):
+    response = MagicMock()
+    response.json.return_value = {"observations": observations}
+    return response
+
+@pytest.mark.asyncio
+@patch('core.fred.redis_cache', new_callable=AsyncMock)
+@patch('core.fred.get_client')
+async def test_fred_client_coalesces_concurrent_requests(mock_client, mock_redis):
+    """Tests that concurrent requests for one series share a single upstream call."""
+    # Arrange
+    mock_redis.get.return_value = None
+    mock_client.return_value.get = AsyncMock(return_value=fred_response(
+        [{"date": "2025-07-02", "value": "1.5"}, {"date": "2025-07-01", "value": "."}]
+    ))
+    client = FredClient(rate_per_minute=120, max_concurrency=2, cache_ttl_seconds=300)
+
+    # Act
+    results = await asyncio.gather(*(client.get_observations("T10Y2Y", limit=2) for _ in range(5)))
+
+    # Assert
+    assert mock_client.return_value.get.call_count == 1
+    assert all(r == [{"date": "2025-07-02", "value": 1.5}] for r in results)
+
+@pytest.mark.asyncio
+@patch('core.fred.redis_cache', new_callable=AsyncMock)
+@patch('core.fred.get_client')
+async def test_fred_client_fetches_incrementally(mock_client, mock_redis):
+    """Tests that an expired cached series is topped up from its last cached date."""
+    # Arrange
+    mock_redis.get.return_value = json.dumps({
+        "fetched_at": 0, "observations": [["2025-07-01", 1.0], ["2025-07-02", 2.0]],
+    })
+    mock_client.return_value.get = AsyncMock(return_value=fred_response(
+        [{"date": "2025-07-03", "value": "3.0"}, {"date": "2025-07-02", "value": "2.5"}]
+    ))
+    client = FredClient(rate_per_minute=120, max_concurrency=2, cache_ttl_seconds=300)
+
+    # Act
+    result = await client.get_observations("ICSA", limit=2)
+
+    # Assert
+    params = mock_client.return_value.get.call_args.kwargs["params"]
+    assert params["observation_start"] == "2025-07-02"
+    assert result == [{"date": "2025-07-03", "value": 3.0}, {"date": "2025-07-02", "value": 2.5}]
+
+@pytest.mark.asyncio
+@patch('core.fred.redis_cache', new_callable=AsyncMock)
+@patch('core.fred.get_client')
+async def test_fred_client_serves_recent_series_from_cache(mock_client, mock_redis):
+    """Tests that a series fetched within the TTL costs no upstream call."""
+    # Arrange
+    mock_redis.get.return_value = json.dumps({
+        "fetched_at": time.time(), "observations": [["2025-07-01", 1.0], ["2025-07-02", 2.0]],
+    })
+    mock_client.return_value.get = AsyncMock()
+    client = FredClient(rate_per_minute=120, max_concurrency=2, cache_ttl_seconds=300)
+
+    # Act
+    result = await client.get_many(["ICSA", "ICSA"], limit=1)
+
+    # Assert
+    mock_client.return_value.get.assert_not_called()
+    assert result == {"ICSA": [{"date": "2025-07-02", "value": 2.0}]}
+
+@pytest.mark.asyncio
+async def test_token_bucket_paces_acquisitions():
+    """Tests that the token bucket blocks once its burst capacity is used."""
+    bucket = TokenBucket(rate_per_second=50, capacity=2)
+    start = time.monotonic()
+    for _ in range(4):
+        await bucket.acquire()
+    assert time.monotonic() - start >= 0.03
+
+def test_moving_average_state_matches_full_recompute():
+    """Tests that incremental updates and a Redis round trip match a full recompute."""
+    # Arrange
+    rng = np.random.default_rng(0)
+    closes = 100 + rng.standard_normal(400).cumsum()
+    days = [from_day(19000 + i) for i in range(400)]
+    state = MovingAverageState((5, 20), history_length=10)
+
+    # Act: apply the bars in three batches, persisting in between
+    state.update(zip(days[:150], closes[:150]))
+    state = MovingAverageState.from_redis({k.encode(): v.encode() if isinstance(v, str) else v for k, v in state.to_redis().items()})
+    assert state.update(zip(days[:300], closes[:300])) == 150
+    state.update(zip(days[300:], closes[300:]))
+
+    # Assert
+    history = state.history()
+    assert [day for day, _ in history] == days[-10:]
+    for offset, (_, averages) in enumerate(history):
+        end = 390 + offset + 1
+        assert averages[5] == pytest.approx(closes[end - 5:end].mean())
+        assert averages[20] == pytest.approx(closes[end - 20:end].mean())
+
+@pytest.mark.asyncio
+async def test_feature_flags_reload_from_watched_file(tmp_path):
+    """Tests that a flag file edit is picked up on the next refresh and reported once."""
+    path = tmp_path / "feature_flags.json"
+    flags = FeatureFlags(FileFlagSource(path), refresh_seconds=0.01)
+    changes = []
+    flags.on_change(lambda: changes.append(flags.indicator_enabled("vix")))
+
+    await flags.refresh()
+    assert flags.indicator_enabled("vix") and changes == []  # no file: everything on
+
+    path.write_text(json.dumps({"indicators": {"vix": False}, "beta": {"regime": True}}))
+    await flags.refresh()
+    await flags.refresh()
+    assert not flags.indicator_enabled("vix")
+    assert flags.is_enabled("beta.regime", default=False)
+    assert changes == [False]
+
+@pytest.mark.asyncio
+async def test_flag_enabled_gates_endpoints_on_indicator_flags():
+    """Tests that the endpoint decorator reads indicators.<name> and is off until turned on."""
+    @flag_enabled("movingAverages")
+    async def endpoint():
+        return "ok"
+
+    flags = FeatureFlags(None, refresh_seconds=1)
+    with patch("core.feature_flags.feature_flags", flags):
+        with pytest.raises(HTTPException) as excinfo:
+            await endpoint()
+        assert excinfo.value.status_code == 404
+        assert excinfo.value.detail == "Indicator 'movingAverages' is not enabled."
+
+        flags._snapshot = {"indicators.movingAverages": True}
+        assert await endpoint() == "ok"
+
+def test_running_stats_match_full_history():
+    """Tests that Welford updates in batches, skipping already-seen days, match NumPy over the whole series."""
+    values = np.random.default_rng(2).standard_normal(200) * 3 + 10
+    stats = RunningStats()
+    stats.update(enumerate(values[:120]))
+    assert stats.update(enumerate(values)) == 80
+
+    assert stats.mean == pytest.approx(values.mean())
+    assert stats.std == pytest.approx(values.std(ddof=1))
+    assert stats.zscore() == pytest.approx((values[-1] - values.mean()) / values.std(ddof=1))
+
+@pytest.mark.parametrize("history_days", [30, 10])  # 10: the window spans the whole history
+def test_regime_state_matches_full_recompute(history_days):
+    """Tests that the incremental composite and rolling correlations survive a Redis round trip and match a recompute."""
+    # Arrange: two indicators moving together and a noisy one against them, one point a day
+    rng = np.random.default_rng(3)
+    base = rng.standard_normal(40).cumsum()
+    series = {"a": base, "b": base * 2 + 1, "c": -base + rng.standard_normal(40) * 2}
+    weights = {"a": 1.0, "b": 1.0, "c": -2.0}
+    state = RegimeState(["a", "b", "c"], history_days=history_days, window=10)
+
+    # Act
+    rows = []
+    for day in range(40):
+        for key, values in series.items():
+            state.ingest(key, [(day, values[day])], weights, day)
+        rows.append([state.stats[k].zscore() or 0.0 for k in "abc"])
+        if day == 20:
+            state = RegimeState.from_redis(
+                {k.encode(): v.encode() if isinstance(v, str) else v for k, v in state.to_redis().items()},
+                ["a", "b", "c"], history_days=history_days, window=10,
+            )
+    summary = state.summary(weights)
+
+    # Assert
+    z = {k: (v[-1] - v.mean()) / v.std(ddof=1) for k, v in series.items()}
+    assert summary["score"] == pytest.approx((z["a"] + z["b"] - 2 * z["c"]) / 4)
+    assert summary["status"] in ("bullish", "bearish", "neutral")
+    assert len(summary["history"]) == history_days
+    expected = np.corrcoef(np.array(rows[-10:]).T)
+    assert summary["correlations"]["a"]["b"] == pytest.approx(expected[0, 1], abs=1e-4)
+    assert summary["correlations"]["a"]["c"] == pytest.approx(expected[0, 2], abs=1e-4)
+
+@pytest.mark.asyncio
+@patch('core.regime.save_regime', new_callable=AsyncMock)
+@patch('core.regime.load_regime', new_callable=AsyncMock)
+@patch('core.regime.run_exclusive')
+async def test_update_regime_keys_rows_by_market_day(mock_run_exclusive, mock_load, mock_save):
+    """Tests that a catch-up ingestion lands on the day of its newest point, not the day it ran."""
+    async def run_exclusive(name, run, **kwargs):
+        return await run()
+    mock_run_exclusive.side_effect = run_exclusive
+    state = RegimeState([i.key for i in INDICATORS], history_days=30, window=10)
+    mock_load.return_value = state
+    vix = get_indicator("vix")
+    history = [{"name": f"2025-07-{d:02d}", "value": 12.0 + d % 3} for d in range(1, 11)]
+
+    await update_regime(vix, history)
+
+    assert [from_day(day) for day in state.days] == ["2025-07-10"]
+    mock_save.assert_awaited_once()
+
+def test_price_matrix_merge_aligns_and_forward_fills():
+    """Tests that bars from different symbols align on shared days and gaps carry forward."""
+    matrix = PriceMatrix.empty(["AAA", "BBB"], capacity=3)
+    matrix = matrix.merge({
+        "AAA": [("2025-07-01", 1.0), ("2025-07-02", 2.0), ("2025-07-03", 3.0)],
+        "BBB": [("2025-07-02", 20.0)],
+    })
+    matrix = matrix.merge({"AAA": [("2025-07-04", 4.0)]})
+
+    assert [from_day(d) for d in matrix.days] == ["2025-07-02", "2025-07-03", "2025-07-04"]
+    np.testing.assert_array_equal(matrix.closes, [[2.0, 3.0, 4.0], [20.0, 20.0, 20.0]])
+    assert from_day(matrix.last_day("BBB")) == "2025-07-04"
+    assert matrix.reindex(["CCC"]).last_day("CCC") is None
+
+def test_compute_indicators_matches_per_symbol_formulas():
+    """Tests the vectorized indicators against straightforward per-symbol math."""
+    rng = np.random.default_rng(1)
+    closes = 100 + rng.standard_normal((3, 260)).cumsum(axis=1)
+    closes[2, :100] = np.nan  # a symbol with only 160 days of history
+
+    result = compute_indicators(closes)
+
+    np.testing.assert_allclose(result["sma50"], closes[:, -50:].mean(axis=1))
+    assert np.isnan(result["sma200"][2]) and not np.isnan(result["sma200"][0])
+    np.testing.assert_allclose(result["high52w"][:2], closes[:2, -252:].max(axis=1))
+    np.testing.assert_allclose(result["bollingerWidth"], 4 * closes[:, -20:].std(axis=1) / closes[:, -20:].mean(axis=1))
+    assert ((result["rsi14"] > 0) & (result["rsi14"] < 100)).all()
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("kind", ["inline", "thread", "process"])
+async def test_compute_executor_matches_a_direct_call(kind):
+    """Tests that every executor kind returns what the transform computes in-process."""
+    closes = 100 + np.random.default_rng(2).standard_normal((4, 260)).cumsum(axis=1)
+    executor = ComputeExecutor(kind, workers=1)
+    try:
+        result = await executor.run("technicals:universe", closes)
+    finally:
+        executor.shutdown()
+
+    expected = compute_indicators(closes)
+    assert result.keys() == expected.keys()
+    for name, values in expected.items():
+        np.testing.assert_array_equal(result[name], values)
+
+def test_settings_require_lists_every_missing_setting():
+    """Tests that each entry point checks only the settings it uses, and names all that are missing."""
+    settings = Settings(REDIS_URL="redis://localhost", FRED_API_KEY="key", API_KEY="", DATABASE_URL="")
+    settings.require("The economic service", "FRED_API_KEY")
+    with pytest.raises(RuntimeError, match="The gateway needs API_KEY, DATABASE_URL to be set"):
+        settings.require("The gateway", "API_KEY", "DATABASE_URL")
+
+def test_history_rows_flatten_indicator_payloads():
+    """Tests that every numeric history field becomes its own series."""
+    rows = history_rows("50-Day vs 200-Day MA", {"history": [
+        {"name": "2025-07-01", "50D": 101.5, "200D": float("nan")},
+    ]})
+    assert rows == [{"indicator": "50-Day vs 200-Day MA:50D", "observed_on": date(2025, 7, 1), "value": 101.5}]
+
+    rows = history_rows("CNN Fear & Greed", {"history": [{"name": "1751328000", "value": 55}]})
+    assert rows == [{"indicator": "CNN Fear & Greed", "observed_on": date(2025, 7, 1), "value": 55.0}]
+
+@pytest.mark.asyncio
+@patch('core.history.upsert_history', new_callable=AsyncMock)
+async def test_record_history_never_fails_ingestion(mock_upsert):
+    """Tests that a database outage is logged rather than raised to the fetcher."""
+    mock_upsert.side_effect = OSError("connection refused")
+    await record_history("VIX (Fear Gauge)", {"history": [{"name": "2025-07-01", "value": 12.0}]})
+    mock_upsert.assert_awaited_once()
+
+@pytest.mark.asyncio
+@patch('core.history.upsert_history', new_callable=AsyncMock)
+async def test_record_history_later_returns_before_the_write(mock_upsert, monkeypatch):
+    """Tests that a refresh hands its history write off instead of waiting on the database."""
+    monkeypatch.setattr(history_module.settings, "HISTORY_ENABLED", True)
+    release = asyncio.Event()
+
+    async def upsert(rows):
+        await release.wait()
+    mock_upsert.side_effect = upsert
+
+    record_history_later("VIX (Fear Gauge)", {"history": [{"name": "2025-07-01", "value": 12.0}]})
+    await asyncio.sleep(0)
+    assert mock_upsert.await_count == 1 and len(history_module._recording) == 1
+
+    release.set()
+    await asyncio.gather(*history_module._recording)
+    assert not history_module._recording
+
+@pytest.mark.asyncio
+@patch('core.history.get_engine')
+@patch('core.history.ensure_schema', new_callable=AsyncMock)
+async def test_query_history_creates_the_table_first(mock_ensure_schema, mock_get_engine):
+    """Tests that querying before anything was recorded finds an empty table rather than none."""
+    conn = mock_get_engine.return_value.connect.return_value.__aenter__.return_value
+    conn.execute = AsyncMock(return_value=[])
+    assert await query_history("VIX (Fear Gauge)", None, None) == []
+    mock_ensure_schema.assert_awaited_once()
+
+@pytest.mark.parametrize("history", [
+    [{"name": f"2024-01-{d:02d}", "50D": 470.0 + d, "200D": 450.5} for d in range(1, 31)],  # moving averages
+    [{"name": str(1700000000 + 86400 * d), "value": 40 + d} for d in range(30)],          # Fear & Greed
+    [{"name": "2024-Q1", "value": 1.5}],                                                   # anything else
+])
+def test_indicator_codec_round_trips_history_in_both_shapes(history):
+    """Tests that packed indicators decode to the original points, or to the same data as columns."""
+    payload = {"name": "Test", "value": "1.00", "status": "neutral", "history": history}
+    packed = encode_indicator(payload)
+
+    assert decode_indicator(packed) == payload
+    columns = decode_indicator(packed, shape="columnar")["history"]
+    assert columns["name"] == [point["name"] for point in history]
+    assert all(columns[field] == [point[field] for point in history] for field in history[0])
+    if len(history) > 1:
+        assert len(packed) < len(json.dumps(payload)) * 0.75
+
+def test_indicator_codec_reads_legacy_json():
+    payload = {"name": "Test", "history": [{"name": "2024-01-01", "value": 1.0}]}
+    assert decode_indicator(json.dumps(payload).encode(), shape="columnar")["history"] == {"name": ["2024-01-01"], "value": [1.0]}
+
+@pytest.mark.asyncio
+@patch('core.cache.record_history_later')
+@patch('core.cache.redis_binary', new_callable=MagicMock)
+async def test_write_indicator_publishes_a_snapshot_entry(mock_redis, mock_record):
+    """Tests that an update names its registry key and service and carries the indicator as /api/all serves it."""
+    pipe = MagicMock(execute=AsyncMock())
+    mock_redis.pipeline.return_value.__aenter__.return_value = pipe
+    indicator = get_indicator("vix")
+    payload = {"name": indicator.name, "value": "12.50", "status": "bullish", "history": [{"name": "2025-07-02", "value": 12.5}]}
+
+    await write_indicator(indicator, payload)
+
+    update = json.loads(pipe.publish.call_args.args[1])
+    meta = json.loads(pipe.hset.call_args.args[2])
+    assert pipe.hset.call_args.args[:2] == (META_KEY, "vix")
+    assert update == {"key": "vix", "service": "sentiment", "data": {
+        **payload, "updatedAt": meta["fetchedAt"], "expiresAt": meta["expiresAt"], "stale": False,
+    }}
+    assert meta["expiresAt"] == meta["fetchedAt"] + indicator.refresh_seconds
+    pipe.execute.assert_awaited_once()
+
+class FakeLockRedis:
+    """Just enough of Redis for SET NX leases and the compare-and-act scripts."""
+
+    def __init__(self):
+        self.values = {}
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    async def eval(self, script, numkeys, key, token, *args):
+        if self.values.get(key) != token:
+            return 0
+        if "'del'" in script:
+            del self.values[key]
+        return 1
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_in_process_and_skips_across_processes():
+    """Tests that concurrent refreshes share one call and a lock held elsewhere skips the refresh."""
+    fake = FakeLockRedis()
+    calls = 0
+
+    async def refresh():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "fresh"
+
+    with patch('core.locks.redis_cache', fake):
+        # Act: three concurrent callers in this process
+        results = await asyncio.gather(*(single_flight("refresh:vix", refresh, 60) for _ in range(3)))
+        assert results == ["fresh"] * 3
+        assert calls == 1
+        assert fake.values == {}  # released
+
+        # Act: another replica holds the lock
+        fake.values["lock:refresh:vix"] = "other-replica"
+        assert await single_flight("refresh:vix", refresh, 60) is None
+        assert calls == 1
+
+@pytest.mark.asyncio
+async def test_leader_lease_elects_one_scheduler_and_hands_over_on_release():
+    """Tests that only one of several schedulers holds the lease, and a standby takes it over."""
+    fake = FakeLockRedis()
+    with patch('core.locks.redis_cache', fake):
+        first, second = LeaderLease("scheduler", 0.03), LeaderLease("scheduler", 0.03)
+        first_task = asyncio.create_task(first.maintain())
+        await asyncio.sleep(0)
+        second_task = asyncio.create_task(second.maintain())
+        await asyncio.sleep(0.025)
+        assert (first.is_leader, second.is_leader) == (True, False)
+
+        # Act: the leader shuts down
+        first_task.cancel()
+        await asyncio.gather(first_task, return_exceptions=True)
+        await asyncio.sleep(0.02)
+
+        # Assert
+        assert second.is_leader
+        second_task.cancel()
+        await asyncio.gather(second_task, return_exceptions=True)
+
+def test_alert_index_matches_only_the_rules_an_update_reaches():
+    """Tests crossings, percent moves and status transitions against the bisected rule index."""
+    rule = lambda **fields: Rule.from_dict({"indicator": "vix", **fields})
+    rules = {
+        "above35": rule(kind="above", threshold=35), "above50": rule(kind="above", threshold=50),
+        "below20": rule(kind="below", threshold=20),
+        "up10": rule(kind="move", threshold=10), "up50": rule(kind="move", threshold=50),
+        "down10": rule(kind="move", threshold=-10),
+        "bearish": rule(kind="status", status="bearish"),
+    }
+    index = IndicatorRules(rules.values())
+    names = {r.id: name for name, r in rules.items()}
+    fired = lambda *args: sorted(names[r.id] for r in index.match(*args))
+
+    assert fired(30.0, 36.0, "neutral", "bearish") == ["above35", "bearish", "up10"]
+    assert fired(36.0, 40.0, "bearish", "bearish") == ["up10"]  # already above 35: no new crossing
+    assert fired(36.0, 18.0, "bearish", "bullish") == ["below20", "down10"]
+    assert fired(20.0, 20.5, "neutral", "neutral") == []
+    assert fired(None, 20.0, None, "bearish") == ["bearish"]
+
+@pytest.mark.asyncio
+@patch('core.alerts._claim_all', new_callable=AsyncMock, side_effect=lambda fired: [alert for _, alert in fired])
+@patch('core.alerts.redis_cache')
+async def test_check_alerts_sends_once_per_new_point(mock_redis, mock_claim, monkeypatch):
+    """Tests that fired alerts reach the sink and an already-checked latest point is skipped."""
+    checked = {}
+    mock_redis.hget = AsyncMock(side_effect=lambda key, field: checked.get(field))
+    mock_redis.hset = AsyncMock(side_effect=lambda key, field, value: checked.update({field: value}))
+    index = alerts.RuleIndex(refresh_seconds=1)
+    index.load([Rule.from_dict({"indicator": "vix", "kind": "above", "threshold": 35})])
+    sink = MemorySink()
+    monkeypatch.setattr(alerts, "rule_index", index)
+    monkeypatch.setattr(alerts, "sink", sink)
+    vix = get_indicator("vix")
+    history = [{"name": "2025-07-01", "value": 30.0}, {"name": "2025-07-02", "value": 36.0}]
+
+    await alerts.check_alerts(vix, history)
+    await alerts.check_alerts(vix, history)
+    await alerts.check_alerts(get_indicator("gold"), history)  # no rules: nothing read
+
+    assert [a["message"] for a in sink.alerts] == ["VIX (Fear Gauge) crossed above 35 (30 to 36)"]
+    assert mock_claim.await_count == 1 and mock_redis.hget.await_count == 2
+
+def test_alerts_for_direction_status_with_two_points():
+    """Tests that a status comparing points (bondSpreads' direction) has no previous status on a two-point history."""
+    bond_spreads = get_indicator("bondSpreads")
+    rules = IndicatorRules([Rule.from_dict({"indicator": "bondSpreads", "kind": "status", "status": "bearish"})])
+    history = [{"name": "2025-07-01", "value": 3.1}, {"name": "2025-07-02", "value": 3.4}]
+
+    [(_, alert)] = alerts.alerts_for(bond_spreads, history, rules)
+
+    assert alert["status"] == "bearish" and alert["previousStatus"] is None
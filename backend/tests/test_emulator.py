@@ -0,0 +1,48 @@
+import httpx
+import pytest
+
+from core import http
+from core.alpha_vantage import AlphaVantageClient
+from emulator.main import create_emulator_app
+
+def emulator_client(**options) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=create_emulator_app(**options)), base_url="http://emulator")
+
+@pytest.mark.asyncio
+async def test_emulator_serves_fred_observations_like_fred():
+    async with emulator_client() as client:
+        response = await client.get("/fred/series/observations", params={
+            "series_id": "T10Y2Y", "limit": 5, "sort_order": "desc", "observation_start": "2024-12-01",
+        })
+        missing = await client.get("/fred/series/observations", params={"series_id": "NOPE"})
+
+    observations = response.json()["observations"]
+    assert [o["date"] for o in observations] == ["2024-12-31", "2024-12-30", "2024-12-27", "2024-12-26", "2024-12-25"]
+    assert missing.status_code == 400
+
+@pytest.mark.asyncio
+async def test_alpha_vantage_client_reads_full_history_from_emulator():
+    """Tests the real client end to end against the in-process emulator, with no network."""
+    http.mount_transport(httpx.ASGITransport(app=create_emulator_app()), http.ALPHA_VANTAGE)
+    try:
+        client = AlphaVantageClient(rate_per_minute=60000, max_concurrency=4)
+        full = await client.get_daily_closes("SPY", "full")
+        compact = await client.get_daily_closes("SPY", "compact")
+    finally:
+        await http.close_clients()
+
+    assert len(full) > 6000
+    assert full[-100:] == compact
+    assert full == sorted(full)
+
+@pytest.mark.asyncio
+async def test_emulator_revalidates_and_injects_errors():
+    async with emulator_client() as client:
+        first = await client.get("/fng/", params={"limit": 30})
+        repeat = await client.get("/fng/", params={"limit": 30}, headers={"If-None-Match": first.headers["etag"]})
+    async with emulator_client(error_rate=1.0) as client:
+        failing = await client.get("/fng/")
+
+    assert len(first.json()["data"]) == 30
+    assert repeat.status_code == 304
+    assert failing.status_code == 503
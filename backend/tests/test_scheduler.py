@@ -0,0 +1,135 @@
+from datetime import date
+from unittest.mock import patch, AsyncMock
+import httpx
+import numpy as np
+import pytest
+from scheduler.backfill import backfill, moving_average_points, required_settings, targets
+from scheduler.main import Pacer, due_keys, trigger_cache_update, wait_until_ready
+
+def test_due_keys_selects_only_expired_indicators_and_jobs():
+    """Tests that the scheduler refreshes only what its refresh policy says is due."""
+    now = 1_700_000_000
+    fresh = {"fetchedAt": now - 60, "expiresAt": now + 60}
+    expired = {"fetchedAt": now - 7200, "expiresAt": now - 1}
+    meta = {
+        "yieldCurve": fresh, "ismPmi": expired, "joblessClaims": fresh,
+        "vix": fresh, "fearGreed": fresh,
+        "movingAverages": fresh, "universe": expired,
+        "bondSpreads": fresh,  # gold has never been refreshed
+    }
+
+    due = due_keys(meta, now)
+
+    assert due == {"economic": ["ismPmi"], "technicals": ["universe"], "cross_asset": ["gold"]}
+
+    # A failed refresh backs off: not due again until its retry time
+    meta["ismPmi"] = {**expired, "failures": 1, "retryAt": now + 30}
+    assert "economic" not in due_keys(meta, now)
+    assert due_keys(meta, now + 30)["economic"] == ["ismPmi"]
+
+@pytest.mark.asyncio
+@patch('scheduler.backfill.upsert_history', new_callable=AsyncMock)
+@patch('scheduler.backfill.redis_cache', new_callable=AsyncMock)
+@patch('scheduler.backfill.fred_client')
+async def test_backfill_writes_chunks_and_resumes_from_checkpoint(mock_fred, mock_redis, mock_upsert):
+    """Tests that a FRED series is fetched one date range at a time and an interrupted run resumes."""
+    # Arrange: the third chunk fails the first time round
+    checkpoints = {}
+    mock_redis.hget.side_effect = lambda _, key: checkpoints.get(key)
+    mock_redis.hset.side_effect = lambda _, key, value: checkpoints.__setitem__(key, value)
+    failed = []
+
+    async def get_range(series_id, start, end):
+        if start == "2020-01-21" and not failed:
+            failed.append(start)
+            raise httpx.ConnectError("connection reset")
+        return [{"date": end, "value": 1.5}, {"date": start, "value": -0.5}]
+    mock_fred.get_range.side_effect = get_range
+    target = targets({"yieldCurve"})
+
+    # Act
+    first = await backfill(target, date(2020, 1, 1), date(2020, 1, 31), chunk_days=10, concurrency={"default": 2})
+    second = await backfill(target, date(2020, 1, 1), date(2020, 1, 31), chunk_days=10, concurrency={"default": 2})
+
+    # Assert
+    assert first == {} and checkpoints == {"yieldCurve": "2020-01-01/2020-01-31"}
+    assert second == {"yieldCurve": 4}
+    assert [c.args[1] for c in mock_fred.get_range.call_args_list] == ["2020-01-01", "2020-01-11", "2020-01-21", "2020-01-21", "2020-01-31"]
+    rows = mock_upsert.call_args_list[0].args[0]
+    assert rows == [
+        {"indicator": "Yield Curve (10Y vs 2Y)", "observed_on": date(2020, 1, 1), "value": -0.5},
+        {"indicator": "Yield Curve (10Y vs 2Y)", "observed_on": date(2020, 1, 10), "value": 1.5},
+    ]
+
+@pytest.mark.asyncio
+@patch('scheduler.backfill.upsert_history', new_callable=AsyncMock)
+@patch('scheduler.backfill.redis_cache', new_callable=AsyncMock)
+@patch('scheduler.backfill.fred_client')
+async def test_backfill_fills_in_before_an_earlier_start(mock_fred, mock_redis, mock_upsert):
+    """Tests that a run starting before the checkpointed range fetches only the days around it."""
+    checkpoints = {"yieldCurve": "2020-01-11/2020-01-20"}
+    mock_redis.hget.side_effect = lambda _, key: checkpoints.get(key)
+    mock_redis.hset.side_effect = lambda _, key, value: checkpoints.__setitem__(key, value)
+    mock_fred.get_range = AsyncMock(return_value=[])
+
+    await backfill(targets({"yieldCurve"}), date(2020, 1, 1), date(2020, 1, 31), chunk_days=10, concurrency={"default": 1})
+
+    ranges = [c.args[1:] for c in mock_fred.get_range.call_args_list]
+    assert ranges == [("2020-01-01", "2020-01-10"), ("2020-01-21", "2020-01-30"), ("2020-01-31", "2020-01-31")]
+    assert checkpoints == {"yieldCurve": "2020-01-01/2020-01-31"}
+
+def test_backfill_requires_only_what_the_selected_series_use():
+    assert required_settings(targets({"yieldCurve"})) == ["DATABASE_URL", "FRED_API_KEY"]
+    assert required_settings(targets({"fearGreed", "SPY"})) == ["DATABASE_URL", "ALPHA_VANTAGE_API_KEY"]
+    assert required_settings(targets()) == ["DATABASE_URL", "ALPHA_VANTAGE_API_KEY", "FRED_API_KEY"]
+
+@pytest.mark.asyncio
+async def test_moving_average_points_match_rolling_means():
+    bars = [(f"2024-01-{d:02d}", float(d)) for d in range(1, 11)]
+    points = await moving_average_points(bars, (3, 5))
+    assert np.isnan(points[3]["5D"]) and points[4]["5D"] == 3.0
+    assert points[-1] == {"name": "2024-01-10", "3D": 9.0, "5D": 8.0}
+
+@pytest.mark.asyncio
+@patch('scheduler.main.get_client')
+async def test_trigger_follows_refresh_job_and_paces_by_its_duration(mock_client):
+    """Tests that the scheduler waits for the job, not the trigger, and learns how long it took."""
+    # Arrange
+    job = {"id": "abc", "status": "queued"}
+    post = httpx.Response(200, json={"message": "ok", "job": job}, request=httpx.Request("POST", "http://economic"))
+    polls = [
+        httpx.Response(200, json={**job, "status": "running"}, request=httpx.Request("GET", "http://economic")),
+        httpx.Response(200, json={**job, "status": "done", "durationMs": 400, "counts": {"updated": 3}},
+                       request=httpx.Request("GET", "http://economic")),
+    ]
+    mock_client.return_value.post = AsyncMock(return_value=post)
+    mock_client.return_value.get = AsyncMock(side_effect=polls)
+    pacer = Pacer()
+    pacer.durations["economic"] = 0.0  # poll as fast as allowed
+
+    # Act
+    started = pacer.start("economic", trigger_cache_update("economic", "http://economic", ["ismPmi"], pacer=pacer))
+    skipped = pacer.start("economic", trigger_cache_update("economic", "http://economic", pacer=pacer))
+    result = await pacer.in_flight["economic"]
+
+    # Assert
+    assert started and not skipped
+    assert result["status"] == "done"
+    assert mock_client.return_value.post.await_count == 1
+    assert mock_client.return_value.get.call_args.args[0] == "http://economic/jobs/abc"
+    assert pacer.durations["economic"] == pytest.approx(0.12)
+    assert "economic" not in pacer.in_flight
+
+@pytest.mark.asyncio
+@patch('scheduler.main.get_client')
+async def test_wait_until_ready_polls_until_services_answer(mock_client):
+    """Tests that startup waits on readiness probes, not a fixed sleep, and gives up on a service that never answers."""
+    def response(status):
+        return httpx.Response(status, json={}, request=httpx.Request("GET", "http://service/ready"))
+    probes = {"http://a/ready": [httpx.ConnectError("refused"), response(503), response(200)], "http://b/ready": [response(200)]}
+    mock_client.return_value.get = AsyncMock(side_effect=lambda url, **kwargs: probes[url].pop(0))
+
+    assert await wait_until_ready({"a": "http://a", "b": "http://b"}, timeout=5) == {"a", "b"}
+
+    probes["http://a/ready"] = [response(503)] * 10
+    assert await wait_until_ready({"a": "http://a"}, timeout=0.2) == set()
@@ -1,58 +1,99 @@
+import asyncio
 import pytest
 import json
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
 from unittest.mock import patch, AsyncMock, MagicMock
 
-# Import the core functions from each service that we want to test
-from services.economic_service.main import fetch_and_cache_indicator as fetch_economic
-from services.sentiment_service.main import fetch_vix
-from services.technicals_service.main import fetch_moving_averages
-from services.cross_asset_service.main import fetch_bond_spreads
+# Services are generated from the indicator registry, so test them through it
+from fastapi.testclient import TestClient
+from core.registry import get_indicator
+from core.rolling import MovingAverageState
+from core.codec import encode_indicator
+from core.feature_flags import feature_flags
+from core.http import NOT_MODIFIED
+from core.refresh_jobs import RefreshJobs
+from core.service import read_indicators, refresh_indicator, required_settings, update_service
+from core.technicals import PriceMatrix, refresh_universe
+from services.economic_service.main import app as economic_app
 
-# Use pytest-asyncio to handle async functions
-pytestmark = pytest.mark.asyncio
+@pytest.fixture(autouse=True)
+def mock_mark_refreshed():
+    with patch('core.service.mark_refreshed', new_callable=AsyncMock) as mock:
+        yield mock
 
-@patch('services.economic_service.main.redis_cache', new_callable=AsyncMock)
-@patch('services.economic_service.main.httpx.AsyncClient')
-async def test_economic_service_yield_curve_inversion(mock_client, mock_redis):
+@pytest.fixture(autouse=True)
+def mock_mark_failed():
+    with patch('core.service.mark_failed', new_callable=AsyncMock) as mock:
+        yield mock
+
+@pytest.fixture(autouse=True)
+def mock_update_regime():
+    with patch('core.regime.update_regime', new_callable=AsyncMock) as mock:
+        yield mock
+
+@pytest.fixture(autouse=True)
+def mock_save_job():
+    """Refresh job records go nowhere."""
+    with patch('core.refresh_jobs.save_job', new_callable=AsyncMock) as mock:
+        yield mock
+
+@pytest.fixture(autouse=True)
+def mock_lock_redis():
+    """Refresh locks are always granted."""
+    with patch('core.locks.redis_cache', new_callable=AsyncMock) as mock:
+        mock.set.return_value = True
+        yield mock
+
+@pytest.mark.asyncio
+@patch('core.service.write_indicator', new_callable=AsyncMock)
+@patch('core.sources.fred_client')
+async def test_economic_service_yield_curve_inversion(mock_fred, mock_write, mock_update_regime):
     """Tests if the economic service correctly identifies an inverted yield curve."""
     # Arrange
-    mock_response = MagicMock()
-    mock_response.json.return_value = {
-        "observations": [{"value": "-0.25"}, {"value": "0.1"}]
-    }
-    mock_client.return_value.__aenter__.return_value.get.return_value = mock_response
+    mock_fred.get_observations = AsyncMock(return_value=[
+        {"date": "2025-07-02", "value": -0.25}, {"date": "2025-07-01", "value": 0.1}
+    ])
 
     # Act
-    result = await fetch_economic("T10Y2Y", "Yield Curve", "Test Desc")
+    result = await refresh_indicator(get_indicator("yieldCurve"))
 
     # Assert
     assert result["status"] == "bearish"
     assert result["value"] == "-0.25"
-    mock_redis.set.assert_called_once()
+    mock_write.assert_called_once()
+    mock_update_regime.assert_awaited_once_with(get_indicator("yieldCurve"), result["history"])
 
-@patch('services.sentiment_service.main.redis_cache', new_callable=AsyncMock)
-@patch('services.sentiment_service.main.httpx.AsyncClient')
-async def test_sentiment_service_vix_complacency(mock_client, mock_redis):
+@pytest.mark.asyncio
+@patch('core.service.write_indicator', new_callable=AsyncMock)
+@patch('core.alpha_vantage.get_client')
+async def test_sentiment_service_vix_complacency(mock_client, mock_write):
     """Tests if the sentiment service correctly identifies a low VIX (complacency)."""
     # Arrange
     mock_response = MagicMock()
     mock_response.json.return_value = {
-        "data": [{"value": "12.5"}, {"value": "13.0"}]
+        "data": [{"date": "2025-07-02", "value": "12.5"}, {"date": "2025-07-01", "value": "13.0"}]
     }
-    mock_client.return_value.__aenter__.return_value.get.return_value = mock_response
+    mock_client.return_value.get = AsyncMock(return_value=mock_response)
 
     # Act
-    result = await fetch_vix()
+    result = await refresh_indicator(get_indicator("vix"))
 
     # Assert
     assert result["status"] == "bullish" # Low VIX is a contrarian bearish signal, but the direct status is bullish (low fear)
     assert result["value"] == "12.50"
-    mock_redis.set.assert_called_once()
+    mock_write.assert_called_once()
 
 
-@patch('services.technicals_service.main.redis_cache', new_callable=AsyncMock)
-@patch('services.technicals_service.main.httpx.AsyncClient')
-async def test_technicals_service_death_cross(mock_client, mock_redis):
+@pytest.mark.asyncio
+@patch('core.sources.save_state', new_callable=AsyncMock)
+@patch('core.sources.load_state', new_callable=AsyncMock)
+@patch('core.service.write_indicator', new_callable=AsyncMock)
+@patch('core.alpha_vantage.get_client')
+async def test_technicals_service_death_cross(mock_client, mock_write, mock_load, mock_save):
     """Tests if the technicals service correctly identifies a Death Cross."""
     # Arrange
     mock_response = MagicMock()
@@ -60,34 +101,294 @@ async def test_technicals_service_death_cross(mock_client, mock_redis):
     for i in range(200):
         # Create data where recent prices are lower, forcing 50D < 200D
         price = 400 + (i * 0.1) if i < 50 else 500
-        mock_api_data["Time Series (Daily)"][f"2025-07-{200-i:02d}"] = {"4. close": str(price)}
+        mock_api_data["Time Series (Daily)"][(date(2025, 7, 31) - timedelta(days=i)).isoformat()] = {"4. close": str(price)}
     mock_response.json.return_value = mock_api_data
-    mock_client.return_value.__aenter__.return_value.get.return_value = mock_response
+    mock_client.return_value.get = AsyncMock(return_value=mock_response)
+    mock_load.return_value = MovingAverageState((50, 200), 60)
 
     # Act
-    await fetch_moving_averages()
+    await refresh_indicator(get_indicator("movingAverages"))
 
     # Assert
-    args, kwargs = mock_redis.set.call_args
-    cached_data = json.loads(args[1])
+    args, kwargs = mock_write.call_args
+    cached_data = args[1]
     assert cached_data['status'] == 'bearish'
     assert cached_data['value'] == 'Death Cross'
+    assert mock_client.return_value.get.call_args.kwargs["params"]["outputsize"] == "full"
 
-@patch('services.cross_asset_service.main.redis_cache', new_callable=AsyncMock)
-@patch('services.cross_asset_service.main.httpx.AsyncClient')
-async def test_cross_asset_service_widening_spreads(mock_client, mock_redis):
+@pytest.mark.asyncio
+@patch('core.sources.save_state', new_callable=AsyncMock)
+@patch('core.sources.load_state', new_callable=AsyncMock)
+@patch('core.service.write_indicator', new_callable=AsyncMock)
+@patch('core.alpha_vantage.get_client')
+async def test_technicals_service_incremental_update(mock_client, mock_write, mock_load, mock_save):
+    """Tests that a warm moving-average state only fetches and applies new bars."""
+    # Arrange: a state already holding 260 days of closes at 100
+    state = MovingAverageState((50, 200), 60)
+    start = date(2025, 1, 1)
+    state.update([((start + timedelta(days=i)).isoformat(), 100.0) for i in range(260)])
+    mock_load.return_value = state
+    last = start + timedelta(days=259)
+    mock_response = MagicMock()
+    mock_response.json.return_value = {"Time Series (Daily)": {
+        (last + timedelta(days=i)).isoformat(): {"4. close": "150.0"} for i in range(2)
+    }}
+    mock_client.return_value.get = AsyncMock(return_value=mock_response)
+
+    # Act
+    await refresh_indicator(get_indicator("movingAverages"))
+
+    # Assert: one compact fetch, and only the bar after the last seen one applied
+    assert mock_client.return_value.get.call_count == 1
+    assert mock_client.return_value.get.call_args.kwargs["params"]["outputsize"] == "compact"
+    cached_data = mock_write.call_args.args[1]
+    assert cached_data['history'][-1] == {"name": (last + timedelta(days=1)).isoformat(), "50D": 101.0, "200D": 100.25}
+    assert cached_data['status'] == 'bullish'
+
+@pytest.mark.asyncio
+@patch('core.service.write_indicator', new_callable=AsyncMock)
+@patch('core.sources.fred_client')
+async def test_cross_asset_service_widening_spreads(mock_fred, mock_write):
     """Tests if the cross-asset service correctly identifies widening bond spreads."""
     # Arrange
-    mock_response = MagicMock()
-    mock_response.json.return_value = {
-        "observations": [{"value": "4.5"}, {"value": "4.2"}] # Current is higher than previous
-    }
-    mock_client.return_value.__aenter__.return_value.get.return_value = mock_response
+    mock_fred.get_observations = AsyncMock(return_value=[
+        {"date": "2025-07-02", "value": 4.5}, {"date": "2025-07-01", "value": 4.2} # Current is higher than previous
+    ])
 
     # Act
-    result = await fetch_bond_spreads()
+    result = await refresh_indicator(get_indicator("bondSpreads"))
 
     # Assert
     assert result["status"] == "bearish"
     assert result["value"] == "4.50%"
-    mock_redis.set.assert_called_once()
+    mock_write.assert_called_once()
+
+@pytest.mark.asyncio
+@patch('core.technicals.redis_cache', new_callable=MagicMock)
+@patch('core.technicals.save_price_matrix', new_callable=AsyncMock)
+@patch('core.technicals.load_price_matrix', new_callable=AsyncMock)
+@patch('core.alpha_vantage.get_client')
+async def test_technicals_service_universe_refresh(mock_client, mock_load, mock_save, mock_redis):
+    """Tests that a universe refresh computes every symbol and writes them in one pipeline."""
+    # Arrange: QQQ rises steadily, IWM falls steadily
+    start = date(2025, 1, 1)
+    def daily(symbol, slope):
+        return {(start + timedelta(days=i)).isoformat(): {"4. close": str(100 + slope * i)} for i in range(260)}
+    responses = {"QQQ": daily("QQQ", 1), "IWM": daily("IWM", -0.1)}
+    async def get(url, params):
+        response = MagicMock()
+        response.json.return_value = {"Time Series (Daily)": responses[params["symbol"]]}
+        return response
+    mock_client.return_value.get = get
+    mock_load.return_value = PriceMatrix.empty(["QQQ", "IWM"], 260)
+    pipe = MagicMock(execute=AsyncMock())
+    mock_redis.pipeline.return_value.__aenter__.return_value = pipe
+
+    # Act
+    summary = await refresh_universe(["QQQ", "IWM"])
+
+    # Assert
+    assert summary["aboveSma200"] == 1
+    assert pipe.set.call_count == 3
+    pipe.execute.assert_awaited_once()
+    rows = {json.loads(c.args[1]).get("symbol"): json.loads(c.args[1]) for c in pipe.set.call_args_list}
+    assert rows["QQQ"]["rsi14"] == 100.0
+    assert rows["IWM"]["pctFromHigh52w"] < 0
+    assert mock_save.call_args.args[0].closes.shape == (2, 260)
+
+@patch('core.service.read_cached', new_callable=AsyncMock)
+def test_generated_service_serves_registry_keys(mock_read_cached):
+    """Tests that a generated service re-keys packed indicators using the registry, in either shape."""
+    # Arrange
+    history = [{"name": "2024-01-01", "value": 0.25}, {"name": "2024-02-01", "value": 0.5}]
+    fresh = json.dumps({"fetchedAt": 1700000000, "expiresAt": time.time() + 60})
+    mock_read_cached.return_value = (
+        [encode_indicator({"name": "Yield Curve (10Y vs 2Y)", "value": "0.50", "history": history}), None, None],
+        [fresh, None, None],
+    )
+
+    # Act
+    rows = TestClient(economic_app).get("/indicators").json()
+    columns = TestClient(economic_app).get("/indicators?shape=columnar").json()
+
+    # Assert
+    assert rows == {"yieldCurve": {
+        "name": "Yield Curve (10Y vs 2Y)", "value": "0.50", "history": history,
+        "updatedAt": 1700000000, "expiresAt": pytest.approx(time.time() + 60, abs=5), "stale": False,
+    }}
+    assert columns["yieldCurve"]["history"] == {"name": ["2024-01-01", "2024-02-01"], "value": [0.25, 0.5]}
+    assert mock_read_cached.call_args.args[0] == {
+        "Yield Curve (10Y vs 2Y)": "yieldCurve", "ISM Manufacturing PMI": "ismPmi", "Initial Jobless Claims": "joblessClaims",
+    }
+
+@pytest.mark.asyncio
+@patch('core.service.read_cached', new_callable=AsyncMock)
+@patch('core.service.refresh_indicator', new_callable=AsyncMock)
+async def test_flagged_off_indicator_is_neither_fetched_nor_served(mock_refresh, mock_read_cached):
+    """Tests that an indicator switched off by its feature flag skips ingestion and drops out of reads."""
+    fresh = json.dumps({"fetchedAt": 1700000000, "expiresAt": time.time() + 60})
+    mock_read_cached.return_value = ([encode_indicator({"name": "Yield Curve (10Y vs 2Y)", "value": "0.50"}), None], [fresh, None])
+
+    with patch.dict(feature_flags._snapshot, {"indicators.ismPmi": False}):
+        await update_service("economic")
+        await read_indicators("economic")
+
+    assert [c.args[0].key for c in mock_refresh.call_args_list] == ["yieldCurve", "joblessClaims"]
+    assert list(mock_read_cached.call_args.args[0].values()) == ["yieldCurve", "joblessClaims"]
+
+@patch('core.service.update_service', new_callable=AsyncMock)
+def test_generated_service_triggers_update(mock_update):
+    """Tests that /update-cache runs the service's refresh as a tracked job."""
+    mock_update.return_value = [{"key": "yieldCurve", "status": "updated", "durationMs": 5}]
+    response = TestClient(economic_app).post("/update-cache?wait=true")
+    body = response.json()
+    assert body["message"] == "Economic indicators cache update triggered."
+    assert body["job"]["status"] == "done"
+    assert body["job"]["counts"] == {"updated": 1, "skipped": 0, "failed": 0}
+    mock_update.assert_awaited_once_with("economic", None)
+
+@patch('core.service.update_service', new_callable=AsyncMock)
+def test_generated_service_triggers_partial_update(mock_update):
+    """Tests that /update-cache?indicators= refreshes only the listed indicators."""
+    mock_update.return_value = []
+    TestClient(economic_app).post("/update-cache?indicators=joblessClaims,ismPmi&wait=true")
+    mock_update.assert_awaited_once_with("economic", ["ismPmi", "joblessClaims"])
+
+@pytest.mark.asyncio
+async def test_refresh_jobs_join_running_and_merge_queued_triggers():
+    """Tests that triggers during a running job never start a second concurrent refresh."""
+    # Arrange: a refresh that blocks until released
+    release = asyncio.Event()
+    calls = []
+
+    async def refresh(keys):
+        calls.append(keys)
+        await release.wait()
+        return [{"key": key, "status": "updated", "durationMs": 1} for key in keys or ["all"]]
+    jobs = RefreshJobs("economic", refresh)
+
+    # Act
+    running = await jobs.submit(["ismPmi", "yieldCurve"])
+    await asyncio.sleep(0)
+    joined = await jobs.submit(["ismPmi"])
+    queued = await jobs.submit(["joblessClaims"])
+    merged = await jobs.submit(["ismPmi", "joblessClaims"])
+    release.set()
+    await jobs.wait(running)
+    await jobs.wait(queued)
+
+    # Assert
+    assert joined is running and merged is queued
+    assert calls == [["ismPmi", "yieldCurve"], ["ismPmi", "joblessClaims"]]
+    assert queued["status"] == "done" and queued["counts"]["updated"] == 2
+    assert jobs.get(running["id"]) is None
+
+@pytest.mark.asyncio
+async def test_cancelled_refresh_job_fails_and_releases_waiters():
+    """Tests that a job cancelled at shutdown, and the one queued behind it, end as failed instead of hanging."""
+    async def refresh(keys):
+        await asyncio.Event().wait()
+    jobs = RefreshJobs("economic", refresh)
+    running = await jobs.submit(["ismPmi"])
+    queued = await jobs.submit(["yieldCurve"])
+    await asyncio.sleep(0)
+
+    task = jobs._task
+    task.cancel()
+    await asyncio.wait_for(asyncio.gather(jobs.wait(running), jobs.wait(queued)), timeout=1)
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert running["status"] == queued["status"] == "failed"
+    assert "CancelledError" in running["error"] and queued["error"] == running["error"]
+    assert jobs.get(running["id"]) is None and jobs.get(queued["id"]) is None
+
+@pytest.mark.asyncio
+@patch('core.service.refresh_indicator', new_callable=AsyncMock)
+@patch('core.service.read_cached', new_callable=AsyncMock)
+async def test_expired_indicator_is_served_stale_and_revalidated(mock_read_cached, mock_refresh):
+    """Tests that an expired indicator is still served, flagged stale, while one background refresh runs."""
+    # Arrange
+    expired = json.dumps({"fetchedAt": 1700000000, "expiresAt": 1700086400})
+    mock_read_cached.return_value = (
+        [None, encode_indicator({"name": "ISM Manufacturing PMI", "value": "48.00"}), None], [None, expired, None],
+    )
+    upstream_done = asyncio.Event()
+
+    async def slow_refresh(indicator, force):
+        await upstream_done.wait()
+    mock_refresh.side_effect = slow_refresh
+
+    # Act: two readers while the refresh is still in flight
+    first = await read_indicators("economic")
+    await read_indicators("economic")
+    upstream_done.set()
+    await asyncio.sleep(0)
+
+    # Assert
+    assert first["ismPmi"]["stale"] is True
+    assert first["ismPmi"]["value"] == "48.00"
+    mock_refresh.assert_awaited_once_with(get_indicator("ismPmi"), force=False)
+
+@pytest.mark.asyncio
+@patch('core.service.refresh_indicator', new_callable=AsyncMock)
+@patch('core.service.read_cached', new_callable=AsyncMock)
+async def test_indicator_backing_off_is_served_stale_without_revalidating(mock_read_cached, mock_refresh):
+    """Tests that readers do not retry an indicator whose last refresh failed until its retry time."""
+    backing_off = json.dumps({"fetchedAt": 1700000000, "expiresAt": 1700086400, "failures": 2, "retryAt": 2**40})
+    mock_read_cached.return_value = (
+        [None, encode_indicator({"name": "ISM Manufacturing PMI", "value": "48.00"}), None], [None, backing_off, None],
+    )
+
+    indicators = await read_indicators("economic")
+    await asyncio.sleep(0)
+
+    assert indicators["ismPmi"]["stale"] is True
+    mock_refresh.assert_not_awaited()
+
+@pytest.mark.asyncio
+@patch('core.service.write_indicator', new_callable=AsyncMock)
+@patch('core.sources.conditional_get', new_callable=AsyncMock, return_value=NOT_MODIFIED)
+async def test_not_modified_source_only_extends_ttl(mock_get, mock_write, mock_mark_refreshed):
+    """Tests that a 304 from the upstream keeps the cached indicator and pushes back its refresh."""
+    indicator = get_indicator("fearGreed")
+    assert await refresh_indicator(indicator) is None
+    mock_write.assert_not_awaited()
+    mock_mark_refreshed.assert_awaited_once_with("fearGreed", indicator.refresh_seconds)
+
+@pytest.mark.asyncio
+@patch('core.service.write_indicator', new_callable=AsyncMock)
+@patch('core.sources.fred_client')
+async def test_refresh_failures_are_logged_and_exported(mock_fred, mock_write, mock_mark_failed, caplog):
+    """Tests that a failing indicator no longer disappears silently into gather()."""
+    # Arrange: ISM fails, the other economic indicators succeed
+    async def observations(series_id, limit):
+        if series_id == "NAPM":
+            raise RuntimeError("upstream down")
+        return [{"date": "2024-01-01", "value": 1.0}]
+    mock_fred.get_observations = AsyncMock(side_effect=observations)
+
+    # Act
+    results = await update_service("economic")
+    metrics = TestClient(economic_app).get("/metrics").text
+
+    # Assert
+    assert "Failed to refresh ismPmi in economic" in caplog.text
+    assert 'indicator_refresh_errors_total{key="ismPmi",service="economic"} 1.0' in metrics
+    assert 'compute_cpu_seconds_count{step="yieldCurve"}' in metrics
+    assert mock_write.await_count == 2
+    assert {r["key"]: r["status"] for r in results} == {"yieldCurve": "updated", "ismPmi": "failed", "joblessClaims": "updated"}
+    mock_mark_failed.assert_awaited_once_with("ismPmi")  # retried with backoff, not on every tick
+
+def test_service_import_leaves_ingestion_only_modules_unloaded():
+    """Tests that a service starts without importing what only ingestion needs: Postgres history, the regime and alerts.
+
+    NumPy is still loaded: the cache codec needs it to serve reads.
+    """
+    lazy = ("sqlalchemy", "core.regime", "core.alerts")
+    code = f"import sys, services.economic_service.main; print([m for m in {lazy!r} if m in sys.modules])"
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=Path(__file__).resolve().parent.parent, capture_output=True, text=True, check=True,
+    )
+    assert result.stdout.strip() == "[]"
+    assert required_settings("economic") == ["FRED_API_KEY", "DATABASE_URL"]